@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+"""
+Скрипт для замера задержки записи через API-путь создания/обновления:
+прежний вариант (commit + refresh) против записи с RETURNING без повторного SELECT.
+Работает с базой из DATABASE_URL, созданные записи удаляются после замера
+"""
+import os
+import statistics
+import sys
+import time
+
+# Добавляем путь к проекту
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import delete, event
+
+from backend.config.database import SessionLocal, engine
+from backend.models.assets import WaterAsset
+from backend.utils.crud import apply_update, save
+
+ITERATIONS = int(os.getenv("BENCHMARK_ITERATIONS", "500"))
+
+statements = 0
+
+
+@event.listens_for(engine, "before_cursor_execute")
+def _count_statement(conn, cursor, statement, parameters, context, executemany):
+    global statements
+    statements += 1
+
+
+def _asset(number: int) -> WaterAsset:
+    return WaterAsset(name=f"benchmark-{number}", asset_type="pipe", location="benchmark")
+
+
+def _with_refresh(db, number: int) -> None:
+    asset = _asset(number)
+    db.add(asset)
+    db.commit()
+    db.refresh(asset)
+    asset.status = "maintenance"
+    db.commit()
+    db.refresh(asset)
+
+
+def _with_returning(db, number: int) -> None:
+    asset = save(db, _asset(number))
+    save(db, apply_update(asset, {"status": "maintenance"}))
+
+
+def measure(name: str, write) -> None:
+    global statements
+    timings = []
+    with SessionLocal() as db:
+        # Прогрев: подключение из пула и кэш скомпилированных запросов
+        write(db, -1)
+        statements = 0
+        for number in range(ITERATIONS):
+            started = time.perf_counter()
+            write(db, number)
+            timings.append((time.perf_counter() - started) * 1000)
+            # Объекты не накапливаются в сессии, как и в маршрутах (сессия на запрос)
+            db.expunge_all()
+    timings.sort()
+    print(
+        f"{name:<20} медиана {statistics.median(timings):.3f} мс, "
+        f"p95 {timings[int(len(timings) * 0.95)]:.3f} мс, "
+        f"запросов на создание+обновление {statements / ITERATIONS:.1f}"
+    )
+
+
+if __name__ == "__main__":
+    print(f"Создание и обновление записи, {ITERATIONS} итераций")
+    try:
+        measure("commit + refresh", _with_refresh)
+        measure("RETURNING", _with_returning)
+    finally:
+        with SessionLocal() as db:
+            db.execute(delete(WaterAsset).where(WaterAsset.location == "benchmark"))
+            db.commit()
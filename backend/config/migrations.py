@@ -0,0 +1,90 @@
+"""
+Применение миграций Alembic (backend/migrations) и проверка индексов при запуске приложения
+"""
+import logging
+import os
+from typing import List
+
+from alembic import command
+from alembic.config import Config
+from sqlalchemy import inspect, text
+
+from backend.config.database import Base, engine
+from backend.config.settings import DB_INDEX_CHECK
+
+logger = logging.getLogger(__name__)
+
+ALEMBIC_INI = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "alembic.ini")
+
+# Ревизия, соответствующая схеме, которая создавалась через Base.metadata.create_all
+# до перехода на миграции; таблицы и индексы, добавленные позже, создает ревизия 0002
+BASELINE_REVISION = "0001"
+
+# Ключ advisory-блокировки: миграции из нескольких процессов-воркеров выполняются по очереди
+MIGRATION_LOCK_KEY = 72_020
+
+
+def alembic_config() -> Config:
+    config = Config(ALEMBIC_INI)
+    config.attributes["configure_logger"] = False
+    return config
+
+
+def upgrade_database() -> None:
+    """
+    Приводит схему базы к последней ревизии. База, созданная до перехода на миграции
+    (таблицы есть, таблицы alembic_version нет), сначала отмечается исходной ревизией
+    """
+    with engine.connect() as lock:
+        lock.execute(text("SELECT pg_advisory_lock(:key)"), {"key": MIGRATION_LOCK_KEY})
+        try:
+            tables = inspect(lock).get_table_names()
+            lock.rollback()
+            config = alembic_config()
+            if "alembic_version" not in tables and "users" in tables:
+                logger.info("База создана без миграций, отмечается ревизия %s", BASELINE_REVISION)
+                command.stamp(config, BASELINE_REVISION)
+            command.upgrade(config, "head")
+        finally:
+            lock.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": MIGRATION_LOCK_KEY})
+            lock.rollback()
+
+
+def missing_indexes() -> List[str]:
+    """
+    Возвращает индексы моделей, которых нет в базе или которые недействительны
+    (прерванное построение CREATE INDEX CONCURRENTLY оставляет индекс с indisvalid = false,
+    такой индекс пересоздается миграцией)
+    """
+    expected = sorted(
+        index.name
+        for table in Base.metadata.sorted_tables
+        for index in table.indexes
+    )
+    with engine.connect() as connection:
+        valid = set(connection.execute(
+            text(
+                "SELECT c.relname FROM pg_index i "
+                "JOIN pg_class c ON c.oid = i.indexrelid "
+                "WHERE c.relnamespace = current_schema()::regnamespace "
+                "AND i.indisvalid AND c.relname = ANY(:names)"
+            ),
+            {"names": expected}
+        ).scalars())
+    return [name for name in expected if name not in valid]
+
+
+def verify_indexes() -> None:
+    """
+    Проверяет наличие ожидаемых индексов (режим задается DB_INDEX_CHECK)
+    """
+    if DB_INDEX_CHECK == "off":
+        return
+    missing = missing_indexes()
+    if not missing:
+        return
+    message = f"В базе отсутствуют или недействительны индексы: {', '.join(missing)}. Выполните alembic upgrade head"
+    if DB_INDEX_CHECK == "warn":
+        logger.warning(message)
+        return
+    raise RuntimeError(message)
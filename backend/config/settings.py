@@ -43,5 +43,97 @@ LOGIN_ATTEMPT_WINDOW = 900  # 15 минут в секундах
 DEFAULT_PAGE_SIZE = 20
 MAX_PAGE_SIZE = 100
 
-# Настройки кэширования (если будет использоваться)
-CACHE_TTL = 300  # 5 минут в секундах
\ No newline at end of file
+# Настройки кэширования
+CACHE_TTL = 300  # 5 минут в секундах
+CACHE_SIZE = int(os.getenv("CACHE_SIZE", "1000"))  # Максимальное количество ответов в кэше процесса
+CACHE_URL = os.getenv("CACHE_URL")  # Адрес Redis для общего кэша ответов (redis://...), по умолчанию кэш в памяти процесса
+
+# Настройки массовой загрузки данных (NDJSON/CSV)
+BULK_INGEST_BATCH_SIZE = int(os.getenv("BULK_INGEST_BATCH_SIZE", "1000"))  # Строк в одном пакете INSERT
+BULK_INGEST_MAX_ERRORS = int(os.getenv("BULK_INGEST_MAX_ERRORS", "1000"))  # Максимум ошибок в отчете
+BULK_MAX_ITEMS = int(os.getenv("BULK_MAX_ITEMS", "5000"))  # Максимум записей в одном запросе /bulk
+
+# Настройки выгрузки данных для аналитики (CSV, Arrow, Parquet)
+EXPORT_BATCH_SIZE = int(os.getenv("EXPORT_BATCH_SIZE", "10000"))  # Строк, читаемых из базы за раз
+
+# Настройки телеметрии инфраструктуры
+TELEMETRY_RAW_MAX_DAYS = int(os.getenv("TELEMETRY_RAW_MAX_DAYS", "7"))  # Максимальный период запроса с поминутной детализацией
+
+# Настройки поиска утечек по телеметрии
+LEAK_DETECTION_INTERVAL = float(os.getenv("LEAK_DETECTION_INTERVAL", "60"))  # Интервал фоновой проверки в секундах (0 - только по запросу)
+LEAK_DETECTION_BATCH_SIZE = int(os.getenv("LEAK_DETECTION_BATCH_SIZE", "500"))  # Объектов инфраструктуры в одном пакете проверки
+LEAK_DETECTION_INITIAL_HOURS = int(os.getenv("LEAK_DETECTION_INITIAL_HOURS", "24"))  # Глубина первой проверки нового объекта в часах
+LEAK_PRESSURE_DROP = float(os.getenv("LEAK_PRESSURE_DROP", "0.15"))  # Резкое падение давления: доля от среднего за предыдущие минуты
+LEAK_DROP_WINDOW_MINUTES = int(os.getenv("LEAK_DROP_WINDOW_MINUTES", "10"))  # Окно сравнения для резкого падения в минутах
+LEAK_SUSTAINED_MINUTES = int(os.getenv("LEAK_SUSTAINED_MINUTES", "30"))  # Окно устойчивого отклонения давления в минутах
+LEAK_BASELINE_HOURS = int(os.getenv("LEAK_BASELINE_HOURS", "24"))  # Период базового уровня давления в часах
+LEAK_DEVIATION_SIGMA = float(os.getenv("LEAK_DEVIATION_SIGMA", "3"))  # Порог устойчивого отклонения в стандартных отклонениях базового уровня
+LEAK_DEVIATION_MIN_RATIO = float(os.getenv("LEAK_DEVIATION_MIN_RATIO", "0.05"))  # Минимальный порог устойчивого отклонения (доля от базового уровня)
+LEAK_NIGHT_START_HOUR = int(os.getenv("LEAK_NIGHT_START_HOUR", "2"))  # Начало ночного окна минимального расхода (час UTC)
+LEAK_NIGHT_END_HOUR = int(os.getenv("LEAK_NIGHT_END_HOUR", "4"))  # Конец ночного окна (час UTC)
+LEAK_NIGHT_BASELINE_DAYS = int(os.getenv("LEAK_NIGHT_BASELINE_DAYS", "7"))  # Количество предыдущих ночей для базового ночного расхода
+LEAK_NIGHT_FLOW_RATIO = float(os.getenv("LEAK_NIGHT_FLOW_RATIO", "0.3"))  # Рост ночного расхода относительно базового (доля)
+
+# Настройки поиска жалоб
+COMPLAINT_SEARCH_CANDIDATES = int(os.getenv("COMPLAINT_SEARCH_CANDIDATES", "5000"))  # Количество последних совпадений, упорядочиваемых по релевантности
+
+# Настройки объединения жалоб в инциденты
+COMPLAINT_CLUSTER_RADIUS = float(os.getenv("COMPLAINT_CLUSTER_RADIUS", "300"))  # Расстояние от центра инцидента в метрах
+COMPLAINT_CLUSTER_WINDOW_MINUTES = int(os.getenv("COMPLAINT_CLUSTER_WINDOW_MINUTES", "60"))  # Максимальный интервал после последней жалобы инцидента в минутах
+
+# Настройки оценки стоимости активов
+ASSET_VALUATION_MAX_YEARS = int(os.getenv("ASSET_VALUATION_MAX_YEARS", "30"))  # Максимальный горизонт прогноза остаточной стоимости в годах
+
+# Настройки планирования обслуживания активов
+MAINTENANCE_QUEUE_REFRESH_INTERVAL = float(os.getenv("MAINTENANCE_QUEUE_REFRESH_INTERVAL", "3600"))  # Интервал полного пересчета очереди обслуживания в секундах (0 - только по запросу)
+MAINTENANCE_DEFAULT_INTERVAL_DAYS = int(os.getenv("MAINTENANCE_DEFAULT_INTERVAL_DAYS", "365"))  # Срок обслуживания после последнего, если дата следующего не задана
+MAINTENANCE_HISTORY_DAYS = int(os.getenv("MAINTENANCE_HISTORY_DAYS", "730"))  # Период истории ремонтов и утечек для оценки риска в днях
+MAINTENANCE_AGE_WEIGHT = float(os.getenv("MAINTENANCE_AGE_WEIGHT", "0.05"))  # Вклад года возраста актива в оценку риска
+MAINTENANCE_REPAIR_WEIGHT = float(os.getenv("MAINTENANCE_REPAIR_WEIGHT", "0.5"))  # Вклад внепланового обслуживания или ремонта
+MAINTENANCE_LEAK_WEIGHT = float(os.getenv("MAINTENANCE_LEAK_WEIGHT", "1.0"))  # Вклад утечки на объектах того же местоположения
+
+# Настройки прогнозирования спроса
+FORECAST_HISTORY_DAYS = int(os.getenv("FORECAST_HISTORY_DAYS", "180"))  # Глубина истории для обучения модели
+FORECAST_MAX_HORIZON = int(os.getenv("FORECAST_MAX_HORIZON", "90"))  # Максимальный горизонт прогноза в днях
+
+# Настройки пула подключений к базе данных (на один процесс-воркер)
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "10"))  # Количество постоянных подключений в пуле
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "20"))  # Максимальное количество дополнительных подключений
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))  # Ожидание свободного подключения в секундах
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "300"))  # Время в секундах, после которого подключение пересоздается
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "true").lower() in ("1", "true", "yes")  # Проверка подключения перед использованием
+DB_STATEMENT_TIMEOUT = int(os.getenv("DB_STATEMENT_TIMEOUT", "0"))  # Ограничение времени запроса в миллисекундах (0 - без ограничения)
+DB_ECHO = os.getenv("DB_ECHO", "false").lower() in ("1", "true", "yes")  # Вывод SQL-запросов в лог для отладки
+DB_AUTO_MIGRATE = os.getenv("DB_AUTO_MIGRATE", "true").lower() in ("1", "true", "yes")  # Применять миграции Alembic при запуске приложения
+DB_INDEX_CHECK = os.getenv("DB_INDEX_CHECK", "error").lower()  # Проверка индексов при запуске: error - остановить запуск, warn - записать в лог, off - не проверять
+
+# Настройки кэша авторизации
+AUTH_CACHE_TTL = int(os.getenv("AUTH_CACHE_TTL", "60"))  # Время жизни записи о пользователе в секундах
+AUTH_CACHE_SIZE = int(os.getenv("AUTH_CACHE_SIZE", "10000"))  # Максимальное количество пользователей в кэше
+
+# Настройки геопоиска
+GEO_MAX_RADIUS = float(os.getenv("GEO_MAX_RADIUS", "50000"))  # Максимальный радиус поиска near в метрах
+
+# Настройки кластеризации объектов на карте
+MAP_MAX_ZOOM = int(os.getenv("MAP_MAX_ZOOM", "20"))  # Максимальный масштаб карты
+MAP_CLUSTER_SUBDIVISION = int(os.getenv("MAP_CLUSTER_SUBDIVISION", "3"))  # Кластеров на сторону тайла: 2^n
+MAP_MAX_TILES = int(os.getenv("MAP_MAX_TILES", "64"))  # Максимальное количество тайлов в одном запросе
+MAP_CACHE_SIZE = int(os.getenv("MAP_CACHE_SIZE", "20000"))  # Максимальное количество тайлов в кэше
+
+# Настройки потока уведомлений (Server-Sent Events)
+NOTIFICATIONS_SSE_HEARTBEAT = float(os.getenv("NOTIFICATIONS_SSE_HEARTBEAT", "15"))  # Интервал служебных сообщений в секундах
+NOTIFICATIONS_SSE_QUEUE_SIZE = int(os.getenv("NOTIFICATIONS_SSE_QUEUE_SIZE", "100"))  # Максимум неотправленных событий на подключение
+NOTIFICATIONS_SSE_REPLAY_LIMIT = int(os.getenv("NOTIFICATIONS_SSE_REPLAY_LIMIT", "100"))  # Максимум уведомлений, досылаемых по Last-Event-ID
+NOTIFICATIONS_RELAY_RECONNECT_DELAY = float(os.getenv("NOTIFICATIONS_RELAY_RECONNECT_DELAY", "5"))  # Пауза перед восстановлением соединения LISTEN в секундах
+
+# Настройки доставки уведомлений по каналам (email, SMS, push)
+NOTIFICATIONS_WORKERS = int(os.getenv("NOTIFICATIONS_WORKERS", "2"))  # Потоков доставки в процессе (0 - доставка отключена)
+NOTIFICATIONS_BATCH_SIZE = int(os.getenv("NOTIFICATIONS_BATCH_SIZE", "500"))  # Получателей в одном пакете
+NOTIFICATIONS_POLL_INTERVAL = float(os.getenv("NOTIFICATIONS_POLL_INTERVAL", "2"))  # Опрос очереди при отсутствии заданий в секундах
+NOTIFICATIONS_LEASE_TIMEOUT = int(os.getenv("NOTIFICATIONS_LEASE_TIMEOUT", "300"))  # Через сколько секунд задание упавшего обработчика берется повторно
+NOTIFICATIONS_MAX_ATTEMPTS = int(os.getenv("NOTIFICATIONS_MAX_ATTEMPTS", "8"))  # Попыток доставки пакета до статуса failed
+NOTIFICATIONS_RETRY_DELAY = float(os.getenv("NOTIFICATIONS_RETRY_DELAY", "5"))  # Задержка первой повторной попытки в секундах (далее удваивается)
+NOTIFICATIONS_RETRY_MAX_DELAY = float(os.getenv("NOTIFICATIONS_RETRY_MAX_DELAY", "3600"))  # Максимальная задержка повторной попытки в секундах
+NOTIFICATIONS_RATE_EMAIL = float(os.getenv("NOTIFICATIONS_RATE_EMAIL", "100"))  # Писем в секунду
+NOTIFICATIONS_RATE_SMS = float(os.getenv("NOTIFICATIONS_RATE_SMS", "10"))  # SMS в секунду
+NOTIFICATIONS_RATE_PUSH = float(os.getenv("NOTIFICATIONS_RATE_PUSH", "500"))  # Push-уведомлений в секунду
\ No newline at end of file
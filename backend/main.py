@@ -1,7 +1,7 @@
 from fastapi import FastAPI, Depends
 from fastapi.middleware.cors import CORSMiddleware
-from backend.config.database import engine, Base
-from backend.config.settings import APP_NAME, APP_DESCRIPTION, APP_VERSION, ALLOWED_ORIGINS
+from backend.config.migrations import upgrade_database, verify_indexes
+from backend.config.settings import APP_NAME, APP_DESCRIPTION, APP_VERSION, ALLOWED_ORIGINS, DB_AUTO_MIGRATE, LEAK_DETECTION_INTERVAL, MAINTENANCE_QUEUE_REFRESH_INTERVAL, NOTIFICATIONS_WORKERS
 from backend.routes import (
     users,
     water_infrastructure,
@@ -11,12 +11,19 @@ from backend.routes import (
     tariffs,
     assets,
     demand_forecasting,
-    notifications
+    notifications,
+    maps,
+    exports,
+    metrics
 )
 from backend.utils.auth import oauth2_scheme
-
-# Создание таблиц в базе данных
-Base.metadata.create_all(bind=engine)
+from backend.utils.leak_detection import leak_detection_worker
+from backend.utils.maintenance_scheduler import maintenance_queue_worker
+from backend.utils.telemetry import create_upcoming_partitions
+from backend.utils.notification_broker import notification_relay
+from backend.utils.notification_delivery import delivery_workers
+from backend.utils.complaint_search import SEARCH_TRUNCATED_HEADER
+from backend.utils.pagination import NEXT_CURSOR_HEADER
 
 # Инициализация FastAPI приложения
 app = FastAPI(
@@ -35,7 +42,7 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
     allow_origin_regex=None,
-    expose_headers=["Access-Control-Allow-Origin"]
+    expose_headers=["Access-Control-Allow-Origin", NEXT_CURSOR_HEADER, SEARCH_TRUNCATED_HEADER]
 )
 
 # Подключение маршрутов
@@ -48,6 +55,61 @@ app.include_router(tariffs, prefix="/api/tariffs", tags=["Тарифы"])
 app.include_router(assets, prefix="/api/assets", tags=["Активы"])
 app.include_router(demand_forecasting, prefix="/api/demand", tags=["Спрос и планирование"])
 app.include_router(notifications, prefix="/api/notifications", tags=["Уведомления"])
+app.include_router(maps, prefix="/api/map", tags=["Карта"])
+app.include_router(exports, prefix="/api/export", tags=["Выгрузка данных"])
+app.include_router(metrics, prefix="/metrics", tags=["Метрики"])
+
+# Схема базы данных ведется миграциями Alembic (backend/migrations)
+@app.on_event("startup")
+def prepare_database():
+    if DB_AUTO_MIGRATE:
+        upgrade_database()
+    verify_indexes()
+    create_upcoming_partitions()
+
+
+# Фоновая доставка уведомлений
+@app.on_event("startup")
+def start_notification_delivery():
+    delivery_workers.start(NOTIFICATIONS_WORKERS)
+
+
+@app.on_event("shutdown")
+def stop_notification_delivery():
+    delivery_workers.stop()
+
+
+# Передача новых уведомлений подключениям всех воркеров (LISTEN/NOTIFY)
+@app.on_event("startup")
+async def start_notification_relay():
+    notification_relay.start()
+
+
+@app.on_event("shutdown")
+async def stop_notification_relay():
+    await notification_relay.stop()
+
+
+# Фоновый поиск утечек по телеметрии
+@app.on_event("startup")
+def start_leak_detection():
+    leak_detection_worker.start(LEAK_DETECTION_INTERVAL)
+
+
+@app.on_event("shutdown")
+def stop_leak_detection():
+    leak_detection_worker.stop()
+
+
+# Фоновый пересчет очереди обслуживания активов
+@app.on_event("startup")
+def start_maintenance_queue():
+    maintenance_queue_worker.start(MAINTENANCE_QUEUE_REFRESH_INTERVAL)
+
+
+@app.on_event("shutdown")
+def stop_maintenance_queue():
+    maintenance_queue_worker.stop()
 
 # Корневой маршрут
 @app.get("/")
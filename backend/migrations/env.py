@@ -0,0 +1,60 @@
+"""
+Окружение Alembic: миграции выполняются на движке приложения (DATABASE_URL из settings.py)
+"""
+import os
+import sys
+from logging.config import fileConfig
+
+from alembic import context
+
+# Добавляем путь к проекту
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from backend.config.database import Base, engine
+import backend.models  # noqa: F401 - регистрация моделей в Base.metadata
+
+config = context.config
+# При запуске из приложения (config/migrations.py) настройки логирования приложения не заменяются
+if config.config_file_name is not None and config.attributes.get("configure_logger", True):
+    fileConfig(config.config_file_name, disable_existing_loggers=False)
+
+target_metadata = Base.metadata
+
+
+def include_object(obj, name, type_, reflected, compare_to):
+    """
+    Таблицы, которых нет в моделях (месячные секции телеметрии), при автогенерации не сравниваются
+    """
+    return not (type_ == "table" and reflected and compare_to is None)
+
+
+def run_migrations_offline() -> None:
+    context.configure(
+        url=engine.url.render_as_string(hide_password=False),
+        target_metadata=target_metadata,
+        include_object=include_object,
+        literal_binds=True,
+        dialect_opts={"paramstyle": "named"},
+    )
+    with context.begin_transaction():
+        context.run_migrations()
+
+
+def run_migrations_online() -> None:
+    with engine.connect() as connection:
+        # Построение индексов на больших таблицах не ограничивается DB_STATEMENT_TIMEOUT
+        connection.exec_driver_sql("SET statement_timeout = 0")
+        connection.commit()
+        context.configure(
+            connection=connection,
+            target_metadata=target_metadata,
+            include_object=include_object,
+        )
+        with context.begin_transaction():
+            context.run_migrations()
+
+
+if context.is_offline_mode():
+    run_migrations_offline()
+else:
+    run_migrations_online()
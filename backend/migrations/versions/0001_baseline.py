@@ -0,0 +1,367 @@
+"""Исходная схема базы данных (таблицы и индексы, которые раньше создавались
+через Base.metadata.create_all при запуске приложения).
+Для существующей базы эта ревизия отмечается без выполнения: alembic stamp 0001
+
+Revision ID: 0001
+Revises: 
+Create Date: 2026-10-18 13:58:29.434166+00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0001'
+down_revision: Union[str, None] = None
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('asset_maintenance',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('asset_id', sa.Integer(), nullable=False),
+    sa.Column('maintenance_type', sa.String(), nullable=False),
+    sa.Column('description', sa.Text(), nullable=True),
+    sa.Column('performed_by', sa.String(), nullable=True),
+    sa.Column('cost', sa.Float(), nullable=True),
+    sa.Column('maintenance_date', sa.DateTime(), nullable=False),
+    sa.Column('next_maintenance_date', sa.DateTime(), nullable=True),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+    sa.Column('updated_at', sa.DateTime(timezone=True), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_asset_maintenance_id'), 'asset_maintenance', ['id'], unique=False)
+    op.create_table('complaint_categories',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('name', sa.String(), nullable=False),
+    sa.Column('description', sa.Text(), nullable=True),
+    sa.Column('is_active', sa.Boolean(), nullable=True),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+    sa.Column('updated_at', sa.DateTime(timezone=True), nullable=True),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('name')
+    )
+    op.create_index(op.f('ix_complaint_categories_id'), 'complaint_categories', ['id'], unique=False)
+    op.create_table('complaints',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=True),
+    sa.Column('full_name', sa.String(), nullable=False),
+    sa.Column('email', sa.String(), nullable=True),
+    sa.Column('phone', sa.String(), nullable=True),
+    sa.Column('category', sa.String(), nullable=False),
+    sa.Column('location', sa.String(), nullable=True),
+    sa.Column('latitude', sa.Float(), nullable=True),
+    sa.Column('longitude', sa.Float(), nullable=True),
+    sa.Column('description', sa.Text(), nullable=False),
+    sa.Column('photo_url', sa.String(), nullable=True),
+    sa.Column('priority', sa.String(), nullable=True),
+    sa.Column('status', sa.String(), nullable=True),
+    sa.Column('assigned_to', sa.Integer(), nullable=True),
+    sa.Column('resolved_at', sa.DateTime(), nullable=True),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+    sa.Column('updated_at', sa.DateTime(timezone=True), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_complaints_id'), 'complaints', ['id'], unique=False)
+    op.create_table('investment_plans',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('plan_name', sa.String(), nullable=False),
+    sa.Column('description', sa.Text(), nullable=True),
+    sa.Column('total_investment', sa.Float(), nullable=False),
+    sa.Column('allocated_for_infrastructure', sa.Float(), nullable=True),
+    sa.Column('allocated_for_equipment', sa.Float(), nullable=True),
+    sa.Column('allocated_for_maintenance', sa.Float(), nullable=True),
+    sa.Column('allocated_for_human_resources', sa.Float(), nullable=True),
+    sa.Column('start_date', sa.DateTime(), nullable=False),
+    sa.Column('end_date', sa.DateTime(), nullable=False),
+    sa.Column('status', sa.String(), nullable=True),
+    sa.Column('created_by', sa.Integer(), nullable=False),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+    sa.Column('updated_at', sa.DateTime(timezone=True), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_investment_plans_id'), 'investment_plans', ['id'], unique=False)
+    op.create_table('notification_settings',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('notification_type', sa.String(), nullable=False),
+    sa.Column('enabled', sa.Boolean(), nullable=True),
+    sa.Column('channel_email', sa.Boolean(), nullable=True),
+    sa.Column('channel_sms', sa.Boolean(), nullable=True),
+    sa.Column('channel_push', sa.Boolean(), nullable=True),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+    sa.Column('updated_at', sa.DateTime(timezone=True), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_notification_settings_id'), 'notification_settings', ['id'], unique=False)
+    op.create_table('notifications',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=True),
+    sa.Column('title', sa.String(), nullable=False),
+    sa.Column('message', sa.Text(), nullable=False),
+    sa.Column('notification_type', sa.String(), nullable=True),
+    sa.Column('priority', sa.String(), nullable=True),
+    sa.Column('is_read', sa.Boolean(), nullable=True),
+    sa.Column('target_audience', sa.String(), nullable=True),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+    sa.Column('updated_at', sa.DateTime(timezone=True), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_notifications_id'), 'notifications', ['id'], unique=False)
+    op.create_table('payment_methods',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('name', sa.String(), nullable=False),
+    sa.Column('description', sa.Text(), nullable=True),
+    sa.Column('is_active', sa.Boolean(), nullable=True),
+    sa.Column('is_online', sa.Boolean(), nullable=True),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+    sa.Column('updated_at', sa.DateTime(timezone=True), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_payment_methods_id'), 'payment_methods', ['id'], unique=False)
+    op.create_table('sanitation_facilities',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('name', sa.String(), nullable=False),
+    sa.Column('type', sa.String(), nullable=False),
+    sa.Column('location', sa.String(), nullable=False),
+    sa.Column('latitude', sa.Float(), nullable=True),
+    sa.Column('longitude', sa.Float(), nullable=True),
+    sa.Column('capacity', sa.Integer(), nullable=True),
+    sa.Column('is_accessible', sa.Boolean(), nullable=True),
+    sa.Column('is_operational', sa.Boolean(), nullable=True),
+    sa.Column('last_maintenance', sa.DateTime(), nullable=True),
+    sa.Column('condition_status', sa.String(), nullable=True),
+    sa.Column('installation_date', sa.DateTime(), nullable=True),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+    sa.Column('updated_at', sa.DateTime(timezone=True), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_sanitation_facilities_id'), 'sanitation_facilities', ['id'], unique=False)
+    op.create_table('sanitation_reports',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('facility_id', sa.Integer(), nullable=False),
+    sa.Column('reported_by', sa.Integer(), nullable=False),
+    sa.Column('report_date', sa.DateTime(), nullable=False),
+    sa.Column('hygiene_rating', sa.Integer(), nullable=True),
+    sa.Column('cleanliness_rating', sa.Integer(), nullable=True),
+    sa.Column('accessibility_rating', sa.Integer(), nullable=True),
+    sa.Column('description', sa.Text(), nullable=True),
+    sa.Column('photo_url', sa.String(), nullable=True),
+    sa.Column('is_resolved', sa.Boolean(), nullable=True),
+    sa.Column('resolved_by', sa.Integer(), nullable=True),
+    sa.Column('resolved_at', sa.DateTime(), nullable=True),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+    sa.Column('updated_at', sa.DateTime(timezone=True), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_sanitation_reports_id'), 'sanitation_reports', ['id'], unique=False)
+    op.create_table('tariffs',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('name', sa.String(), nullable=False),
+    sa.Column('description', sa.Text(), nullable=True),
+    sa.Column('price_per_unit', sa.Float(), nullable=False),
+    sa.Column('unit_type', sa.String(), nullable=True),
+    sa.Column('is_active', sa.Boolean(), nullable=True),
+    sa.Column('start_date', sa.DateTime(), nullable=False),
+    sa.Column('end_date', sa.DateTime(), nullable=True),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+    sa.Column('updated_at', sa.DateTime(timezone=True), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_tariffs_id'), 'tariffs', ['id'], unique=False)
+    op.create_table('user_payments',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('amount', sa.Float(), nullable=False),
+    sa.Column('tariff_id', sa.Integer(), nullable=False),
+    sa.Column('payment_method_id', sa.Integer(), nullable=False),
+    sa.Column('payment_date', sa.DateTime(), nullable=False),
+    sa.Column('payment_reference', sa.String(), nullable=True),
+    sa.Column('status', sa.String(), nullable=True),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+    sa.Column('updated_at', sa.DateTime(timezone=True), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_user_payments_id'), 'user_payments', ['id'], unique=False)
+    op.create_table('users',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('username', sa.String(), nullable=False),
+    sa.Column('email', sa.String(), nullable=True),
+    sa.Column('hashed_password', sa.String(), nullable=False),
+    sa.Column('full_name', sa.String(), nullable=True),
+    sa.Column('is_active', sa.Boolean(), nullable=True),
+    sa.Column('role', sa.Enum('USER', 'ENGINEER', 'ADMIN', name='userrole'), nullable=False),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+    sa.Column('updated_at', sa.DateTime(timezone=True), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_users_email'), 'users', ['email'], unique=True)
+    op.create_index(op.f('ix_users_id'), 'users', ['id'], unique=False)
+    op.create_index(op.f('ix_users_username'), 'users', ['username'], unique=True)
+    op.create_table('water_assets',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('name', sa.String(), nullable=False),
+    sa.Column('asset_type', sa.String(), nullable=False),
+    sa.Column('description', sa.Text(), nullable=True),
+    sa.Column('location', sa.String(), nullable=False),
+    sa.Column('latitude', sa.Float(), nullable=True),
+    sa.Column('longitude', sa.Float(), nullable=True),
+    sa.Column('installation_date', sa.DateTime(), nullable=True),
+    sa.Column('last_maintenance', sa.DateTime(), nullable=True),
+    sa.Column('next_maintenance', sa.DateTime(), nullable=True),
+    sa.Column('status', sa.String(), nullable=True),
+    sa.Column('is_operational', sa.Boolean(), nullable=True),
+    sa.Column('asset_value', sa.Float(), nullable=True),
+    sa.Column('depreciation_rate', sa.Float(), nullable=True),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+    sa.Column('updated_at', sa.DateTime(timezone=True), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_water_assets_id'), 'water_assets', ['id'], unique=False)
+    op.create_table('water_demand',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('location', sa.String(), nullable=False),
+    sa.Column('latitude', sa.Float(), nullable=True),
+    sa.Column('longitude', sa.Float(), nullable=True),
+    sa.Column('demand_amount', sa.Float(), nullable=False),
+    sa.Column('demand_date', sa.DateTime(), nullable=False),
+    sa.Column('demand_type', sa.String(), nullable=True),
+    sa.Column('forecasted', sa.Boolean(), nullable=True),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+    sa.Column('updated_at', sa.DateTime(timezone=True), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_water_demand_id'), 'water_demand', ['id'], unique=False)
+    op.create_table('water_distribution_plans',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('plan_name', sa.String(), nullable=False),
+    sa.Column('description', sa.Text(), nullable=True),
+    sa.Column('start_date', sa.DateTime(), nullable=False),
+    sa.Column('end_date', sa.DateTime(), nullable=False),
+    sa.Column('total_water_allocated', sa.Float(), nullable=False),
+    sa.Column('allocated_to_residential', sa.Float(), nullable=True),
+    sa.Column('allocated_to_commercial', sa.Float(), nullable=True),
+    sa.Column('allocated_to_industrial', sa.Float(), nullable=True),
+    sa.Column('allocated_to_public', sa.Float(), nullable=True),
+    sa.Column('status', sa.String(), nullable=True),
+    sa.Column('created_by', sa.Integer(), nullable=False),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+    sa.Column('updated_at', sa.DateTime(timezone=True), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_water_distribution_plans_id'), 'water_distribution_plans', ['id'], unique=False)
+    op.create_table('water_infrastructure',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('name', sa.String(), nullable=False),
+    sa.Column('type', sa.String(), nullable=False),
+    sa.Column('location', sa.String(), nullable=False),
+    sa.Column('latitude', sa.Float(), nullable=True),
+    sa.Column('longitude', sa.Float(), nullable=True),
+    sa.Column('pressure', sa.Float(), nullable=True),
+    sa.Column('temperature', sa.Float(), nullable=True),
+    sa.Column('leak_detected', sa.Boolean(), nullable=True),
+    sa.Column('last_inspection', sa.DateTime(), nullable=True),
+    sa.Column('condition_status', sa.String(), nullable=True),
+    sa.Column('installation_date', sa.DateTime(), nullable=True),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+    sa.Column('updated_at', sa.DateTime(timezone=True), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_water_infrastructure_id'), 'water_infrastructure', ['id'], unique=False)
+    op.create_table('water_leaks',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('infrastructure_id', sa.Integer(), nullable=False),
+    sa.Column('leak_detected_at', sa.DateTime(), nullable=False),
+    sa.Column('severity', sa.String(), nullable=True),
+    sa.Column('description', sa.Text(), nullable=True),
+    sa.Column('repaired', sa.Boolean(), nullable=True),
+    sa.Column('repair_date', sa.DateTime(), nullable=True),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+    sa.Column('updated_at', sa.DateTime(timezone=True), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_water_leaks_id'), 'water_leaks', ['id'], unique=False)
+    op.create_table('water_quality',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('location', sa.String(), nullable=False),
+    sa.Column('latitude', sa.Float(), nullable=True),
+    sa.Column('longitude', sa.Float(), nullable=True),
+    sa.Column('ph_level', sa.Float(), nullable=True),
+    sa.Column('chlorine_level', sa.Float(), nullable=True),
+    sa.Column('turbidity', sa.Float(), nullable=True),
+    sa.Column('temperature', sa.Float(), nullable=True),
+    sa.Column('dissolved_oxygen', sa.Float(), nullable=True),
+    sa.Column('e_coli', sa.Float(), nullable=True),
+    sa.Column('total_solids', sa.Float(), nullable=True),
+    sa.Column('chemical_oxygen_demand', sa.Float(), nullable=True),
+    sa.Column('biological_oxygen_demand', sa.Float(), nullable=True),
+    sa.Column('date_measured', sa.DateTime(), nullable=False),
+    sa.Column('measured_by', sa.String(), nullable=True),
+    sa.Column('notes', sa.Text(), nullable=True),
+    sa.Column('quality_status', sa.String(), nullable=True),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+    sa.Column('updated_at', sa.DateTime(timezone=True), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_water_quality_id'), 'water_quality', ['id'], unique=False)
+    op.create_table('water_quality_alerts',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('quality_id', sa.Integer(), nullable=False),
+    sa.Column('alert_type', sa.String(), nullable=False),
+    sa.Column('message', sa.Text(), nullable=False),
+    sa.Column('is_active', sa.Boolean(), nullable=True),
+    sa.Column('acknowledged', sa.Boolean(), nullable=True),
+    sa.Column('acknowledged_by', sa.Integer(), nullable=True),
+    sa.Column('acknowledged_at', sa.DateTime(), nullable=True),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+    sa.Column('updated_at', sa.DateTime(timezone=True), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_water_quality_alerts_id'), 'water_quality_alerts', ['id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_water_quality_alerts_id'), table_name='water_quality_alerts')
+    op.drop_table('water_quality_alerts')
+    op.drop_index(op.f('ix_water_quality_id'), table_name='water_quality')
+    op.drop_table('water_quality')
+    op.drop_index(op.f('ix_water_leaks_id'), table_name='water_leaks')
+    op.drop_table('water_leaks')
+    op.drop_index(op.f('ix_water_infrastructure_id'), table_name='water_infrastructure')
+    op.drop_table('water_infrastructure')
+    op.drop_index(op.f('ix_water_distribution_plans_id'), table_name='water_distribution_plans')
+    op.drop_table('water_distribution_plans')
+    op.drop_index(op.f('ix_water_demand_id'), table_name='water_demand')
+    op.drop_table('water_demand')
+    op.drop_index(op.f('ix_water_assets_id'), table_name='water_assets')
+    op.drop_table('water_assets')
+    op.drop_index(op.f('ix_users_username'), table_name='users')
+    op.drop_index(op.f('ix_users_id'), table_name='users')
+    op.drop_index(op.f('ix_users_email'), table_name='users')
+    op.drop_table('users')
+    op.drop_index(op.f('ix_user_payments_id'), table_name='user_payments')
+    op.drop_table('user_payments')
+    op.drop_index(op.f('ix_tariffs_id'), table_name='tariffs')
+    op.drop_table('tariffs')
+    op.drop_index(op.f('ix_sanitation_reports_id'), table_name='sanitation_reports')
+    op.drop_table('sanitation_reports')
+    op.drop_index(op.f('ix_sanitation_facilities_id'), table_name='sanitation_facilities')
+    op.drop_table('sanitation_facilities')
+    op.drop_index(op.f('ix_payment_methods_id'), table_name='payment_methods')
+    op.drop_table('payment_methods')
+    op.drop_index(op.f('ix_notifications_id'), table_name='notifications')
+    op.drop_table('notifications')
+    op.drop_index(op.f('ix_notification_settings_id'), table_name='notification_settings')
+    op.drop_table('notification_settings')
+    op.drop_index(op.f('ix_investment_plans_id'), table_name='investment_plans')
+    op.drop_table('investment_plans')
+    op.drop_index(op.f('ix_complaints_id'), table_name='complaints')
+    op.drop_table('complaints')
+    op.drop_index(op.f('ix_complaint_categories_id'), table_name='complaint_categories')
+    op.drop_table('complaint_categories')
+    op.drop_index(op.f('ix_asset_maintenance_id'), table_name='asset_maintenance')
+    op.drop_table('asset_maintenance')
@@ -0,0 +1,177 @@
+"""Таблицы и индексы, добавленные после исходной схемы 0001 (телеметрия, агрегаты спроса,
+правила качества воды, входящие уведомления и их доставка, индексы координат),
+и индексы по колонкам частых фильтров: утечки и обслуживание по объекту,
+активы к обслуживанию, настройки уведомлений пользователя, спрос по местоположению
+и дате, жалобы по статусу.
+Таблица, уже созданная через Base.metadata.create_all, повторно не создается.
+Индексы существующих таблиц строятся CONCURRENTLY (без блокировки записи в таблицы),
+поэтому вне транзакции
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-18 14:05:12.512840+00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0002'
+down_revision: Union[str, None] = '0001'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Таблицы, которых нет в исходной схеме
+TABLES = [
+    'infrastructure_telemetry',
+    'infrastructure_telemetry_hourly',
+    'notification_counters',
+    'notification_deliveries',
+    'user_notifications',
+    'water_demand_rollups',
+    'water_quality_rules',
+]
+
+# (имя индекса, таблица, колонки, условие частичного индекса)
+INDEXES = [
+    ('ix_complaints_lat_lon', 'complaints', ['latitude', 'longitude'], None),
+    ('ix_sanitation_facilities_lat_lon', 'sanitation_facilities', ['latitude', 'longitude'], None),
+    ('ix_water_assets_lat_lon', 'water_assets', ['latitude', 'longitude'], None),
+    ('ix_water_demand_lat_lon', 'water_demand', ['latitude', 'longitude'], None),
+    ('ix_water_infrastructure_lat_lon', 'water_infrastructure', ['latitude', 'longitude'], None),
+    ('ix_water_quality_lat_lon', 'water_quality', ['latitude', 'longitude'], None),
+    ('ix_notifications_user_read_created', 'notifications', ['user_id', 'is_read', 'created_at'], None),
+    ('ix_water_leaks_infrastructure_id', 'water_leaks', ['infrastructure_id', 'id'], None),
+    ('ix_water_leaks_unrepaired', 'water_leaks', ['infrastructure_id'], 'repaired IS NOT TRUE'),
+    ('ix_asset_maintenance_asset_id', 'asset_maintenance', ['asset_id', 'id'], None),
+    ('ix_water_assets_next_maintenance', 'water_assets', ['next_maintenance'], 'next_maintenance IS NOT NULL'),
+    ('ix_notification_settings_user_type', 'notification_settings', ['user_id', 'notification_type'], None),
+    ('ix_water_demand_location_date', 'water_demand', ['location', 'demand_date'], None),
+    ('ix_water_demand_date', 'water_demand', ['demand_date'], None),
+    ('ix_complaints_status', 'complaints', ['status', 'id'], None),
+]
+
+
+def upgrade() -> None:
+    # База, созданная через Base.metadata.create_all после появления этих таблиц, уже содержит их
+    existing = set() if op.get_context().as_sql else set(sa.inspect(op.get_bind()).get_table_names())
+    if 'infrastructure_telemetry' not in existing:
+        op.create_table('infrastructure_telemetry',
+        sa.Column('infrastructure_id', sa.Integer(), nullable=False),
+        sa.Column('ts', sa.DateTime(timezone=True), nullable=False),
+        sa.Column('pressure', sa.Float(), nullable=True),
+        sa.Column('temperature', sa.Float(), nullable=True),
+        sa.PrimaryKeyConstraint('infrastructure_id', 'ts'),
+        postgresql_partition_by='RANGE (ts)'
+        )
+    if 'infrastructure_telemetry_hourly' not in existing:
+        op.create_table('infrastructure_telemetry_hourly',
+        sa.Column('infrastructure_id', sa.Integer(), nullable=False),
+        sa.Column('bucket', sa.DateTime(timezone=True), nullable=False),
+        sa.Column('samples', sa.Integer(), nullable=False),
+        sa.Column('pressure_count', sa.Integer(), nullable=False),
+        sa.Column('pressure_sum', sa.Float(), nullable=False),
+        sa.Column('pressure_min', sa.Float(), nullable=True),
+        sa.Column('pressure_max', sa.Float(), nullable=True),
+        sa.Column('temperature_count', sa.Integer(), nullable=False),
+        sa.Column('temperature_sum', sa.Float(), nullable=False),
+        sa.Column('temperature_min', sa.Float(), nullable=True),
+        sa.Column('temperature_max', sa.Float(), nullable=True),
+        sa.PrimaryKeyConstraint('infrastructure_id', 'bucket')
+        )
+    if 'notification_counters' not in existing:
+        op.create_table('notification_counters',
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('unread_count', sa.Integer(), nullable=False),
+        sa.PrimaryKeyConstraint('user_id')
+        )
+    if 'notification_deliveries' not in existing:
+        op.create_table('notification_deliveries',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('notification_id', sa.Integer(), nullable=False),
+        sa.Column('channel', sa.String(), nullable=False),
+        sa.Column('status', sa.String(), nullable=False),
+        sa.Column('cursor', sa.Integer(), nullable=False),
+        sa.Column('sent_count', sa.Integer(), nullable=False),
+        sa.Column('attempts', sa.Integer(), nullable=False),
+        sa.Column('next_attempt_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+        sa.Column('last_error', sa.Text(), nullable=True),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+        sa.Column('updated_at', sa.DateTime(timezone=True), nullable=True),
+        sa.PrimaryKeyConstraint('id')
+        )
+        op.create_index(op.f('ix_notification_deliveries_id'), 'notification_deliveries', ['id'], unique=False)
+        op.create_index(op.f('ix_notification_deliveries_notification_id'), 'notification_deliveries', ['notification_id'], unique=False)
+        op.create_index('ix_notification_deliveries_status_next_attempt', 'notification_deliveries', ['status', 'next_attempt_at'], unique=False)
+    if 'user_notifications' not in existing:
+        op.create_table('user_notifications',
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('notification_id', sa.Integer(), nullable=False),
+        sa.Column('is_read', sa.Boolean(), nullable=False),
+        sa.Column('created_at', sa.DateTime(timezone=True), nullable=False),
+        sa.Column('read_at', sa.DateTime(timezone=True), nullable=True),
+        sa.PrimaryKeyConstraint('user_id', 'notification_id')
+        )
+        op.create_index('ix_user_notifications_notification', 'user_notifications', ['notification_id'], unique=False)
+        op.create_index('ix_user_notifications_user_read_created', 'user_notifications', ['user_id', 'is_read', 'created_at'], unique=False)
+    if 'water_demand_rollups' not in existing:
+        op.create_table('water_demand_rollups',
+        sa.Column('granularity', sa.String(), nullable=False),
+        sa.Column('location', sa.String(), nullable=False),
+        sa.Column('demand_type', sa.String(), nullable=False),
+        sa.Column('period_start', sa.DateTime(), nullable=False),
+        sa.Column('total_amount', sa.Float(), nullable=False),
+        sa.Column('samples', sa.Integer(), nullable=False),
+        sa.Column('min_amount', sa.Float(), nullable=True),
+        sa.Column('max_amount', sa.Float(), nullable=True),
+        sa.PrimaryKeyConstraint('granularity', 'location', 'demand_type', 'period_start')
+        )
+        op.create_index('ix_water_demand_rollups_period', 'water_demand_rollups', ['granularity', 'period_start'], unique=False)
+    if 'water_quality_rules' not in existing:
+        op.create_table('water_quality_rules',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('parameter', sa.String(), nullable=False),
+        sa.Column('location', sa.String(), nullable=True),
+        sa.Column('min_value', sa.Float(), nullable=True),
+        sa.Column('max_value', sa.Float(), nullable=True),
+        sa.Column('alert_type', sa.String(), nullable=False),
+        sa.Column('message', sa.Text(), nullable=True),
+        sa.Column('is_active', sa.Boolean(), nullable=True),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+        sa.Column('updated_at', sa.DateTime(timezone=True), nullable=True),
+        sa.PrimaryKeyConstraint('id')
+        )
+        op.create_index(op.f('ix_water_quality_rules_id'), 'water_quality_rules', ['id'], unique=False)
+    with op.get_context().autocommit_block():
+        # Индекс, оставшийся недействительным после прерванного построения, строится заново
+        # (при alembic upgrade --sql база не читается и выводится только DDL)
+        invalid = []
+        if not op.get_context().as_sql:
+            invalid = op.get_bind().execute(
+                sa.text(
+                    "SELECT c.relname FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid "
+                    "WHERE NOT i.indisvalid AND c.relname = ANY(:names)"
+                ),
+                {"names": [name for name, *_ in INDEXES]}
+            ).scalars().all()
+        for name, table, columns, where in INDEXES:
+            if name in invalid:
+                op.drop_index(name, table_name=table, postgresql_concurrently=True)
+            op.create_index(
+                name, table, columns,
+                unique=False,
+                if_not_exists=True,
+                postgresql_concurrently=True,
+                postgresql_where=sa.text(where) if where else None
+            )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        for name, table, columns, where in reversed(INDEXES):
+            op.drop_index(name, table_name=table, if_exists=True, postgresql_concurrently=True)
+    for table in reversed(TABLES):
+        op.drop_table(table)
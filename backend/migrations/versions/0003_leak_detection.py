@@ -0,0 +1,48 @@
+"""Поиск утечек по телеметрии: показания расхода (сырые и почасовые агрегаты),
+источник записи об утечке и состояние инкрементальной проверки по объектам
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-18 15:20:41.207315+00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0003'
+down_revision: Union[str, None] = '0002'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Колонка секционированной таблицы добавляется и во все ее секции
+    op.add_column('infrastructure_telemetry', sa.Column('flow_rate', sa.Float(), nullable=True))
+    # Значение по умолчанию нужно только для заполнения существующих строк
+    op.add_column('infrastructure_telemetry_hourly', sa.Column('flow_rate_count', sa.Integer(), nullable=False, server_default='0'))
+    op.add_column('infrastructure_telemetry_hourly', sa.Column('flow_rate_sum', sa.Float(), nullable=False, server_default='0'))
+    op.alter_column('infrastructure_telemetry_hourly', 'flow_rate_count', server_default=None)
+    op.alter_column('infrastructure_telemetry_hourly', 'flow_rate_sum', server_default=None)
+    op.add_column('infrastructure_telemetry_hourly', sa.Column('flow_rate_min', sa.Float(), nullable=True))
+    op.add_column('infrastructure_telemetry_hourly', sa.Column('flow_rate_max', sa.Float(), nullable=True))
+    op.add_column('water_leaks', sa.Column('source', sa.String(), server_default='manual', nullable=False))
+    op.create_table('leak_detection_state',
+    sa.Column('infrastructure_id', sa.Integer(), nullable=False),
+    sa.Column('scanned_until', sa.DateTime(timezone=True), nullable=False),
+    sa.Column('nights_checked_until', sa.DateTime(timezone=True), nullable=False),
+    sa.PrimaryKeyConstraint('infrastructure_id')
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('leak_detection_state')
+    op.drop_column('water_leaks', 'source')
+    op.drop_column('infrastructure_telemetry_hourly', 'flow_rate_max')
+    op.drop_column('infrastructure_telemetry_hourly', 'flow_rate_min')
+    op.drop_column('infrastructure_telemetry_hourly', 'flow_rate_sum')
+    op.drop_column('infrastructure_telemetry_hourly', 'flow_rate_count')
+    op.drop_column('infrastructure_telemetry', 'flow_rate')
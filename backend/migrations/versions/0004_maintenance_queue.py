@@ -0,0 +1,39 @@
+"""Очередь обслуживания активов: срок и оценка риска по каждому активу
+(заполняется фоновым пересчетом, см. utils/maintenance_scheduler.py)
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-18 14:14:20.795247+00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0004'
+down_revision: Union[str, None] = '0003'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('asset_maintenance_queue',
+    sa.Column('asset_id', sa.Integer(), nullable=False),
+    sa.Column('risk_score', sa.Float(), nullable=False),
+    sa.Column('due_at', sa.DateTime(), nullable=False),
+    sa.Column('age_years', sa.Float(), nullable=False),
+    sa.Column('repairs', sa.Integer(), nullable=False),
+    sa.Column('leaks', sa.Integer(), nullable=False),
+    sa.Column('last_maintenance', sa.DateTime(), nullable=True),
+    sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+    sa.PrimaryKeyConstraint('asset_id')
+    )
+    op.create_index('ix_asset_maintenance_queue_priority', 'asset_maintenance_queue', ['risk_score', 'asset_id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_asset_maintenance_queue_priority', table_name='asset_maintenance_queue')
+    op.drop_table('asset_maintenance_queue')
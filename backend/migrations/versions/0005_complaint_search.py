@@ -0,0 +1,72 @@
+"""Поиск жалоб: вычисляемый поисковый вектор (описание, местоположение, имя),
+GIN-индекс по нему и триграммные индексы pg_trgm для поиска по подстроке.
+Добавление вычисляемой колонки перезаписывает таблицу complaints (под блокировкой);
+индексы строятся CONCURRENTLY, поэтому вне транзакции
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-18 14:24:36.088789+00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision: str = '0005'
+down_revision: Union[str, None] = '0004'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+SEARCH_VECTOR = (
+    "setweight(to_tsvector('russian'::regconfig, description), 'A') || "
+    "setweight(to_tsvector('russian'::regconfig, coalesce(location, '')), 'B') || "
+    "setweight(to_tsvector('russian'::regconfig, full_name), 'C')"
+)
+
+# (имя индекса, колонка, класс операторов)
+INDEXES = [
+    ('ix_complaints_search_vector', 'search_vector', None),
+    ('ix_complaints_description_trgm', 'description', 'gin_trgm_ops'),
+    ('ix_complaints_location_trgm', 'location', 'gin_trgm_ops'),
+    ('ix_complaints_full_name_trgm', 'full_name', 'gin_trgm_ops'),
+]
+
+
+def upgrade() -> None:
+    op.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    op.add_column('complaints', sa.Column(
+        'search_vector', postgresql.TSVECTOR(), sa.Computed(SEARCH_VECTOR, persisted=True), nullable=True
+    ))
+    with op.get_context().autocommit_block():
+        # Индекс, оставшийся недействительным после прерванного построения, строится заново
+        # (при alembic upgrade --sql база не читается и выводится только DDL)
+        invalid = []
+        if not op.get_context().as_sql:
+            invalid = op.get_bind().execute(
+                sa.text(
+                    "SELECT c.relname FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid "
+                    "WHERE NOT i.indisvalid AND c.relname = ANY(:names)"
+                ),
+                {"names": [name for name, *_ in INDEXES]}
+            ).scalars().all()
+        for name, column, ops in INDEXES:
+            if name in invalid:
+                op.drop_index(name, table_name='complaints', postgresql_concurrently=True)
+            op.create_index(
+                name, 'complaints', [column],
+                unique=False,
+                if_not_exists=True,
+                postgresql_concurrently=True,
+                postgresql_using='gin',
+                postgresql_ops={column: ops} if ops else {}
+            )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        for name, column, ops in reversed(INDEXES):
+            op.drop_index(name, table_name='complaints', if_exists=True, postgresql_concurrently=True)
+    op.drop_column('complaints', 'search_vector')
@@ -0,0 +1,71 @@
+"""Инциденты: жалобы одной категории, поступившие рядом по месту и времени
+(см. utils/complaint_clustering.py), и ссылка жалобы на инцидент.
+Индекс жалоб по инциденту строится CONCURRENTLY, поэтому вне транзакции;
+уже существующие жалобы к инцидентам не присоединяются
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-18 14:28:50.390856+00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0006'
+down_revision: Union[str, None] = '0005'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('complaint_clusters',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('category', sa.String(), nullable=False),
+    sa.Column('status', sa.String(), nullable=False),
+    sa.Column('location', sa.String(), nullable=True),
+    sa.Column('latitude', sa.Float(), nullable=False),
+    sa.Column('longitude', sa.Float(), nullable=False),
+    sa.Column('cell_y', sa.Integer(), nullable=False),
+    sa.Column('cell_x', sa.Integer(), nullable=False),
+    sa.Column('complaints', sa.Integer(), nullable=False),
+    sa.Column('first_seen', sa.DateTime(timezone=True), nullable=False),
+    sa.Column('last_seen', sa.DateTime(timezone=True), nullable=False),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+    sa.Column('updated_at', sa.DateTime(timezone=True), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_complaint_clusters_id'), 'complaint_clusters', ['id'], unique=False)
+    op.create_index('ix_complaint_clusters_open_cell', 'complaint_clusters', ['category', 'cell_y', 'cell_x', 'last_seen'], unique=False, postgresql_where=sa.text("status = 'open'"))
+    op.add_column('complaints', sa.Column('cluster_id', sa.Integer(), nullable=True))
+    with op.get_context().autocommit_block():
+        # Индекс, оставшийся недействительным после прерванного построения, строится заново
+        # (при alembic upgrade --sql база не читается и выводится только DDL)
+        invalid = None
+        if not op.get_context().as_sql:
+            invalid = op.get_bind().execute(
+                sa.text(
+                    "SELECT c.relname FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid "
+                    "WHERE NOT i.indisvalid AND c.relname = 'ix_complaints_cluster_id'"
+                )
+            ).scalar()
+        if invalid:
+            op.drop_index('ix_complaints_cluster_id', table_name='complaints', postgresql_concurrently=True)
+        op.create_index(
+            'ix_complaints_cluster_id', 'complaints', ['cluster_id', 'id'],
+            unique=False,
+            if_not_exists=True,
+            postgresql_concurrently=True
+        )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index('ix_complaints_cluster_id', table_name='complaints', if_exists=True, postgresql_concurrently=True)
+    op.drop_column('complaints', 'cluster_id')
+    op.drop_index('ix_complaint_clusters_open_cell', table_name='complaint_clusters', postgresql_where=sa.text("status = 'open'"))
+    op.drop_index(op.f('ix_complaint_clusters_id'), table_name='complaint_clusters')
+    op.drop_table('complaint_clusters')
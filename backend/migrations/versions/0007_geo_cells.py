@@ -0,0 +1,72 @@
+"""Ячейки сетки координат: вычисляемая колонка geo_cell и индекс по ней вместо
+составного индекса (latitude, longitude), который сужает поиск только по широте.
+Добавление вычисляемых колонок перезаписывает таблицы (под блокировкой);
+индексы строятся и удаляются CONCURRENTLY, поэтому вне транзакции
+
+Revision ID: 0007
+Revises: 0006
+Create Date: 2026-10-18 15:02:11.418305+00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0007'
+down_revision: Union[str, None] = '0006'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+GEO_CELL = (
+    "floor((latitude + 90) / 0.01::float8)::bigint * 36000"
+    " + least(floor((longitude + 180) / 0.01::float8)::bigint, 35999)"
+)
+
+TABLES = [
+    'complaints',
+    'sanitation_facilities',
+    'water_assets',
+    'water_demand',
+    'water_infrastructure',
+    'water_quality',
+]
+
+
+def upgrade() -> None:
+    for table in TABLES:
+        op.add_column(table, sa.Column('geo_cell', sa.BigInteger(), sa.Computed(GEO_CELL, persisted=True), nullable=True))
+    with op.get_context().autocommit_block():
+        # Индекс, оставшийся недействительным после прерванного построения, строится заново
+        # (при alembic upgrade --sql база не читается и выводится только DDL)
+        invalid = []
+        if not op.get_context().as_sql:
+            invalid = op.get_bind().execute(
+                sa.text(
+                    "SELECT c.relname FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid "
+                    "WHERE NOT i.indisvalid AND c.relname = ANY(:names)"
+                ),
+                {"names": [f'ix_{table}_geo_cell' for table in TABLES]}
+            ).scalars().all()
+        for table in TABLES:
+            name = f'ix_{table}_geo_cell'
+            if name in invalid:
+                op.drop_index(name, table_name=table, postgresql_concurrently=True)
+            op.create_index(name, table, ['geo_cell'], unique=False, if_not_exists=True, postgresql_concurrently=True)
+            op.drop_index(f'ix_{table}_lat_lon', table_name=table, if_exists=True, postgresql_concurrently=True)
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        for table in reversed(TABLES):
+            op.create_index(
+                f'ix_{table}_lat_lon', table, ['latitude', 'longitude'],
+                unique=False,
+                if_not_exists=True,
+                postgresql_concurrently=True
+            )
+            op.drop_index(f'ix_{table}_geo_cell', table_name=table, if_exists=True, postgresql_concurrently=True)
+    for table in reversed(TABLES):
+        op.drop_column(table, 'geo_cell')
@@ -1,6 +1,7 @@
-from sqlalchemy import Column, Integer, String, Float, DateTime, Boolean, Text
+from sqlalchemy import Column, Integer, String, Float, DateTime, Boolean, Text, Index, text, BigInteger, Computed
 from sqlalchemy.sql import func
 from backend.config.database import Base
+from backend.utils.geo import GEO_CELL_SQL
 
 
 class WaterAsset(Base):
@@ -8,6 +9,13 @@ class WaterAsset(Base):
     Модель для хранения информации об активах водоснабжения
     """
     __tablename__ = "water_assets"
+    __table_args__ = (
+        Index("ix_water_assets_geo_cell", "geo_cell"),  # Поиск по координатам (см. utils/geo.py)
+        Index(
+            "ix_water_assets_next_maintenance", "next_maintenance",
+            postgresql_where=text("next_maintenance IS NOT NULL")
+        ),  # Активы, требующие обслуживания
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     name = Column(String, nullable=False)  # Название актива
@@ -16,6 +24,7 @@ class WaterAsset(Base):
     location = Column(String, nullable=False)  # Местоположение
     latitude = Column(Float, nullable=True)  # Широта
     longitude = Column(Float, nullable=True)  # Долгота
+    geo_cell = Column(BigInteger, Computed(GEO_CELL_SQL, persisted=True))  # Ячейка сетки координат (вычисляется базой)
     installation_date = Column(DateTime, nullable=True)  # Дата установки
     last_maintenance = Column(DateTime, nullable=True)  # Дата последнего обслуживания
     next_maintenance = Column(DateTime, nullable=True)  # Дата следующего обслуживания
@@ -32,6 +41,9 @@ class AssetMaintenance(Base):
     Модель для хранения истории обслуживания активов
     """
     __tablename__ = "asset_maintenance"
+    __table_args__ = (
+        Index("ix_asset_maintenance_asset_id", "asset_id", "id"),  # История обслуживания актива
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     asset_id = Column(Integer, nullable=False)  # ID актива
@@ -42,4 +54,23 @@ class AssetMaintenance(Base):
     maintenance_date = Column(DateTime, nullable=False)  # Дата обслуживания
     next_maintenance_date = Column(DateTime, nullable=True)  # Дата следующего обслуживания
     created_at = Column(DateTime(timezone=True), server_default=func.now())
-    updated_at = Column(DateTime(timezone=True), onupdate=func.now())
\ No newline at end of file
+    updated_at = Column(DateTime(timezone=True), onupdate=func.now())
+
+class AssetMaintenanceQueue(Base):
+    """
+    Очередь обслуживания: срок и оценка риска по каждому активу (см. utils/maintenance_scheduler.py).
+    Запись пересчитывается при изменении актива или истории его обслуживания и периодически в фоне
+    """
+    __tablename__ = "asset_maintenance_queue"
+    __table_args__ = (
+        Index("ix_asset_maintenance_queue_priority", "risk_score", "asset_id"),  # Очередь по убыванию риска
+    )
+
+    asset_id = Column(Integer, primary_key=True)  # ID актива
+    risk_score = Column(Float, nullable=False)  # Оценка риска (приоритет обслуживания)
+    due_at = Column(DateTime, nullable=False)  # Срок обслуживания
+    age_years = Column(Float, nullable=False)  # Возраст актива в годах
+    repairs = Column(Integer, nullable=False)  # Внеплановых обслуживаний и ремонтов за период истории
+    leaks = Column(Integer, nullable=False)  # Утечек на объектах того же местоположения
+    last_maintenance = Column(DateTime, nullable=True)  # Дата последнего обслуживания
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
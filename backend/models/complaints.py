@@ -1,6 +1,8 @@
-from sqlalchemy import Column, Integer, String, Float, DateTime, Boolean, Text
+from sqlalchemy import Column, Integer, String, Float, DateTime, Boolean, Text, Index, Computed, text, BigInteger
+from sqlalchemy.dialects.postgresql import TSVECTOR
 from sqlalchemy.sql import func
 from backend.config.database import Base
+from backend.utils.geo import GEO_CELL_SQL
 
 
 class Complaint(Base):
@@ -8,6 +10,25 @@ class Complaint(Base):
     Модель для хранения жалоб и обращений пользователей
     """
     __tablename__ = "complaints"
+    __table_args__ = (
+        Index("ix_complaints_geo_cell", "geo_cell"),  # Поиск по координатам (см. utils/geo.py)
+        Index("ix_complaints_status", "status", "id"),  # Список жалоб по статусу
+        Index("ix_complaints_cluster_id", "cluster_id", "id"),  # Жалобы инцидента
+        # Полнотекстовый и подстрочный поиск (см. utils/complaint_search.py)
+        Index("ix_complaints_search_vector", "search_vector", postgresql_using="gin"),
+        Index(
+            "ix_complaints_description_trgm", "description",
+            postgresql_using="gin", postgresql_ops={"description": "gin_trgm_ops"}
+        ),
+        Index(
+            "ix_complaints_location_trgm", "location",
+            postgresql_using="gin", postgresql_ops={"location": "gin_trgm_ops"}
+        ),
+        Index(
+            "ix_complaints_full_name_trgm", "full_name",
+            postgresql_using="gin", postgresql_ops={"full_name": "gin_trgm_ops"}
+        ),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, nullable=True)  # ID пользователя (если авторизован)
@@ -18,14 +39,24 @@ class Complaint(Base):
     location = Column(String, nullable=True)  # Местоположение проблемы
     latitude = Column(Float, nullable=True)  # Широта
     longitude = Column(Float, nullable=True)  # Долгота
+    geo_cell = Column(BigInteger, Computed(GEO_CELL_SQL, persisted=True))  # Ячейка сетки координат (вычисляется базой)
     description = Column(Text, nullable=False)  # Описание проблемы
     photo_url = Column(String, nullable=True)  # URL фото (если есть)
     priority = Column(String, default="medium")  # Приоритет (низкий, средний, высокий)
     status = Column(String, default="pending")  # Статус (ожидает, в процессе, решено)
     assigned_to = Column(Integer, nullable=True)  # ID пользователя, назначенного для решения
     resolved_at = Column(DateTime, nullable=True)  # Время решения
+    cluster_id = Column(Integer, nullable=True)  # ID инцидента (кластера похожих жалоб)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
+    # Поисковый вектор (вычисляется базой): описание - вес A, местоположение - B, имя - C.
+    # Конфигурация russian разбирает русские слова русским стеммером, латиницу - английским
+    search_vector = Column(TSVECTOR, Computed(
+        "setweight(to_tsvector('russian'::regconfig, description), 'A') || "
+        "setweight(to_tsvector('russian'::regconfig, coalesce(location, '')), 'B') || "
+        "setweight(to_tsvector('russian'::regconfig, full_name), 'C')",
+        persisted=True
+    ))
 
 
 class ComplaintCategory(Base):
@@ -39,4 +70,32 @@ class ComplaintCategory(Base):
     description = Column(Text, nullable=True)  # Описание категории
     is_active = Column(Boolean, default=True)  # Активна ли категория
     created_at = Column(DateTime(timezone=True), server_default=func.now())
-    updated_at = Column(DateTime(timezone=True), onupdate=func.now())
\ No newline at end of file
+    updated_at = Column(DateTime(timezone=True), onupdate=func.now())
+
+
+class ComplaintCluster(Base):
+    """
+    Модель инцидента: жалобы одной категории, поступившие рядом по месту и времени
+    (см. utils/complaint_clustering.py)
+    """
+    __tablename__ = "complaint_clusters"
+    __table_args__ = (
+        Index(
+            "ix_complaint_clusters_open_cell", "category", "cell_y", "cell_x", "last_seen",
+            postgresql_where=text("status = 'open'")
+        ),  # Поиск открытого инцидента рядом с новой жалобой
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    category = Column(String, nullable=False)  # Категория жалоб
+    status = Column(String, nullable=False, default="open")  # Статус (open - открыт, resolved - решен)
+    location = Column(String, nullable=True)  # Местоположение (из первой жалобы)
+    latitude = Column(Float, nullable=False)  # Широта центра
+    longitude = Column(Float, nullable=False)  # Долгота центра
+    cell_y = Column(Integer, nullable=False)  # Строка ячейки сетки центра
+    cell_x = Column(Integer, nullable=False)  # Столбец ячейки сетки центра
+    complaints = Column(Integer, nullable=False, default=0)  # Количество жалоб
+    first_seen = Column(DateTime(timezone=True), nullable=False)  # Время первой жалобы
+    last_seen = Column(DateTime(timezone=True), nullable=False)  # Время последней жалобы
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), onupdate=func.now())
@@ -1,6 +1,7 @@
-from sqlalchemy import Column, Integer, String, Float, DateTime, Boolean, Text
+from sqlalchemy import Column, Integer, String, Float, DateTime, Boolean, Text, Index, BigInteger, Computed
 from sqlalchemy.sql import func
 from backend.config.database import Base
+from backend.utils.geo import GEO_CELL_SQL
 
 
 class WaterDemand(Base):
@@ -8,11 +9,17 @@ class WaterDemand(Base):
     Модель для хранения данных о спросе на воду
     """
     __tablename__ = "water_demand"
+    __table_args__ = (
+        Index("ix_water_demand_geo_cell", "geo_cell"),  # Поиск по координатам (см. utils/geo.py)
+        Index("ix_water_demand_location_date", "location", "demand_date"),  # История спроса по местоположению
+        Index("ix_water_demand_date", "demand_date"),  # Выборки за период (агрегаты, выгрузка)
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     location = Column(String, nullable=False)  # Местоположение
     latitude = Column(Float, nullable=True)  # Широта
     longitude = Column(Float, nullable=True)  # Долгота
+    geo_cell = Column(BigInteger, Computed(GEO_CELL_SQL, persisted=True))  # Ячейка сетки координат (вычисляется базой)
     demand_amount = Column(Float, nullable=False)  # Объем спроса (в м³)
     demand_date = Column(DateTime, nullable=False)  # Дата спроса
     demand_type = Column(String, default="residential")  # Тип спроса (жилой, коммерческий, промышленный)
@@ -62,4 +69,28 @@ class InvestmentPlan(Base):
     status = Column(String, default="planning")  # Статус плана (планирование, утвержден, реализуется, завершен)
     created_by = Column(Integer, nullable=False)  # ID пользователя, создавшего план
     created_at = Column(DateTime(timezone=True), server_default=func.now())
-    updated_at = Column(DateTime(timezone=True), onupdate=func.now())
\ No newline at end of file
+    updated_at = Column(DateTime(timezone=True), onupdate=func.now())
+
+
+class WaterDemandRollup(Base):
+    """
+    Модель для хранения агрегатов фактического спроса по периодам (час, день, месяц).
+    Обновляется при изменении данных о спросе, прогнозные записи не учитываются
+    """
+    __tablename__ = "water_demand_rollups"
+    __table_args__ = (
+        Index("ix_water_demand_rollups_period", "granularity", "period_start"),
+    )
+
+    granularity = Column(String, primary_key=True)  # Гранулярность (hour, day, month)
+    location = Column(String, primary_key=True)  # Местоположение
+    demand_type = Column(String, primary_key=True)  # Тип спроса
+    period_start = Column(DateTime, primary_key=True)  # Начало периода
+    total_amount = Column(Float, nullable=False, default=0.0)  # Суммарный спрос (в м³)
+    samples = Column(Integer, nullable=False, default=0)  # Количество записей
+    min_amount = Column(Float, nullable=True)  # Минимальный спрос
+    max_amount = Column(Float, nullable=True)  # Максимальный спрос
+
+    @property
+    def avg_amount(self):
+        return self.total_amount / self.samples if self.samples else None
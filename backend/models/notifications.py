@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, DateTime, Boolean, Text
+from sqlalchemy import Column, Integer, String, DateTime, Boolean, Text, Index
 from sqlalchemy.sql import func
 from backend.config.database import Base
 
@@ -20,12 +20,72 @@ class Notification(Base):
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
 
+    __table_args__ = (
+        Index("ix_notifications_user_read_created", "user_id", "is_read", "created_at"),
+    )
+
+
+class UserNotification(Base):
+    """
+    Входящие уведомления пользователя: по строке на каждого получателя уведомления
+    с собственным признаком прочтения
+    """
+    __tablename__ = "user_notifications"
+
+    user_id = Column(Integer, primary_key=True)  # ID получателя
+    notification_id = Column(Integer, primary_key=True)  # ID уведомления
+    is_read = Column(Boolean, default=False, nullable=False)  # Прочитано ли уведомление получателем
+    created_at = Column(DateTime(timezone=True), nullable=False)  # Время создания уведомления
+    read_at = Column(DateTime(timezone=True), nullable=True)  # Время прочтения
+
+    __table_args__ = (
+        Index("ix_user_notifications_user_read_created", "user_id", "is_read", "created_at"),
+        Index("ix_user_notifications_notification", "notification_id"),
+    )
+
+
+class NotificationCounter(Base):
+    """
+    Количество непрочитанных уведомлений пользователя (обновляется вместе с входящими)
+    """
+    __tablename__ = "notification_counters"
+
+    user_id = Column(Integer, primary_key=True)  # ID пользователя
+    unread_count = Column(Integer, default=0, nullable=False)  # Непрочитанных уведомлений
+
+
+class NotificationDelivery(Base):
+    """
+    Задание на доставку уведомления по одному каналу (очередь исходящих).
+    Получатели обрабатываются пакетами по возрастанию ID, cursor - последний обработанный ID
+    """
+    __tablename__ = "notification_deliveries"
+
+    id = Column(Integer, primary_key=True, index=True)
+    notification_id = Column(Integer, nullable=False, index=True)  # ID уведомления
+    channel = Column(String, nullable=False)  # Канал доставки (email, sms, push)
+    status = Column(String, default="pending", nullable=False)  # Статус (pending, done, failed)
+    cursor = Column(Integer, default=0, nullable=False)  # ID последнего обработанного получателя
+    sent_count = Column(Integer, default=0, nullable=False)  # Отправлено сообщений
+    attempts = Column(Integer, default=0, nullable=False)  # Неудачных попыток подряд
+    next_attempt_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)  # Когда задание можно взять в работу
+    last_error = Column(Text, nullable=True)  # Последняя ошибка доставки
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), onupdate=func.now())
+
+    __table_args__ = (
+        Index("ix_notification_deliveries_status_next_attempt", "status", "next_attempt_at"),
+    )
+
 
 class NotificationSetting(Base):
     """
     Модель для хранения настроек уведомлений пользователя
     """
     __tablename__ = "notification_settings"
+    __table_args__ = (
+        Index("ix_notification_settings_user_type", "user_id", "notification_type"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, nullable=False)  # ID пользователя
@@ -1,6 +1,7 @@
-from sqlalchemy import Column, Integer, String, Float, DateTime, Boolean, Text
+from sqlalchemy import Column, Integer, String, Float, DateTime, Boolean, Text, Index, BigInteger, Computed
 from sqlalchemy.sql import func
 from backend.config.database import Base
+from backend.utils.geo import GEO_CELL_SQL
 
 
 class SanitationFacility(Base):
@@ -8,6 +9,9 @@ class SanitationFacility(Base):
     Модель для хранения данных о санитарных сооружениях
     """
     __tablename__ = "sanitation_facilities"
+    __table_args__ = (
+        Index("ix_sanitation_facilities_geo_cell", "geo_cell"),  # Поиск по координатам (см. utils/geo.py)
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     name = Column(String, nullable=False)  # Название сооружения
@@ -15,6 +19,7 @@ class SanitationFacility(Base):
     location = Column(String, nullable=False)  # Местоположение
     latitude = Column(Float, nullable=True)  # Широта
     longitude = Column(Float, nullable=True)  # Долгота
+    geo_cell = Column(BigInteger, Computed(GEO_CELL_SQL, persisted=True))  # Ячейка сетки координат (вычисляется базой)
     capacity = Column(Integer, nullable=True)  # Вместимость
     is_accessible = Column(Boolean, default=False)  # Доступно ли для инвалидов
     is_operational = Column(Boolean, default=True)  # Работает ли сооружение
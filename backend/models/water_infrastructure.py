@@ -1,6 +1,7 @@
-from sqlalchemy import Column, Integer, String, Float, DateTime, Boolean, Text
+from sqlalchemy import Column, Integer, String, Float, DateTime, Boolean, Text, Index, text, BigInteger, Computed
 from sqlalchemy.sql import func
 from backend.config.database import Base
+from backend.utils.geo import GEO_CELL_SQL
 
 
 class WaterInfrastructure(Base):
@@ -8,6 +9,9 @@ class WaterInfrastructure(Base):
     Модель для хранения данных об инфраструктуре водоснабжения
     """
     __tablename__ = "water_infrastructure"
+    __table_args__ = (
+        Index("ix_water_infrastructure_geo_cell", "geo_cell"),  # Поиск по координатам (см. utils/geo.py)
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     name = Column(String, nullable=False)  # Название объекта
@@ -15,6 +19,7 @@ class WaterInfrastructure(Base):
     location = Column(String, nullable=False)  # Местоположение
     latitude = Column(Float, nullable=True)  # Широта
     longitude = Column(Float, nullable=True)  # Долгота
+    geo_cell = Column(BigInteger, Computed(GEO_CELL_SQL, persisted=True))  # Ячейка сетки координат (вычисляется базой)
     pressure = Column(Float, nullable=True)  # Давление
     temperature = Column(Float, nullable=True)  # Температура
     leak_detected = Column(Boolean, default=False)  # Обнаружена ли утечка
@@ -30,6 +35,13 @@ class WaterLeak(Base):
     Модель для хранения данных об утечках воды
     """
     __tablename__ = "water_leaks"
+    __table_args__ = (
+        Index("ix_water_leaks_infrastructure_id", "infrastructure_id", "id"),  # Утечки объекта (постранично по id)
+        Index(
+            "ix_water_leaks_unrepaired", "infrastructure_id",
+            postgresql_where=text("repaired IS NOT TRUE")
+        ),  # Неустраненные утечки (слой карты)
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     infrastructure_id = Column(Integer, nullable=False)  # ID объекта инфраструктуры
@@ -38,5 +50,56 @@ class WaterLeak(Base):
     description = Column(Text, nullable=True)  # Описание утечки
     repaired = Column(Boolean, default=False)  # Устранена ли утечка
     repair_date = Column(DateTime, nullable=True)  # Дата устранения
+    source = Column(String, nullable=False, server_default="manual")  # Источник (manual - вручную, detector - поиск по телеметрии)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
-    updated_at = Column(DateTime(timezone=True), onupdate=func.now())
\ No newline at end of file
+    updated_at = Column(DateTime(timezone=True), onupdate=func.now())
+
+
+class InfrastructureTelemetry(Base):
+    """
+    Модель для хранения истории показаний датчиков инфраструктуры.
+    Таблица только пополняется и секционирована по времени измерения (по месяцам)
+    """
+    __tablename__ = "infrastructure_telemetry"
+    __table_args__ = {"postgresql_partition_by": "RANGE (ts)"}
+
+    infrastructure_id = Column(Integer, primary_key=True)  # ID объекта инфраструктуры
+    ts = Column(DateTime(timezone=True), primary_key=True)  # Время измерения
+    pressure = Column(Float, nullable=True)  # Давление
+    temperature = Column(Float, nullable=True)  # Температура
+    flow_rate = Column(Float, nullable=True)  # Расход
+
+
+class InfrastructureTelemetryHourly(Base):
+    """
+    Модель для хранения почасовых агрегатов телеметрии (обновляются при загрузке показаний)
+    """
+    __tablename__ = "infrastructure_telemetry_hourly"
+
+    infrastructure_id = Column(Integer, primary_key=True)  # ID объекта инфраструктуры
+    bucket = Column(DateTime(timezone=True), primary_key=True)  # Начало часа
+    samples = Column(Integer, nullable=False, default=0)  # Количество показаний
+    pressure_count = Column(Integer, nullable=False, default=0)  # Количество показаний давления
+    pressure_sum = Column(Float, nullable=False, default=0.0)  # Сумма давления
+    pressure_min = Column(Float, nullable=True)  # Минимальное давление
+    pressure_max = Column(Float, nullable=True)  # Максимальное давление
+    temperature_count = Column(Integer, nullable=False, default=0)  # Количество показаний температуры
+    temperature_sum = Column(Float, nullable=False, default=0.0)  # Сумма температуры
+    temperature_min = Column(Float, nullable=True)  # Минимальная температура
+    temperature_max = Column(Float, nullable=True)  # Максимальная температура
+    flow_rate_count = Column(Integer, nullable=False, default=0)  # Количество показаний расхода
+    flow_rate_sum = Column(Float, nullable=False, default=0.0)  # Сумма расхода
+    flow_rate_min = Column(Float, nullable=True)  # Минимальный расход
+    flow_rate_max = Column(Float, nullable=True)  # Максимальный расход
+
+
+class LeakDetectionState(Base):
+    """
+    Модель для хранения состояния поиска утечек по объекту инфраструктуры:
+    до какого показания обработана телеметрия и до какого момента проверены ночи
+    """
+    __tablename__ = "leak_detection_state"
+
+    infrastructure_id = Column(Integer, primary_key=True)  # ID объекта инфраструктуры
+    scanned_until = Column(DateTime(timezone=True), nullable=False)  # Время последнего обработанного показания
+    nights_checked_until = Column(DateTime(timezone=True), nullable=False)  # До какого момента проверен ночной расход
@@ -1,6 +1,7 @@
-from sqlalchemy import Column, Integer, String, Float, DateTime, Boolean, Text
+from sqlalchemy import Column, Integer, String, Float, DateTime, Boolean, Text, Index, BigInteger, Computed
 from sqlalchemy.sql import func
 from backend.config.database import Base
+from backend.utils.geo import GEO_CELL_SQL
 
 
 class WaterQuality(Base):
@@ -8,11 +9,15 @@ class WaterQuality(Base):
     Модель для хранения данных о качестве воды
     """
     __tablename__ = "water_quality"
+    __table_args__ = (
+        Index("ix_water_quality_geo_cell", "geo_cell"),  # Поиск по координатам (см. utils/geo.py)
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     location = Column(String, nullable=False)  # Местоположение точки измерения
     latitude = Column(Float, nullable=True)  # Широта
     longitude = Column(Float, nullable=True)  # Долгота
+    geo_cell = Column(BigInteger, Computed(GEO_CELL_SQL, persisted=True))  # Ячейка сетки координат (вычисляется базой)
     ph_level = Column(Float, nullable=True)  # Уровень pH
     chlorine_level = Column(Float, nullable=True)  # Уровень хлора
     turbidity = Column(Float, nullable=True)  # Мутность
@@ -45,4 +50,24 @@ class WaterQualityAlert(Base):
     acknowledged_by = Column(Integer, nullable=True)  # ID пользователя, подтвердившего уведомление
     acknowledged_at = Column(DateTime, nullable=True)  # Время подтверждения
     created_at = Column(DateTime(timezone=True), server_default=func.now())
-    updated_at = Column(DateTime(timezone=True), onupdate=func.now())
\ No newline at end of file
+    updated_at = Column(DateTime(timezone=True), onupdate=func.now())
+
+
+class WaterQualityRule(Base):
+    """
+    Модель для хранения пороговых правил контроля качества воды.
+    Правило с location задает пороги для конкретной точки и заменяет для нее
+    общие правила (location = NULL) по тому же показателю
+    """
+    __tablename__ = "water_quality_rules"
+
+    id = Column(Integer, primary_key=True, index=True)
+    parameter = Column(String, nullable=False)  # Показатель (ph_level, chlorine_level, turbidity, e_coli и т.д.)
+    location = Column(String, nullable=True)  # Местоположение (NULL - для всех точек)
+    min_value = Column(Float, nullable=True)  # Нижний допустимый порог
+    max_value = Column(Float, nullable=True)  # Верхний допустимый порог
+    alert_type = Column(String, nullable=False, default="warning")  # Тип уведомления (предупреждение, тревога)
+    message = Column(Text, nullable=True)  # Текст уведомления (если не задан, формируется автоматически)
+    is_active = Column(Boolean, default=True)  # Активно ли правило
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), onupdate=func.now())
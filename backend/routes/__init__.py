@@ -9,4 +9,7 @@ from .complaints import router as complaints
 from .tariffs import router as tariffs
 from .assets import router as assets
 from .demand_forecasting import router as demand_forecasting
-from .notifications import router as notifications
\ No newline at end of file
+from .notifications import router as notifications
+from .metrics import router as metrics
+from .maps import router as maps
+from .exports import router as exports
\ No newline at end of file
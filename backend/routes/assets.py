@@ -1,28 +1,72 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, status
 from sqlalchemy.orm import Session
-from typing import List
+from typing import List, Optional
+from datetime import date, datetime
 
 from backend.config.database import get_db
-from backend.models.assets import WaterAsset, AssetMaintenance
+from backend.models.assets import WaterAsset, AssetMaintenance, AssetMaintenanceQueue
+from backend.models.user import User
 from backend.schemas.assets import (
     WaterAssetCreate, 
     WaterAssetUpdate, 
     WaterAssetResponse,
     AssetMaintenanceCreate,
     AssetMaintenanceUpdate,
-    AssetMaintenanceResponse
+    AssetMaintenanceResponse,
+    AssetValuationResponse,
+    MaintenanceQueueItem,
+    MaintenanceQueueRefreshResponse
 )
+from backend.config.settings import ASSET_VALUATION_MAX_YEARS
+from backend.utils.asset_valuation import GROUP_FIELDS, valuation_report
+from backend.utils.crud import CRUDService, apply_update, save
+from backend.utils.geo import GeoFilter
+from backend.utils.maintenance_scheduler import (
+    due_maintenance_statement,
+    refresh_queue_entries,
+    run_maintenance_queue_refresh,
+    update_maintenance_queue
+)
+from backend.utils.pagination import Pagination
+from backend.utils.bulk_crud import BulkHooks, add_bulk_routes, require_parent
+from backend.utils.role_checker import require_engineer
 
 router = APIRouter()
 
+water_asset_crud = CRUDService(WaterAsset, "Актив водоснабжения не найден")
+asset_maintenance_crud = CRUDService(AssetMaintenance, "Запись об обслуживании не найдена")
+
+# Как и одиночные маршруты, пакетные операции пересчитывают очередь обслуживания затронутых активов
+add_bulk_routes(
+    router, WaterAsset, WaterAssetCreate, WaterAssetUpdate,
+    hooks=BulkHooks(after_write=lambda db, operation, old_rows, new_rows, fields: refresh_queue_entries(
+        db, {row["id"] for row in old_rows + new_rows}
+    )),
+    dependencies=[Depends(require_engineer)]
+)
+add_bulk_routes(
+    router, AssetMaintenance, AssetMaintenanceCreate, AssetMaintenanceUpdate,
+    hooks=BulkHooks(
+        validate=require_parent("asset_id", WaterAsset, "Актив водоснабжения не найден"),
+        after_write=lambda db, operation, old_rows, new_rows, fields: refresh_queue_entries(
+            db, {row["asset_id"] for row in old_rows + new_rows}
+        )
+    ),
+    dependencies=[Depends(require_engineer)],
+    path="/maintenance/bulk"
+)
+
 # Маршруты для активов водоснабжения
 @router.get("/", response_model=List[WaterAssetResponse])
-def get_water_assets(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
+def get_water_assets(
+    pagination: Pagination = Depends(),
+    geo: GeoFilter = Depends(),
+    db: Session = Depends(get_db)
+):
     """
     Получить список активов водоснабжения
     """
-    assets = db.query(WaterAsset).offset(skip).limit(limit).all()
-    return assets
+    return water_asset_crud.list(db, pagination, geo)
 
 
 @router.post("/", response_model=WaterAssetResponse)
@@ -33,13 +77,85 @@ def create_water_asset(
     """
     Создать новый актив водоснабжения
     """
-    db_asset = WaterAsset(**asset.dict())
-    db.add(db_asset)
-    db.commit()
-    db.refresh(db_asset)
+    db_asset = water_asset_crud.create(db, asset)
+    update_maintenance_queue(db, [db_asset.id])
     return db_asset
 
 
+@router.get("/valuation", response_model=AssetValuationResponse)
+def get_assets_valuation(
+    group_by: List[str] = Query(["asset_type"], description="Поля группировки: asset_type, location"),
+    years: int = Query(5, ge=0, le=ASSET_VALUATION_MAX_YEARS, description="Горизонт прогноза в годах"),
+    as_of: Optional[date] = Query(None, description="Дата оценки (по умолчанию - сегодня)"),
+    db: Session = Depends(get_db)
+):
+    """
+    Получить остаточную стоимость активов (линейная амортизация) на дату as_of
+    и прогноз на years лет вперед по группам. Отчет пересчитывается только после
+    изменения данных об активах
+    """
+    unknown = [name for name in group_by if name not in GROUP_FIELDS]
+    if unknown or len(set(group_by)) != len(group_by):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Допустимые поля группировки: {', '.join(GROUP_FIELDS)}"
+        )
+    return valuation_report(db, group_by, years, as_of or date.today())
+
+
+# Маршруты для обслуживания активов
+@router.get("/maintenance", response_model=List[AssetMaintenanceResponse])
+def get_all_maintenance_records(pagination: Pagination = Depends(), db: Session = Depends(get_db)):
+    """
+    Получить все записи об обслуживании
+    """
+    return asset_maintenance_crud.list(db, pagination)
+
+
+@router.put("/maintenance/{maintenance_id}", response_model=AssetMaintenanceResponse)
+def update_asset_maintenance(
+    maintenance_id: int,
+    maintenance_update: AssetMaintenanceUpdate,
+    db: Session = Depends(get_db)
+):
+    """
+    Обновить запись обслуживании актива
+    """
+    maintenance = asset_maintenance_crud.get(db, maintenance_id)
+    previous_asset_id = maintenance.asset_id
+    save(db, apply_update(maintenance, maintenance_update.dict(exclude_unset=True)))
+    update_maintenance_queue(db, {previous_asset_id, maintenance.asset_id})
+    return maintenance
+
+
+@router.get("/maintenance-due", response_model=List[MaintenanceQueueItem])
+def get_assets_needing_maintenance(
+    pagination: Pagination = Depends(),
+    due_before: Optional[datetime] = Query(None, description="Срок обслуживания не позднее (по умолчанию - текущее время)"),
+    asset_type: Optional[str] = None,
+    location: Optional[str] = None,
+    db: Session = Depends(get_db)
+):
+    """
+    Получить активы, требующие обслуживания, по убыванию оценки риска
+    (возраст, внеплановые ремонты, утечки по местоположению)
+    """
+    statement = due_maintenance_statement(due_before or datetime.utcnow(), asset_type, location)
+    statement = pagination.apply(
+        statement, AssetMaintenanceQueue.risk_score, AssetMaintenanceQueue.asset_id, descending=True
+    )
+    return pagination.page(db.execute(statement).mappings().all())
+
+
+@router.post("/maintenance-queue/refresh", response_model=MaintenanceQueueRefreshResponse)
+def refresh_maintenance_queue(current_user: User = Depends(require_engineer)):
+    """
+    Пересчитать очередь обслуживания по всем активам. В фоне пересчет выполняется
+    каждые MAINTENANCE_QUEUE_REFRESH_INTERVAL секунд
+    """
+    return run_maintenance_queue_refresh()
+
+
 @router.get("/{asset_id}", response_model=WaterAssetResponse)
 def get_water_asset_by_id(
     asset_id: int, 
@@ -48,15 +164,7 @@ def get_water_asset_by_id(
     """
     Получить актив водоснабжения по ID
     """
-    asset = db.query(WaterAsset).filter(
-        WaterAsset.id == asset_id
-    ).first()
-    if not asset:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Актив водоснабжения не найден"
-        )
-    return asset
+    return water_asset_crud.get_row(db, asset_id)
 
 
 @router.put("/{asset_id}", response_model=WaterAssetResponse)
@@ -68,21 +176,8 @@ def update_water_asset(
     """
     Обновить актив водоснабжения
     """
-    db_asset = db.query(WaterAsset).filter(
-        WaterAsset.id == asset_id
-    ).first()
-    if not db_asset:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Актив водоснабжения не найден"
-        )
-    
-    update_data = asset_update.dict(exclude_unset=True)
-    for field, value in update_data.items():
-        setattr(db_asset, field, value)
-    
-    db.commit()
-    db.refresh(db_asset)
+    db_asset = water_asset_crud.update(db, asset_id, asset_update)
+    update_maintenance_queue(db, [asset_id])
     return db_asset
 
 
@@ -94,35 +189,21 @@ def delete_water_asset(
     """
     Удалить актив водоснабжения
     """
-    db_asset = db.query(WaterAsset).filter(
-        WaterAsset.id == asset_id
-    ).first()
-    if not db_asset:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Актив водоснабжения не найден"
-        )
-    
-    db.delete(db_asset)
-    db.commit()
+    water_asset_crud.delete(db, asset_id)
+    update_maintenance_queue(db, [asset_id])
     return {"message": "Актив водоснабжения успешно удален"}
 
 
-# Маршруты для обслуживания активов
 @router.get("/{asset_id}/maintenance", response_model=List[AssetMaintenanceResponse])
 def get_asset_maintenance_history(
     asset_id: int,
-    skip: int = 0, 
-    limit: int = 100, 
+    pagination: Pagination = Depends(),
     db: Session = Depends(get_db)
 ):
     """
     Получить историю обслуживания актива
     """
-    maintenance_records = db.query(AssetMaintenance).filter(
-        AssetMaintenance.asset_id == asset_id
-    ).offset(skip).limit(limit).all()
-    return maintenance_records
+    return asset_maintenance_crud.list(db, pagination, None, AssetMaintenance.asset_id == asset_id)
 
 
 @router.post("/{asset_id}/maintenance", response_model=AssetMaintenanceResponse)
@@ -135,68 +216,7 @@ def create_asset_maintenance(
     Создать запись об обслуживании актива
     """
     # Проверяем, существует ли актив
-    asset = db.query(WaterAsset).filter(
-        WaterAsset.id == asset_id
-    ).first()
-    if not asset:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Актив водоснабжения не найден"
-        )
-    
-    db_maintenance = AssetMaintenance(
-        asset_id=asset_id,
-        **maintenance.dict()
-    )
-    db.add(db_maintenance)
-    db.commit()
-    db.refresh(db_maintenance)
+    water_asset_crud.get_row(db, asset_id)
+    db_maintenance = asset_maintenance_crud.create(db, maintenance, asset_id=asset_id)
+    update_maintenance_queue(db, [asset_id])
     return db_maintenance
-
-
-@router.get("/maintenance", response_model=List[AssetMaintenanceResponse])
-def get_all_maintenance_records(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
-    """
-    Получить все записи об обслуживании
-    """
-    maintenance_records = db.query(AssetMaintenance).offset(skip).limit(limit).all()
-    return maintenance_records
-
-
-@router.put("/maintenance/{maintenance_id}", response_model=AssetMaintenanceResponse)
-def update_asset_maintenance(
-    maintenance_id: int,
-    maintenance_update: AssetMaintenanceUpdate,
-    db: Session = Depends(get_db)
-):
-    """
-    Обновить запись обслуживании актива
-    """
-    db_maintenance = db.query(AssetMaintenance).filter(
-        AssetMaintenance.id == maintenance_id
-    ).first()
-    if not db_maintenance:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Запись об обслуживании не найдена"
-        )
-    
-    update_data = maintenance_update.dict(exclude_unset=True)
-    for field, value in update_data.items():
-        setattr(db_maintenance, field, value)
-    
-    db.commit()
-    db.refresh(db_maintenance)
-    return db_maintenance
-
-
-@router.get("/maintenance-due", response_model=List[WaterAssetResponse])
-def get_assets_needing_maintenance(db: Session = Depends(get_db)):
-    """
-    Получить активы, требующие обслуживания
-    """
-    from datetime import datetime
-    assets = db.query(WaterAsset).filter(
-        WaterAsset.next_maintenance <= datetime.utcnow()
-    ).all()
-    return assets
\ No newline at end of file
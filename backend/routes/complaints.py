@@ -1,224 +1,321 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
-from typing import List
+from fastapi import APIRouter, Depends, Query, Request
+from sqlalchemy import func, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Optional
 
-from backend.config.database import get_db
-from backend.models.complaints import Complaint, ComplaintCategory
+from backend.config.database import get_async_db
+from backend.models.complaints import Complaint, ComplaintCategory, ComplaintCluster
+from backend.models.user import User
 from backend.schemas.complaints import (
     ComplaintCreate, 
     ComplaintUpdate, 
     ComplaintResponse,
+    ComplaintSearchResult,
     ComplaintCategoryCreate,
     ComplaintCategoryUpdate,
-    ComplaintCategoryResponse
+    ComplaintCategoryResponse,
+    ComplaintClusterResponse
 )
+from backend.utils.complaint_clustering import RESOLVED, complaint_row, update_clusters
+from backend.utils.complaint_search import SEARCH_TRUNCATED_HEADER, headline_html, search_statement
+from backend.utils.crud import CRUDService, apply_update, save_async
+from backend.utils.geo import GeoFilter
+from backend.utils.pagination import Pagination
+from backend.utils.response_cache import COMPLAINT_CATEGORIES, response_cache
+from backend.utils.bulk_crud import BulkHooks, add_bulk_routes
+from backend.utils.map_clusters import track_changed_points
+from backend.utils.role_checker import require_engineer
 
 router = APIRouter()
 
+complaint_crud = CRUDService(Complaint, "Жалоба не найдена")
+complaint_category_crud = CRUDService(ComplaintCategory, "Категория жалоб не найдена")
+complaint_cluster_crud = CRUDService(ComplaintCluster, "Инцидент не найден")
+
+
+def _bulk_after_write(db, operation: str, old_rows: List[dict], new_rows: List[dict], fields) -> None:
+    track_changed_points(db, ("complaints",), old_rows + new_rows)
+    update_clusters(db, old_rows, new_rows)
+
+
+add_bulk_routes(
+    router, Complaint, ComplaintCreate, ComplaintUpdate,
+    hooks=BulkHooks(after_write=_bulk_after_write),
+    dependencies=[Depends(require_engineer)]
+)
+add_bulk_routes(
+    router, ComplaintCategory, ComplaintCategoryCreate, ComplaintCategoryUpdate,
+    hooks=BulkHooks(after_commit=lambda operation, old_rows, new_rows: response_cache.invalidate(COMPLAINT_CATEGORIES)),
+    dependencies=[Depends(require_engineer)],
+    path="/categories/bulk"
+)
+
 @router.get("/", response_model=List[ComplaintResponse])
-def get_complaints(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
+async def get_complaints(
+    pagination: Pagination = Depends(),
+    geo: GeoFilter = Depends(),
+    complaint_status: Optional[str] = Query(None, alias="status"),
+    db: AsyncSession = Depends(get_async_db)
+):
     """
-    Получить список жалоб
+    Получить список жалоб (с фильтром по статусу)
     """
-    complaints = db.query(Complaint).offset(skip).limit(limit).all()
-    return complaints
+    conditions = [Complaint.status == complaint_status] if complaint_status else []
+    return await complaint_crud.list_async(db, pagination, geo, *conditions)
 
 
 @router.post("/", response_model=ComplaintResponse)
-def create_complaint(
+async def create_complaint(
     complaint: ComplaintCreate, 
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
-    Создать новую жалобу
+    Создать новую жалобу (жалоба с координатами присоединяется к инциденту)
     """
     db_complaint = Complaint(**complaint.dict())
     db.add(db_complaint)
-    db.commit()
-    db.refresh(db_complaint)
-    return db_complaint
+    await db.flush()
+    await db.run_sync(update_clusters, [], [complaint_row(db_complaint)])
+    return await save_async(db, db_complaint)
 
 
-@router.get("/{complaint_id}", response_model=ComplaintResponse)
-def get_complaint_by_id(
-    complaint_id: int, 
-    db: Session = Depends(get_db)
+@router.get("/search", response_model=List[ComplaintSearchResult])
+async def search_complaints(
+    q: str = Query(..., min_length=1, max_length=200, description="Слова для поиска или часть местоположения, описания, имени"),
+    pagination: Pagination = Depends(),
+    complaint_status: Optional[str] = Query(None, alias="status"),
+    category: Optional[str] = None,
+    priority: Optional[str] = None,
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
-    Получить жалобу по ID
+    Поиск жалоб по словам описания, местоположения и имени (с учетом словоформ,
+    синтаксис websearch: "фраза", OR, -слово) и по подстроке. Результаты упорядочены
+    по релевантности, в headline - фрагменты описания с выделенными совпадениями
+    (безопасный HTML: текст экранирован, совпадения в <mark>).
+    Упорядочиваются COMPLAINT_SEARCH_CANDIDATES последних совпадений; если совпадений больше,
+    возвращается заголовок X-Search-Truncated: true (стоит уточнить запрос или фильтры)
     """
-    complaint = db.query(Complaint).filter(
-        Complaint.id == complaint_id
-    ).first()
-    if not complaint:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Жалоба не найдена"
-        )
-    return complaint
+    statement = search_statement(pagination, q, complaint_status, category, priority)
+    result = await db.execute(statement)
+    rows = [{**row, "headline": headline_html(row["headline"])} for row in result.mappings()]
+    if rows and rows[0]["truncated"]:
+        pagination.response.headers[SEARCH_TRUNCATED_HEADER] = "true"
+    return pagination.page(rows)
 
 
-@router.put("/{complaint_id}", response_model=ComplaintResponse)
-def update_complaint(
-    complaint_id: int,
-    complaint_update: ComplaintUpdate,
-    db: Session = Depends(get_db)
+# Маршруты для инцидентов (жалоб, объединенных по месту и времени)
+@router.get("/clusters", response_model=List[ComplaintClusterResponse])
+async def get_complaint_clusters(
+    pagination: Pagination = Depends(),
+    geo: GeoFilter = Depends(),
+    category: Optional[str] = None,
+    cluster_status: Optional[str] = Query(None, alias="status"),
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
-    Обновить жалобу
+    Получить список инцидентов (с фильтрами по категории и статусу)
     """
-    db_complaint = db.query(Complaint).filter(
-        Complaint.id == complaint_id
-    ).first()
-    if not db_complaint:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Жалоба не найдена"
-        )
-    
-    update_data = complaint_update.dict(exclude_unset=True)
-    for field, value in update_data.items():
-        setattr(db_complaint, field, value)
-    
-    db.commit()
-    db.refresh(db_complaint)
-    return db_complaint
+    conditions = []
+    if category is not None:
+        conditions.append(ComplaintCluster.category == category)
+    if cluster_status is not None:
+        conditions.append(ComplaintCluster.status == cluster_status)
+    return await complaint_cluster_crud.list_async(db, pagination, geo, *conditions)
 
 
-@router.delete("/{complaint_id}")
-def delete_complaint(
-    complaint_id: int, 
-    db: Session = Depends(get_db)
+@router.get("/clusters/{cluster_id}", response_model=ComplaintClusterResponse)
+async def get_complaint_cluster_by_id(
+    cluster_id: int,
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
-    Удалить жалобу
+    Получить инцидент по ID
     """
-    db_complaint = db.query(Complaint).filter(
-        Complaint.id == complaint_id
-    ).first()
-    if not db_complaint:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Жалоба не найдена"
-        )
-    
-    db.delete(db_complaint)
-    db.commit()
-    return {"message": "Жалоба успешно удалена"}
+    return await complaint_cluster_crud.get_row_async(db, cluster_id)
+
+
+@router.get("/clusters/{cluster_id}/complaints", response_model=List[ComplaintResponse])
+async def get_complaint_cluster_complaints(
+    cluster_id: int,
+    pagination: Pagination = Depends(),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Получить жалобы инцидента
+    """
+    return await complaint_crud.list_async(db, pagination, None, Complaint.cluster_id == cluster_id)
+
+
+@router.patch("/clusters/{cluster_id}/assign")
+async def assign_complaint_cluster(
+    cluster_id: int,
+    assigned_to: int,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: User = Depends(require_engineer)
+):
+    """
+    Назначить все жалобы инцидента на исполнение
+    """
+    await complaint_cluster_crud.get_async(db, cluster_id)
+    await db.execute(update(Complaint).where(Complaint.cluster_id == cluster_id).values(assigned_to=assigned_to))
+    await db.commit()
+    return {"message": "Жалобы инцидента назначены на исполнение"}
+
+
+@router.patch("/clusters/{cluster_id}/resolve")
+async def resolve_complaint_cluster(
+    cluster_id: int,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: User = Depends(require_engineer)
+):
+    """
+    Отметить инцидент и все его жалобы как решенные; новые жалобы рядом образуют новый инцидент
+    """
+    db_cluster = await complaint_cluster_crud.get_async(db, cluster_id)
+
+    db_cluster.status = RESOLVED
+    await db.execute(
+        update(Complaint).where(Complaint.cluster_id == cluster_id, Complaint.status != RESOLVED)
+        .values(status=RESOLVED, resolved_at=func.now())
+    )
+    await db.commit()
+    return {"message": "Инцидент отмечен как решенный"}
 
 
 # Маршруты для категорий жалоб
 @router.get("/categories", response_model=List[ComplaintCategoryResponse])
-def get_complaint_categories(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
+async def get_complaint_categories(
+    request: Request,
+    pagination: Pagination = Depends(),
+    db: AsyncSession = Depends(get_async_db)
+):
     """
     Получить список категорий жалоб
     """
-    categories = db.query(ComplaintCategory).offset(skip).limit(limit).all()
-    return categories
+    key, cached = response_cache.lookup(request, COMPLAINT_CATEGORIES)
+    if cached is not None:
+        return cached
+    categories = await complaint_category_crud.list_async(db, pagination)
+    return response_cache.store(key, request, List[ComplaintCategoryResponse], categories, pagination.response)
 
 
 @router.post("/categories", response_model=ComplaintCategoryResponse)
-def create_complaint_category(
+async def create_complaint_category(
     category: ComplaintCategoryCreate, 
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Создать новую категорию жалоб
     """
-    db_category = ComplaintCategory(**category.dict())
-    db.add(db_category)
-    db.commit()
-    db.refresh(db_category)
+    db_category = await complaint_category_crud.create_async(db, category)
+    response_cache.invalidate(COMPLAINT_CATEGORIES)
     return db_category
 
 
 @router.get("/categories/{category_id}", response_model=ComplaintCategoryResponse)
-def get_complaint_category_by_id(
+async def get_complaint_category_by_id(
     category_id: int, 
-    db: Session = Depends(get_db)
+    request: Request,
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Получить категорию жалоб по ID
     """
-    category = db.query(ComplaintCategory).filter(
-        ComplaintCategory.id == category_id
-    ).first()
-    if not category:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Категория жалоб не найдена"
-        )
-    return category
+    key, cached = response_cache.lookup(request, COMPLAINT_CATEGORIES)
+    if cached is not None:
+        return cached
+    category = await complaint_category_crud.get_row_async(db, category_id)
+    return response_cache.store(key, request, ComplaintCategoryResponse, category)
 
 
 @router.put("/categories/{category_id}", response_model=ComplaintCategoryResponse)
-def update_complaint_category(
+async def update_complaint_category(
     category_id: int,
     category_update: ComplaintCategoryUpdate,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Обновить категорию жалоб
     """
-    db_category = db.query(ComplaintCategory).filter(
-        ComplaintCategory.id == category_id
-    ).first()
-    if not db_category:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Категория жалоб не найдена"
-        )
-    
-    update_data = category_update.dict(exclude_unset=True)
-    for field, value in update_data.items():
-        setattr(db_category, field, value)
-    
-    db.commit()
-    db.refresh(db_category)
+    db_category = await complaint_category_crud.update_async(db, category_id, category_update)
+    response_cache.invalidate(COMPLAINT_CATEGORIES)
     return db_category
 
 
+# Маршруты для отдельной жалобы (после статических путей, иначе /{complaint_id} перехватывает их)
+@router.get("/{complaint_id}", response_model=ComplaintResponse)
+async def get_complaint_by_id(
+    complaint_id: int, 
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Получить жалобу по ID
+    """
+    return await complaint_crud.get_row_async(db, complaint_id)
+
+
+@router.put("/{complaint_id}", response_model=ComplaintResponse)
+async def update_complaint(
+    complaint_id: int,
+    complaint_update: ComplaintUpdate,
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Обновить жалобу (при смене категории или координат жалоба присоединяется к инциденту заново)
+    """
+    db_complaint = await complaint_crud.get_async(db, complaint_id)
+    old_row = complaint_row(db_complaint)
+    apply_update(db_complaint, complaint_update.dict(exclude_unset=True))
+    await db.flush()
+    await db.run_sync(update_clusters, [old_row], [complaint_row(db_complaint)])
+    return await save_async(db, db_complaint)
+
+
+@router.delete("/{complaint_id}")
+async def delete_complaint(
+    complaint_id: int, 
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Удалить жалобу
+    """
+    db_complaint = await complaint_crud.get_async(db, complaint_id)
+    old_row = complaint_row(db_complaint)
+    await db.delete(db_complaint)
+    await db.flush()
+    await db.run_sync(update_clusters, [old_row], [])
+    await db.commit()
+    return {"message": "Жалоба успешно удалена"}
+
+
 @router.patch("/{complaint_id}/assign")
-def assign_complaint(
+async def assign_complaint(
     complaint_id: int,
     assigned_to: int,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Назначить жалобу на исполнение
     """
-    db_complaint = db.query(Complaint).filter(
-        Complaint.id == complaint_id
-    ).first()
-    if not db_complaint:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Жалоба не найдена"
-        )
+    db_complaint = await complaint_crud.get_async(db, complaint_id)
     
     db_complaint.assigned_to = assigned_to
-    db.commit()
+    await db.commit()
     return {"message": "Жалоба назначена на исполнение"}
 
 
 @router.patch("/{complaint_id}/resolve")
-def resolve_complaint(
+async def resolve_complaint(
     complaint_id: int,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Отметить жалобу как решенную
     """
-    db_complaint = db.query(Complaint).filter(
-        Complaint.id == complaint_id
-    ).first()
-    if not db_complaint:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Жалоба не найдена"
-        )
+    db_complaint = await complaint_crud.get_async(db, complaint_id)
     
     db_complaint.status = "resolved"
-    db_complaint.resolved_at = db.func.now()
-    db.commit()
+    db_complaint.resolved_at = func.now()
+    await db.commit()
     return {"message": "Жалоба отмечена как решенная"}
\ No newline at end of file
@@ -1,9 +1,11 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, status
 from sqlalchemy.orm import Session
-from typing import List
+from typing import List, Optional
+from datetime import datetime
 
 from backend.config.database import get_db
-from backend.models.demand_forecasting import WaterDemand, WaterDistributionPlan, InvestmentPlan
+from backend.models.demand_forecasting import WaterDemand, WaterDistributionPlan, InvestmentPlan, WaterDemandRollup
+from backend.models.user import User
 from backend.schemas.demand_forecasting import (
     WaterDemandCreate, 
     WaterDemandUpdate, 
@@ -13,19 +15,66 @@ from backend.schemas.demand_forecasting import (
     WaterDistributionPlanResponse,
     InvestmentPlanCreate,
     InvestmentPlanUpdate,
-    InvestmentPlanResponse
+    InvestmentPlanResponse,
+    WaterDemandAggregateResponse,
+    DemandForecastResponse,
+    DemandForecastRunResponse
 )
+from backend.config.settings import FORECAST_MAX_HORIZON
+from backend.utils.crud import CRUDService, apply_update
+from backend.utils.demand_rollups import GRANULARITIES, add_to_rollups, demand_key, rebuild_rollups, refresh_rollups
+from backend.utils.forecasting import fit_models, invalidate_forecasts, persist_forecasts
+from backend.utils.geo import GeoFilter
+from backend.utils.pagination import Pagination
+from backend.utils.role_checker import require_admin, require_engineer
+from backend.utils.bulk_crud import CREATE, BulkHooks, add_bulk_routes
 
 router = APIRouter()
 
+water_demand_crud = CRUDService(WaterDemand, "Данные о спросе не найдены")
+water_distribution_plan_crud = CRUDService(WaterDistributionPlan, "План распределения не найден")
+investment_plan_crud = CRUDService(InvestmentPlan, "Инвестиционный план не найден")
+
+
+def _bulk_update_rollups(db: Session, operation: str, old_rows: List[dict], new_rows: List[dict], fields) -> None:
+    if operation == CREATE:
+        add_to_rollups(db, new_rows)
+    else:
+        refresh_rollups(db, {demand_key(row) for row in old_rows + new_rows})
+
+
+add_bulk_routes(
+    router, WaterDemand, WaterDemandCreate, WaterDemandUpdate,
+    hooks=BulkHooks(
+        after_write=_bulk_update_rollups,
+        after_commit=lambda operation, old_rows, new_rows: invalidate_forecasts(
+            {row["location"] for row in old_rows + new_rows}
+        )
+    ),
+    dependencies=[Depends(require_engineer)]
+)
+add_bulk_routes(
+    router, WaterDistributionPlan, WaterDistributionPlanCreate, WaterDistributionPlanUpdate,
+    dependencies=[Depends(require_engineer)],
+    path="/distribution-plans/bulk"
+)
+add_bulk_routes(
+    router, InvestmentPlan, InvestmentPlanCreate, InvestmentPlanUpdate,
+    dependencies=[Depends(require_engineer)],
+    path="/investment-plans/bulk"
+)
+
 # Маршруты для данных о спросе
 @router.get("/", response_model=List[WaterDemandResponse])
-def get_water_demand_data(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
+def get_water_demand_data(
+    pagination: Pagination = Depends(),
+    geo: GeoFilter = Depends(),
+    db: Session = Depends(get_db)
+):
     """
     Получить список данных о спросе на воду
     """
-    demand_data = db.query(WaterDemand).offset(skip).limit(limit).all()
-    return demand_data
+    return water_demand_crud.list(db, pagination, geo)
 
 
 @router.post("/", response_model=WaterDemandResponse)
@@ -38,11 +87,106 @@ def create_water_demand_data(
     """
     db_demand = WaterDemand(**demand_data.dict())
     db.add(db_demand)
+    db.flush()
+    add_to_rollups(db, [db_demand])
     db.commit()
-    db.refresh(db_demand)
+    invalidate_forecasts([db_demand.location])
     return db_demand
 
 
+# Маршруты для прогноза спроса
+@router.get("/forecast", response_model=List[DemandForecastResponse])
+def get_demand_forecast(
+    location: Optional[str] = None,
+    demand_type: Optional[str] = None,
+    horizon: int = Query(14, ge=1, le=FORECAST_MAX_HORIZON),
+    db: Session = Depends(get_db)
+):
+    """
+    Получить прогноз спроса на horizon дней вперед для каждого местоположения и типа спроса.
+    Модели обучаются по дневным агрегатам фактического спроса и кэшируются
+    """
+    return [
+        {
+            "location": model.location,
+            "demand_type": model.demand_type,
+            "last_observed": model.last_observed,
+            "alpha": model.alpha,
+            "beta": model.beta,
+            "points": [{"date": date, "amount": amount} for date, amount in model.forecast(horizon)]
+        }
+        for model in fit_models(db, location, demand_type)
+    ]
+
+
+@router.post("/forecast", response_model=DemandForecastRunResponse)
+def run_demand_forecast(
+    location: Optional[str] = None,
+    demand_type: Optional[str] = None,
+    horizon: int = Query(14, ge=1, le=FORECAST_MAX_HORIZON),
+    current_user: User = Depends(require_engineer),
+    db: Session = Depends(get_db)
+):
+    """
+    Рассчитать прогноз и сохранить его в данные о спросе (forecasted=True),
+    заменив ранее сохраненные будущие прогнозы
+    """
+    models = fit_models(db, location, demand_type)
+    rows_written = persist_forecasts(db, models, horizon)
+    db.commit()
+    return {"series": len(models), "rows_written": rows_written}
+
+
+# Маршруты для агрегатов спроса
+@router.get("/aggregate", response_model=List[WaterDemandAggregateResponse])
+def get_demand_aggregate(
+    granularity: str = "day",
+    location: Optional[str] = None,
+    demand_type: Optional[str] = None,
+    date_from: Optional[datetime] = None,
+    date_to: Optional[datetime] = None,
+    pagination: Pagination = Depends(),
+    db: Session = Depends(get_db)
+):
+    """
+    Получить агрегаты фактического спроса по часам, дням или месяцам
+    для каждого местоположения и типа спроса
+    """
+    if granularity not in GRANULARITIES:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Допустимые значения гранулярности: {', '.join(GRANULARITIES)}"
+        )
+    query = db.query(WaterDemandRollup).filter(WaterDemandRollup.granularity == granularity)
+    if location:
+        query = query.filter(WaterDemandRollup.location == location)
+    if demand_type:
+        query = query.filter(WaterDemandRollup.demand_type == demand_type)
+    if date_from:
+        query = query.filter(WaterDemandRollup.period_start >= date_from)
+    if date_to:
+        query = query.filter(WaterDemandRollup.period_start <= date_to)
+    return pagination.paginate(
+        query,
+        WaterDemandRollup.period_start,
+        WaterDemandRollup.location,
+        WaterDemandRollup.demand_type
+    )
+
+
+@router.post("/aggregate/rebuild")
+def rebuild_demand_aggregate(
+    current_user: User = Depends(require_admin),
+    db: Session = Depends(get_db)
+):
+    """
+    Пересобрать агрегаты спроса из исходных данных
+    """
+    rebuild_rollups(db)
+    db.commit()
+    return {"message": "Агрегаты спроса пересобраны"}
+
+
 @router.get("/{demand_id}", response_model=WaterDemandResponse)
 def get_water_demand_by_id(
     demand_id: int, 
@@ -51,15 +195,7 @@ def get_water_demand_by_id(
     """
     Получить данные о спросе на воду по ID
     """
-    demand = db.query(WaterDemand).filter(
-        WaterDemand.id == demand_id
-    ).first()
-    if not demand:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Данные о спросе не найдены"
-        )
-    return demand
+    return water_demand_crud.get_row(db, demand_id)
 
 
 @router.put("/{demand_id}", response_model=WaterDemandResponse)
@@ -71,21 +207,17 @@ def update_water_demand(
     """
     Обновить данные о спросе на воду
     """
-    db_demand = db.query(WaterDemand).filter(
-        WaterDemand.id == demand_id
-    ).first()
-    if not db_demand:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Данные о спросе не найдены"
-        )
+    db_demand = water_demand_crud.get(db, demand_id)
     
+    affected_keys = {demand_key(db_demand)}
     update_data = demand_update.dict(exclude_unset=True)
-    for field, value in update_data.items():
-        setattr(db_demand, field, value)
+    apply_update(db_demand, update_data)
     
+    db.flush()
+    affected_keys.add(demand_key(db_demand))
+    refresh_rollups(db, affected_keys)
     db.commit()
-    db.refresh(db_demand)
+    invalidate_forecasts(key[0] for key in affected_keys)
     return db_demand
 
 
@@ -97,28 +229,24 @@ def delete_water_demand(
     """
     Удалить данные о спросе на воду
     """
-    db_demand = db.query(WaterDemand).filter(
-        WaterDemand.id == demand_id
-    ).first()
-    if not db_demand:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Данные о спросе не найдены"
-        )
+    db_demand = water_demand_crud.get(db, demand_id)
     
+    affected_keys = {demand_key(db_demand)}
     db.delete(db_demand)
+    db.flush()
+    refresh_rollups(db, affected_keys)
     db.commit()
+    invalidate_forecasts(key[0] for key in affected_keys)
     return {"message": "Данные о спросе успешно удалены"}
 
 
 # Маршруты для планов распределения воды
 @router.get("/distribution-plans", response_model=List[WaterDistributionPlanResponse])
-def get_distribution_plans(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
+def get_distribution_plans(pagination: Pagination = Depends(), db: Session = Depends(get_db)):
     """
     Получить список планов распределения воды
     """
-    plans = db.query(WaterDistributionPlan).offset(skip).limit(limit).all()
-    return plans
+    return water_distribution_plan_crud.list(db, pagination)
 
 
 @router.post("/distribution-plans", response_model=WaterDistributionPlanResponse)
@@ -129,11 +257,7 @@ def create_distribution_plan(
     """
     Создать новый план распределения воды
     """
-    db_plan = WaterDistributionPlan(**plan.dict())
-    db.add(db_plan)
-    db.commit()
-    db.refresh(db_plan)
-    return db_plan
+    return water_distribution_plan_crud.create(db, plan)
 
 
 @router.get("/distribution-plans/{plan_id}", response_model=WaterDistributionPlanResponse)
@@ -144,15 +268,7 @@ def get_distribution_plan_by_id(
     """
     Получить план распределения воды по ID
     """
-    plan = db.query(WaterDistributionPlan).filter(
-        WaterDistributionPlan.id == plan_id
-    ).first()
-    if not plan:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="План распределения не найден"
-        )
-    return plan
+    return water_distribution_plan_crud.get_row(db, plan_id)
 
 
 @router.put("/distribution-plans/{plan_id}", response_model=WaterDistributionPlanResponse)
@@ -164,32 +280,16 @@ def update_distribution_plan(
     """
     Обновить план распределения воды
     """
-    db_plan = db.query(WaterDistributionPlan).filter(
-        WaterDistributionPlan.id == plan_id
-    ).first()
-    if not db_plan:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="План распределения не найден"
-        )
-    
-    update_data = plan_update.dict(exclude_unset=True)
-    for field, value in update_data.items():
-        setattr(db_plan, field, value)
-    
-    db.commit()
-    db.refresh(db_plan)
-    return db_plan
+    return water_distribution_plan_crud.update(db, plan_id, plan_update)
 
 
 # Маршруты для инвестиционных планов
 @router.get("/investment-plans", response_model=List[InvestmentPlanResponse])
-def get_investment_plans(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
+def get_investment_plans(pagination: Pagination = Depends(), db: Session = Depends(get_db)):
     """
     Получить список инвестиционных планов
     """
-    plans = db.query(InvestmentPlan).offset(skip).limit(limit).all()
-    return plans
+    return investment_plan_crud.list(db, pagination)
 
 
 @router.post("/investment-plans", response_model=InvestmentPlanResponse)
@@ -200,11 +300,7 @@ def create_investment_plan(
     """
     Создать новый инвестиционный план
     """
-    db_plan = InvestmentPlan(**plan.dict())
-    db.add(db_plan)
-    db.commit()
-    db.refresh(db_plan)
-    return db_plan
+    return investment_plan_crud.create(db, plan)
 
 
 @router.get("/investment-plans/{plan_id}", response_model=InvestmentPlanResponse)
@@ -215,15 +311,7 @@ def get_investment_plan_by_id(
     """
     Получить инвестиционный план по ID
     """
-    plan = db.query(InvestmentPlan).filter(
-        InvestmentPlan.id == plan_id
-    ).first()
-    if not plan:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Инвестиционный план не найден"
-        )
-    return plan
+    return investment_plan_crud.get_row(db, plan_id)
 
 
 @router.put("/investment-plans/{plan_id}", response_model=InvestmentPlanResponse)
@@ -235,45 +323,4 @@ def update_investment_plan(
     """
     Обновить инвестиционный план
     """
-    db_plan = db.query(InvestmentPlan).filter(
-        InvestmentPlan.id == plan_id
-    ).first()
-    if not db_plan:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Инвестиционный план не найден"
-        )
-    
-    update_data = plan_update.dict(exclude_unset=True)
-    for field, value in update_data.items():
-        setattr(db_plan, field, value)
-    
-    db.commit()
-    db.refresh(db_plan)
-    return db_plan
-
-
-# Маршрут для прогноза спроса
-@router.get("/forecast", response_model=List[WaterDemandResponse])
-def get_demand_forecast(
-    location: str = None,
-    date_from: str = None,
-    date_to: str = None,
-    db: Session = Depends(get_db)
-):
-    """
-    Получить прогноз спроса на основе исторических данных
-    """
-    query = db.query(WaterDemand)
-    
-    if location:
-        query = query.filter(WaterDemand.location == location)
-    if date_from:
-        from datetime import datetime
-        query = query.filter(WaterDemand.demand_date >= datetime.fromisoformat(date_from))
-    if date_to:
-        from datetime import datetime
-        query = query.filter(WaterDemand.demand_date <= datetime.fromisoformat(date_to))
-    
-    forecast_data = query.all()
-    return forecast_data
\ No newline at end of file
+    return investment_plan_crud.update(db, plan_id, plan_update)
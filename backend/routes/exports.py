@@ -0,0 +1,98 @@
+from fastapi import APIRouter, Depends, Query
+from fastapi.responses import StreamingResponse
+from typing import Optional
+from datetime import datetime
+
+from backend.models.demand_forecasting import WaterDemand
+from backend.models.tariffs import UserPayment
+from backend.models.water_quality import WaterQuality
+from backend.utils.export import EXPORT_FORMATS, ExportDataset, check_format, stream_export
+from backend.utils.role_checker import require_engineer
+
+router = APIRouter(dependencies=[Depends(require_engineer)])
+
+water_quality_export = ExportDataset(WaterQuality, WaterQuality.date_measured)
+water_demand_export = ExportDataset(WaterDemand, WaterDemand.demand_date)
+user_payment_export = ExportDataset(UserPayment, UserPayment.payment_date)
+
+FORMAT_QUERY = Query("csv", alias="format", description="Формат выгрузки: csv, arrow или parquet")
+COLUMNS_QUERY = Query(None, description="Выгружаемые колонки через запятую (по умолчанию все)")
+
+
+def export_response(
+    dataset: ExportDataset,
+    data_format: str,
+    columns: Optional[str],
+    date_from: Optional[datetime],
+    date_to: Optional[datetime],
+    **filters
+) -> StreamingResponse:
+    """
+    Формирует потоковый ответ с выгрузкой. Параметры проверяются до начала передачи
+    """
+    data_format = check_format(data_format)
+    selected = dataset.select_columns(
+        [name.strip() for name in columns.split(",") if name.strip()] if columns else None
+    )
+    media_type, extension = EXPORT_FORMATS[data_format]
+    return StreamingResponse(
+        stream_export(dataset.statement(selected, date_from, date_to, **filters), selected, data_format),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{dataset.name}.{extension}"'}
+    )
+
+
+@router.get("/water-quality")
+def export_water_quality(
+    data_format: str = FORMAT_QUERY,
+    columns: Optional[str] = COLUMNS_QUERY,
+    date_from: Optional[datetime] = None,
+    date_to: Optional[datetime] = None,
+    location: Optional[str] = None,
+    quality_status: Optional[str] = None
+):
+    """
+    Выгрузить измерения качества воды за период [date_from, date_to) в порядке даты измерения
+    """
+    return export_response(
+        water_quality_export, data_format, columns, date_from, date_to,
+        location=location, quality_status=quality_status
+    )
+
+
+@router.get("/water-demand")
+def export_water_demand(
+    data_format: str = FORMAT_QUERY,
+    columns: Optional[str] = COLUMNS_QUERY,
+    date_from: Optional[datetime] = None,
+    date_to: Optional[datetime] = None,
+    location: Optional[str] = None,
+    demand_type: Optional[str] = None,
+    forecasted: Optional[bool] = None
+):
+    """
+    Выгрузить данные о спросе на воду за период [date_from, date_to) в порядке даты спроса
+    """
+    return export_response(
+        water_demand_export, data_format, columns, date_from, date_to,
+        location=location, demand_type=demand_type, forecasted=forecasted
+    )
+
+
+@router.get("/user-payments")
+def export_user_payments(
+    data_format: str = FORMAT_QUERY,
+    columns: Optional[str] = COLUMNS_QUERY,
+    date_from: Optional[datetime] = None,
+    date_to: Optional[datetime] = None,
+    user_id: Optional[int] = None,
+    tariff_id: Optional[int] = None,
+    payment_status: Optional[str] = Query(None, alias="status")
+):
+    """
+    Выгрузить платежи пользователей за период [date_from, date_to) в порядке даты платежа
+    """
+    return export_response(
+        user_payment_export, data_format, columns, date_from, date_to,
+        user_id=user_id, tariff_id=tariff_id, status=payment_status
+    )
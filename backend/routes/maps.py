@@ -0,0 +1,42 @@
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from sqlalchemy.orm import Session
+
+from backend.config.database import get_db
+from backend.config.settings import MAP_MAX_TILES, MAP_MAX_ZOOM
+from backend.schemas.map import MapClustersResponse
+from backend.utils.geo import parse_bbox
+from backend.utils.map_clusters import LAYERS, get_clusters, tiles_for_bbox
+
+router = APIRouter()
+
+@router.get("/clusters", response_model=MapClustersResponse)
+def get_map_clusters(
+    layer: str = Query(..., description="Слой: infrastructure, leaks или complaints"),
+    zoom: int = Query(..., ge=0, le=MAP_MAX_ZOOM),
+    within_bbox: str = Query(..., description="Область карты: min_lon,min_lat,max_lon,max_lat"),
+    db: Session = Depends(get_db)
+):
+    """
+    Получить кластеры объектов слоя для области карты within_bbox на масштабе zoom.
+    Кластеры считаются по тайлам и кэшируются до изменения объектов в тайле
+    """
+    map_layer = LAYERS.get(layer)
+    if map_layer is None:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Неизвестный слой карты. Допустимые значения: {', '.join(LAYERS)}"
+        )
+
+    columns, rows = tiles_for_bbox(zoom, *parse_bbox(within_bbox))
+    if len(columns) * len(rows) > MAP_MAX_TILES:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Слишком большая область карты для данного масштаба"
+        )
+
+    return {
+        "layer": layer,
+        "zoom": zoom,
+        "tiles": len(columns) * len(rows),
+        "clusters": get_clusters(db, map_layer, zoom, columns, rows)
+    }
@@ -0,0 +1,13 @@
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+
+from backend.utils.db_metrics import render_prometheus
+
+router = APIRouter()
+
+@router.get("", response_class=PlainTextResponse)
+def get_metrics():
+    """
+    Метрики пулов подключений к базе данных в формате Prometheus (для текущего процесса-воркера)
+    """
+    return PlainTextResponse(render_prometheus(), media_type="text/plain; version=0.0.4")
@@ -1,211 +1,381 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
-from typing import List
+import asyncio
+import json
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Request, status
+from fastapi.responses import StreamingResponse
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Optional
 
-from backend.config.database import get_db
-from backend.models.notifications import Notification, NotificationSetting
+from backend.config.database import AsyncSessionLocal, get_async_db
+from backend.config.settings import (
+    NOTIFICATIONS_SSE_HEARTBEAT,
+    NOTIFICATIONS_SSE_QUEUE_SIZE,
+    NOTIFICATIONS_SSE_REPLAY_LIMIT
+)
+from backend.models.notifications import Notification, NotificationDelivery, NotificationSetting, UserNotification
 from backend.schemas.notifications import (
     NotificationCreate, 
     NotificationUpdate, 
     NotificationResponse,
+    NotificationIds,
+    NotificationDeliveryResponse,
+    NotificationReadResult,
+    UnreadCountResponse,
     NotificationSettingCreate,
     NotificationSettingUpdate,
     NotificationSettingResponse
 )
+from backend.utils import notification_inbox
+from backend.utils.auth import UserPrincipal, get_current_active_user, get_user_from_token
+from backend.utils.crud import CRUDService, apply_update, save_async
+from backend.utils.notification_broker import (
+    broker,
+    event_data,
+    load_muted_types,
+    notify_created,
+    notify_settings_changed,
+    visible_condition
+)
+from backend.utils.notification_delivery import INBOX, cancel_statement, delivery_workers, enqueue
+from backend.utils.pagination import Pagination
 
 router = APIRouter()
 
+notification_crud = CRUDService(Notification, "Уведомление не найдено")
+notification_setting_crud = CRUDService(NotificationSetting, "Настройки уведомлений не найдены")
+
 # Маршруты для уведомлений
 @router.get("/", response_model=List[NotificationResponse])
-def get_notifications(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
+async def get_notifications(pagination: Pagination = Depends(), db: AsyncSession = Depends(get_async_db)):
     """
     Получить список уведомлений
     """
-    notifications = db.query(Notification).offset(skip).limit(limit).all()
-    return notifications
+    return await notification_crud.list_async(db, pagination)
+
+
+# Колонки уведомления с признаком прочтения из входящих пользователя
+_inbox_columns = [column for column in Notification.__table__.c if column.name not in ("is_read", "created_at")] + [
+    UserNotification.is_read,
+    UserNotification.created_at,
+    UserNotification.notification_id,
+]
 
 
 @router.get("/user", response_model=List[NotificationResponse])
-def get_user_notifications(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
+async def get_user_notifications(
+    unread_only: bool = False,
+    pagination: Pagination = Depends(),
+    current_user: UserPrincipal = Depends(get_current_active_user),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Получить уведомления для текущего пользователя (новые первыми)
+    """
+    statement = select(*_inbox_columns).join(
+        Notification, Notification.id == UserNotification.notification_id
+    ).filter(UserNotification.user_id == current_user.id)
+    if unread_only:
+        statement = statement.filter(UserNotification.is_read.is_(False))
+    result = await db.execute(pagination.apply(
+        statement, UserNotification.created_at, UserNotification.notification_id, descending=True
+    ))
+    return pagination.page(result.mappings().all())
+
+
+@router.get("/user/unread-count", response_model=UnreadCountResponse)
+async def get_unread_count(
+    current_user: UserPrincipal = Depends(get_current_active_user),
+    db: AsyncSession = Depends(get_async_db)
+):
     """
-    Получить уведомления для текущего пользователя
+    Количество непрочитанных уведомлений текущего пользователя
     """
-    # В реальном приложении здесь будет фильтрация по текущему пользователю
-    notifications = db.query(Notification).offset(skip).limit(limit).all()
-    return notifications
+    return {"unread_count": await notification_inbox.unread_count(db, current_user.id)}
 
 
 @router.post("/", response_model=NotificationResponse)
-def create_notification(
+async def create_notification(
     notification: NotificationCreate, 
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Создать новое уведомление
     """
     db_notification = Notification(**notification.dict())
     db.add(db_notification)
-    db.commit()
-    db.refresh(db_notification)
+    await db.flush()
+    await _fan_out(db, db_notification)
+    enqueue(db, db_notification.id)
+    # Подключения всех воркеров получают уведомление после commit (LISTEN/NOTIFY)
+    await db.execute(notify_created(db_notification.id))
+    await db.commit()
+    delivery_workers.wake()
     return db_notification
 
 
+async def _fan_out(db: AsyncSession, notification: Notification) -> None:
+    """
+    Персональное уведомление сразу попадает во входящие получателя, общее
+    раскладывается по входящим в фоне, чтобы не задерживать запрос
+    """
+    if notification.user_id is not None:
+        await notification_inbox.deliver(db, notification)
+    else:
+        enqueue(db, notification.id, [INBOX])
+
+
+def _format_event(data: dict) -> str:
+    return f"id: {data['id']}\nevent: notification\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+async def _notification_events(request: Request, user: UserPrincipal, last_event_id: Optional[int]):
+    """
+    Поток событий подключения: сначала уведомления, пропущенные после last_event_id,
+    затем новые уведомления по мере создания
+    """
+    # Подписка оформляется до чтения пропущенных уведомлений, чтобы не потерять созданные в промежутке
+    async with AsyncSessionLocal() as db:
+        muted_types = await load_muted_types(db, user.id)
+        subscriber = broker.subscribe(user, muted_types, NOTIFICATIONS_SSE_QUEUE_SIZE)
+        try:
+            missed = []
+            if last_event_id is not None:
+                statement = select(Notification).filter(
+                    Notification.id > last_event_id,
+                    visible_condition(user)
+                )
+                if muted_types:
+                    statement = statement.filter(Notification.notification_type.notin_(muted_types))
+                result = await db.execute(
+                    statement.order_by(Notification.id).limit(NOTIFICATIONS_SSE_REPLAY_LIMIT)
+                )
+                missed = [event_data(notification) for notification in result.scalars().all()]
+        except BaseException:
+            broker.unsubscribe(subscriber)
+            raise
+
+    try:
+        # Интервал переподключения клиента в миллисекундах
+        yield "retry: 3000\n\n"
+        sent_id = last_event_id or 0
+        for data in missed:
+            sent_id = data["id"]
+            yield _format_event(data)
+
+        while not await request.is_disconnected():
+            try:
+                data = await asyncio.wait_for(subscriber.queue.get(), timeout=NOTIFICATIONS_SSE_HEARTBEAT)
+            except asyncio.TimeoutError:
+                yield ": ping\n\n"
+                continue
+            if data is None:
+                # Очередь переполнена: клиент переподключится и получит пропущенное по Last-Event-ID
+                break
+            if data["id"] <= sent_id:
+                continue
+            sent_id = data["id"]
+            yield _format_event(data)
+    finally:
+        broker.unsubscribe(subscriber)
+
+
+@router.get("/stream")
+async def stream_notifications(
+    request: Request,
+    token: str = Query(..., description="JWT токен (EventSource не передает заголовок Authorization)"),
+    last_event_id: Optional[int] = Header(None, alias="Last-Event-ID")
+):
+    """
+    Поток новых уведомлений текущего пользователя (Server-Sent Events).
+    Учитываются адресат, целевая аудитория и настройки уведомлений пользователя (push-канал)
+    """
+    user = await get_user_from_token(token)
+    if not user.is_active:
+        raise HTTPException(status_code=400, detail="Inactive user")
+    return StreamingResponse(
+        _notification_events(request, user, last_event_id),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
 @router.get("/{notification_id}", response_model=NotificationResponse)
-def get_notification_by_id(
+async def get_notification_by_id(
     notification_id: int, 
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Получить уведомление по ID
     """
-    notification = db.query(Notification).filter(
-        Notification.id == notification_id
-    ).first()
-    if not notification:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Уведомление не найдено"
-        )
-    return notification
+    return await notification_crud.get_row_async(db, notification_id)
+
+
+@router.get("/{notification_id}/deliveries", response_model=List[NotificationDeliveryResponse])
+async def get_notification_deliveries(
+    notification_id: int,
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Состояние доставки уведомления по каналам
+    """
+    result = await db.execute(
+        select(NotificationDelivery).filter(
+            NotificationDelivery.notification_id == notification_id
+        ).order_by(NotificationDelivery.id)
+    )
+    return result.scalars().all()
 
 
 @router.put("/{notification_id}", response_model=NotificationResponse)
-def update_notification(
+async def update_notification(
     notification_id: int,
     notification_update: NotificationUpdate,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Обновить уведомление
     """
-    db_notification = db.query(Notification).filter(
-        Notification.id == notification_id
-    ).first()
-    if not db_notification:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Уведомление не найдено"
-        )
+    db_notification = await notification_crud.get_async(db, notification_id)
     
+    recipients = (db_notification.user_id, db_notification.target_audience)
     update_data = notification_update.dict(exclude_unset=True)
-    for field, value in update_data.items():
-        setattr(db_notification, field, value)
+    apply_update(db_notification, update_data)
     
-    db.commit()
-    db.refresh(db_notification)
+    if (db_notification.user_id, db_notification.target_audience) != recipients:
+        # Сменились получатели: уведомление заново раскладывается по входящим
+        await db.execute(cancel_statement(notification_id, INBOX))
+        await notification_inbox.withdraw(db, notification_id)
+        await _fan_out(db, db_notification)
+    await save_async(db, db_notification)
+    delivery_workers.wake()
     return db_notification
 
 
 @router.delete("/{notification_id}")
-def delete_notification(
+async def delete_notification(
     notification_id: int, 
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Удалить уведомление
     """
-    db_notification = db.query(Notification).filter(
-        Notification.id == notification_id
-    ).first()
-    if not db_notification:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Уведомление не найдено"
-        )
+    db_notification = await notification_crud.get_async(db, notification_id)
     
-    db.delete(db_notification)
-    db.commit()
+    await notification_inbox.withdraw(db, notification_id)
+    await db.delete(db_notification)
+    await db.commit()
     return {"message": "Уведомление успешно удалено"}
 
 
 # Маршруты для настроек уведомлений
 @router.get("/settings/{user_id}", response_model=List[NotificationSettingResponse])
-def get_user_notification_settings(
+async def get_user_notification_settings(
     user_id: int,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Получить настройки уведомлений для пользователя
     """
-    settings = db.query(NotificationSetting).filter(
+    result = await db.execute(select(NotificationSetting).filter(
         NotificationSetting.user_id == user_id
-    ).all()
+    ))
+    settings = result.scalars().all()
     return settings
 
 
 @router.post("/settings", response_model=NotificationSettingResponse)
-def create_notification_setting(
+async def create_notification_setting(
     setting: NotificationSettingCreate, 
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Создать новые настройки уведомлений
     """
-    db_setting = NotificationSetting(**setting.dict())
-    db.add(db_setting)
-    db.commit()
-    db.refresh(db_setting)
+    db_setting = await notification_setting_crud.create_async(db, setting)
+    await db.execute(notify_settings_changed(db_setting.user_id))
+    await db.commit()
     return db_setting
 
 
 @router.put("/settings/{setting_id}", response_model=NotificationSettingResponse)
-def update_notification_setting(
+async def update_notification_setting(
     setting_id: int,
     setting_update: NotificationSettingUpdate,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Обновить настройки уведомлений
     """
-    db_setting = db.query(NotificationSetting).filter(
-        NotificationSetting.id == setting_id
-    ).first()
-    if not db_setting:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Настройки уведомлений не найдены"
-        )
+    db_setting = await notification_setting_crud.get_async(db, setting_id)
     
+    previous_user_id = db_setting.user_id
     update_data = setting_update.dict(exclude_unset=True)
-    for field, value in update_data.items():
-        setattr(db_setting, field, value)
+    apply_update(db_setting, update_data)
     
-    db.commit()
-    db.refresh(db_setting)
+    for user_id in {previous_user_id, db_setting.user_id}:
+        await db.execute(notify_settings_changed(user_id))
+    await save_async(db, db_setting)
     return db_setting
 
 
 # Маршруты для управления уведомлениями
+@router.patch("/read", response_model=NotificationReadResult)
+async def mark_notifications_as_read(
+    ids: NotificationIds,
+    current_user: UserPrincipal = Depends(get_current_active_user),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Отметить уведомления текущего пользователя как прочитанные
+    """
+    updated = await notification_inbox.set_read(db, current_user.id, True, ids.notification_ids)
+    await db.commit()
+    return {"updated": updated, "unread_count": await notification_inbox.unread_count(db, current_user.id)}
+
+
+@router.patch("/unread", response_model=NotificationReadResult)
+async def mark_notifications_as_unread(
+    ids: NotificationIds,
+    current_user: UserPrincipal = Depends(get_current_active_user),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Отметить уведомления текущего пользователя как непрочитанные
+    """
+    updated = await notification_inbox.set_read(db, current_user.id, False, ids.notification_ids)
+    await db.commit()
+    return {"updated": updated, "unread_count": await notification_inbox.unread_count(db, current_user.id)}
+
+
+@router.patch("/read-all")
+async def mark_all_notifications_as_read(
+    current_user: UserPrincipal = Depends(get_current_active_user),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Отметить все уведомления текущего пользователя как прочитанные
+    """
+    await notification_inbox.set_read(db, current_user.id, True)
+    await db.commit()
+    return {"message": "Все уведомления отмечены как прочитанные"}
+
+
 @router.patch("/{notification_id}/read")
-def mark_notification_as_read(
+async def mark_notification_as_read(
     notification_id: int,
-    db: Session = Depends(get_db)
+    current_user: UserPrincipal = Depends(get_current_active_user),
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Отметить уведомление как прочитанное
     """
-    db_notification = db.query(Notification).filter(
-        Notification.id == notification_id
-    ).first()
-    if not db_notification:
+    entry = await db.get(UserNotification, (current_user.id, notification_id))
+    if not entry:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Уведомление не найдено"
         )
     
-    db_notification.is_read = True
-    db.commit()
-    return {"message": "Уведомление отмечено как прочитанное"}
-
-
-@router.patch("/read-all")
-def mark_all_notifications_as_read(
-    db: Session = Depends(get_db)
-):
-    """
-    Отметить все уведомления как прочитанные
-    """
-    # В реальном приложении здесь будет фильтрация по текущему пользователю
-    db.query(Notification).update({Notification.is_read: True})
-    db.commit()
-    return {"message": "Все уведомления отмечены как прочитанные"}
\ No newline at end of file
+    await notification_inbox.set_read(db, current_user.id, True, [notification_id])
+    await db.commit()
+    return {"message": "Уведомление отмечено как прочитанное"}
\ No newline at end of file
@@ -1,4 +1,4 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends
 from sqlalchemy.orm import Session
 from typing import List
 
@@ -12,16 +12,37 @@ from backend.schemas.sanitation import (
     SanitationReportUpdate,
     SanitationReportResponse
 )
+from backend.utils.crud import CRUDService
+from backend.utils.geo import GeoFilter
+from backend.utils.pagination import Pagination
+from backend.utils.bulk_crud import add_bulk_routes
+from backend.utils.role_checker import require_engineer
 
 router = APIRouter()
 
+sanitation_facility_crud = CRUDService(SanitationFacility, "Санитарное сооружение не найдено")
+sanitation_report_crud = CRUDService(SanitationReport, "Отчет о санитарии не найден")
+
+add_bulk_routes(
+    router, SanitationFacility, SanitationFacilityCreate, SanitationFacilityUpdate,
+    dependencies=[Depends(require_engineer)]
+)
+add_bulk_routes(
+    router, SanitationReport, SanitationReportCreate, SanitationReportUpdate,
+    dependencies=[Depends(require_engineer)],
+    path="/reports/bulk"
+)
+
 @router.get("/", response_model=List[SanitationFacilityResponse])
-def get_sanitation_facilities(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
+def get_sanitation_facilities(
+    pagination: Pagination = Depends(),
+    geo: GeoFilter = Depends(),
+    db: Session = Depends(get_db)
+):
     """
     Получить список санитарных сооружений
     """
-    facilities = db.query(SanitationFacility).offset(skip).limit(limit).all()
-    return facilities
+    return sanitation_facility_crud.list(db, pagination, geo)
 
 
 @router.post("/", response_model=SanitationFacilityResponse)
@@ -32,11 +53,7 @@ def create_sanitation_facility(
     """
     Создать новое санитарное сооружение
     """
-    db_facility = SanitationFacility(**facility.dict())
-    db.add(db_facility)
-    db.commit()
-    db.refresh(db_facility)
-    return db_facility
+    return sanitation_facility_crud.create(db, facility)
 
 
 @router.get("/{facility_id}", response_model=SanitationFacilityResponse)
@@ -47,15 +64,7 @@ def get_sanitation_facility_by_id(
     """
     Получить санитарное сооружение по ID
     """
-    facility = db.query(SanitationFacility).filter(
-        SanitationFacility.id == facility_id
-    ).first()
-    if not facility:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Санитарное сооружение не найдено"
-        )
-    return facility
+    return sanitation_facility_crud.get_row(db, facility_id)
 
 
 @router.put("/{facility_id}", response_model=SanitationFacilityResponse)
@@ -67,22 +76,7 @@ def update_sanitation_facility(
     """
     Обновить санитарное сооружение
     """
-    db_facility = db.query(SanitationFacility).filter(
-        SanitationFacility.id == facility_id
-    ).first()
-    if not db_facility:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Санитарное сооружение не найдено"
-        )
-    
-    update_data = facility_update.dict(exclude_unset=True)
-    for field, value in update_data.items():
-        setattr(db_facility, field, value)
-    
-    db.commit()
-    db.refresh(db_facility)
-    return db_facility
+    return sanitation_facility_crud.update(db, facility_id, facility_update)
 
 
 @router.delete("/{facility_id}")
@@ -93,28 +87,17 @@ def delete_sanitation_facility(
     """
     Удалить санитарное сооружение
     """
-    db_facility = db.query(SanitationFacility).filter(
-        SanitationFacility.id == facility_id
-    ).first()
-    if not db_facility:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Санитарное сооружение не найдено"
-        )
-    
-    db.delete(db_facility)
-    db.commit()
+    sanitation_facility_crud.delete(db, facility_id)
     return {"message": "Санитарное сооружение успешно удалено"}
 
 
 # Маршруты для отчетов о санитарии
 @router.get("/reports", response_model=List[SanitationReportResponse])
-def get_sanitation_reports(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
+def get_sanitation_reports(pagination: Pagination = Depends(), db: Session = Depends(get_db)):
     """
     Получить список отчетов о санитарии
     """
-    reports = db.query(SanitationReport).offset(skip).limit(limit).all()
-    return reports
+    return sanitation_report_crud.list(db, pagination)
 
 
 @router.post("/reports", response_model=SanitationReportResponse)
@@ -125,11 +108,7 @@ def create_sanitation_report(
     """
     Создать новый отчет о санитарии
     """
-    db_report = SanitationReport(**report.dict())
-    db.add(db_report)
-    db.commit()
-    db.refresh(db_report)
-    return db_report
+    return sanitation_report_crud.create(db, report)
 
 
 @router.get("/reports/{report_id}", response_model=SanitationReportResponse)
@@ -140,15 +119,7 @@ def get_sanitation_report_by_id(
     """
     Получить отчет о санитарии по ID
     """
-    report = db.query(SanitationReport).filter(
-        SanitationReport.id == report_id
-    ).first()
-    if not report:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Отчет о санитарии не найден"
-        )
-    return report
+    return sanitation_report_crud.get_row(db, report_id)
 
 
 @router.put("/reports/{report_id}", response_model=SanitationReportResponse)
@@ -160,19 +131,4 @@ def update_sanitation_report(
     """
     Обновить отчет о санитарии
     """
-    db_report = db.query(SanitationReport).filter(
-        SanitationReport.id == report_id
-    ).first()
-    if not db_report:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Отчет о санитарии не найден"
-        )
-    
-    update_data = report_update.dict(exclude_unset=True)
-    for field, value in update_data.items():
-        setattr(db_report, field, value)
-    
-    db.commit()
-    db.refresh(db_report)
-    return db_report
\ No newline at end of file
+    return sanitation_report_crud.update(db, report_id, report_update)
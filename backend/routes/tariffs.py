@@ -1,4 +1,4 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, Request
 from sqlalchemy.orm import Session
 from typing import List
 
@@ -15,17 +15,46 @@ from backend.schemas.tariffs import (
     UserPaymentUpdate,
     UserPaymentResponse
 )
+from backend.utils.crud import CRUDService
+from backend.utils.pagination import Pagination
+from backend.utils.response_cache import PAYMENT_METHODS, TARIFFS, response_cache
+from backend.utils.bulk_crud import BulkHooks, add_bulk_routes
+from backend.utils.role_checker import require_engineer
 
 router = APIRouter()
 
+user_payment_crud = CRUDService(UserPayment, "Платеж не найден")
+tariff_crud = CRUDService(Tariff, "Тариф не найден")
+payment_method_crud = CRUDService(PaymentMethod, "Способ оплаты не найден")
+
+add_bulk_routes(
+    router, Tariff, TariffCreate, TariffUpdate,
+    hooks=BulkHooks(after_commit=lambda operation, old_rows, new_rows: response_cache.invalidate(TARIFFS)),
+    dependencies=[Depends(require_engineer)]
+)
+add_bulk_routes(
+    router, PaymentMethod, PaymentMethodCreate, PaymentMethodUpdate,
+    hooks=BulkHooks(after_commit=lambda operation, old_rows, new_rows: response_cache.invalidate(PAYMENT_METHODS)),
+    dependencies=[Depends(require_engineer)],
+    path="/payment-methods/bulk"
+)
+add_bulk_routes(
+    router, UserPayment, UserPaymentCreate, UserPaymentUpdate,
+    dependencies=[Depends(require_engineer)],
+    path="/payments/bulk"
+)
+
 # Маршруты для тарифов
 @router.get("/", response_model=List[TariffResponse])
-def get_tariffs(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
+def get_tariffs(request: Request, pagination: Pagination = Depends(), db: Session = Depends(get_db)):
     """
     Получить список тарифов
     """
-    tariffs = db.query(Tariff).offset(skip).limit(limit).all()
-    return tariffs
+    key, cached = response_cache.lookup(request, TARIFFS)
+    if cached is not None:
+        return cached
+    tariffs = tariff_crud.list(db, pagination)
+    return response_cache.store(key, request, List[TariffResponse], tariffs, pagination.response)
 
 
 @router.post("/", response_model=TariffResponse)
@@ -36,89 +65,22 @@ def create_tariff(
     """
     Создать новый тариф
     """
-    db_tariff = Tariff(**tariff.dict())
-    db.add(db_tariff)
-    db.commit()
-    db.refresh(db_tariff)
+    db_tariff = tariff_crud.create(db, tariff)
+    response_cache.invalidate(TARIFFS)
     return db_tariff
 
 
-@router.get("/{tariff_id}", response_model=TariffResponse)
-def get_tariff_by_id(
-    tariff_id: int, 
-    db: Session = Depends(get_db)
-):
-    """
-    Получить тариф по ID
-    """
-    tariff = db.query(Tariff).filter(
-        Tariff.id == tariff_id
-    ).first()
-    if not tariff:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Тариф не найден"
-        )
-    return tariff
-
-
-@router.put("/{tariff_id}", response_model=TariffResponse)
-def update_tariff(
-    tariff_id: int,
-    tariff_update: TariffUpdate,
-    db: Session = Depends(get_db)
-):
-    """
-    Обновить тариф
-    """
-    db_tariff = db.query(Tariff).filter(
-        Tariff.id == tariff_id
-    ).first()
-    if not db_tariff:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Тариф не найден"
-        )
-    
-    update_data = tariff_update.dict(exclude_unset=True)
-    for field, value in update_data.items():
-        setattr(db_tariff, field, value)
-    
-    db.commit()
-    db.refresh(db_tariff)
-    return db_tariff
-
-
-@router.delete("/{tariff_id}")
-def delete_tariff(
-    tariff_id: int, 
-    db: Session = Depends(get_db)
-):
-    """
-    Удалить тариф
-    """
-    db_tariff = db.query(Tariff).filter(
-        Tariff.id == tariff_id
-    ).first()
-    if not db_tariff:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Тариф не найден"
-        )
-    
-    db.delete(db_tariff)
-    db.commit()
-    return {"message": "Тариф успешно удален"}
-
-
 # Маршруты для способов оплаты
 @router.get("/payment-methods", response_model=List[PaymentMethodResponse])
-def get_payment_methods(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
+def get_payment_methods(request: Request, pagination: Pagination = Depends(), db: Session = Depends(get_db)):
     """
     Получить список способов оплаты
     """
-    methods = db.query(PaymentMethod).offset(skip).limit(limit).all()
-    return methods
+    key, cached = response_cache.lookup(request, PAYMENT_METHODS)
+    if cached is not None:
+        return cached
+    methods = payment_method_crud.list(db, pagination)
+    return response_cache.store(key, request, List[PaymentMethodResponse], methods, pagination.response)
 
 
 @router.post("/payment-methods", response_model=PaymentMethodResponse)
@@ -129,30 +91,25 @@ def create_payment_method(
     """
     Создать новый способ оплаты
     """
-    db_method = PaymentMethod(**method.dict())
-    db.add(db_method)
-    db.commit()
-    db.refresh(db_method)
+    db_method = payment_method_crud.create(db, method)
+    response_cache.invalidate(PAYMENT_METHODS)
     return db_method
 
 
 @router.get("/payment-methods/{method_id}", response_model=PaymentMethodResponse)
 def get_payment_method_by_id(
     method_id: int, 
+    request: Request,
     db: Session = Depends(get_db)
 ):
     """
     Получить способ оплаты по ID
     """
-    method = db.query(PaymentMethod).filter(
-        PaymentMethod.id == method_id
-    ).first()
-    if not method:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Способ оплаты не найден"
-        )
-    return method
+    key, cached = response_cache.lookup(request, PAYMENT_METHODS)
+    if cached is not None:
+        return cached
+    method = payment_method_crud.get_row(db, method_id)
+    return response_cache.store(key, request, PaymentMethodResponse, method)
 
 
 @router.put("/payment-methods/{method_id}", response_model=PaymentMethodResponse)
@@ -164,32 +121,18 @@ def update_payment_method(
     """
     Обновить способ оплаты
     """
-    db_method = db.query(PaymentMethod).filter(
-        PaymentMethod.id == method_id
-    ).first()
-    if not db_method:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Способ оплаты не найден"
-        )
-    
-    update_data = method_update.dict(exclude_unset=True)
-    for field, value in update_data.items():
-        setattr(db_method, field, value)
-    
-    db.commit()
-    db.refresh(db_method)
+    db_method = payment_method_crud.update(db, method_id, method_update)
+    response_cache.invalidate(PAYMENT_METHODS)
     return db_method
 
 
 # Маршруты для платежей пользователей
 @router.get("/payments", response_model=List[UserPaymentResponse])
-def get_user_payments(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
+def get_user_payments(pagination: Pagination = Depends(), db: Session = Depends(get_db)):
     """
     Получить список платежей пользователей
     """
-    payments = db.query(UserPayment).offset(skip).limit(limit).all()
-    return payments
+    return user_payment_crud.list(db, pagination)
 
 
 @router.post("/payments", response_model=UserPaymentResponse)
@@ -200,11 +143,7 @@ def create_user_payment(
     """
     Создать новый платеж пользователя
     """
-    db_payment = UserPayment(**payment.dict())
-    db.add(db_payment)
-    db.commit()
-    db.refresh(db_payment)
-    return db_payment
+    return user_payment_crud.create(db, payment)
 
 
 @router.get("/payments/{payment_id}", response_model=UserPaymentResponse)
@@ -215,12 +154,48 @@ def get_user_payment_by_id(
     """
     Получить платеж пользователя по ID
     """
-    payment = db.query(UserPayment).filter(
-        UserPayment.id == payment_id
-    ).first()
-    if not payment:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Платеж не найден"
-        )
-    return payment
\ No newline at end of file
+    return user_payment_crud.get_row(db, payment_id)
+
+
+# Маршруты для отдельного тарифа (после статических путей, иначе /{tariff_id} перехватывает их)
+@router.get("/{tariff_id}", response_model=TariffResponse)
+def get_tariff_by_id(
+    tariff_id: int, 
+    request: Request,
+    db: Session = Depends(get_db)
+):
+    """
+    Получить тариф по ID
+    """
+    key, cached = response_cache.lookup(request, TARIFFS)
+    if cached is not None:
+        return cached
+    tariff = tariff_crud.get_row(db, tariff_id)
+    return response_cache.store(key, request, TariffResponse, tariff)
+
+
+@router.put("/{tariff_id}", response_model=TariffResponse)
+def update_tariff(
+    tariff_id: int,
+    tariff_update: TariffUpdate,
+    db: Session = Depends(get_db)
+):
+    """
+    Обновить тариф
+    """
+    db_tariff = tariff_crud.update(db, tariff_id, tariff_update)
+    response_cache.invalidate(TARIFFS)
+    return db_tariff
+
+
+@router.delete("/{tariff_id}")
+def delete_tariff(
+    tariff_id: int, 
+    db: Session = Depends(get_db)
+):
+    """
+    Удалить тариф
+    """
+    tariff_crud.delete(db, tariff_id)
+    response_cache.invalidate(TARIFFS)
+    return {"message": "Тариф успешно удален"}
\ No newline at end of file
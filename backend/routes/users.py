@@ -4,13 +4,18 @@ from typing import List
 from datetime import timedelta
 
 from backend.config.database import get_db
+from backend.models.notifications import NotificationCounter, UserNotification
 from backend.models.user import User, UserRole
 from backend.schemas.user import UserCreate, UserUpdate, UserResponse
-from backend.utils.auth import get_password_hash, authenticate_user, create_access_token, ACCESS_TOKEN_EXPIRE_MINUTES, get_current_active_user
+from backend.utils.auth import get_password_hash, authenticate_user, create_access_token, ACCESS_TOKEN_EXPIRE_MINUTES, get_current_active_user, invalidate_user
+from backend.utils.crud import CRUDService, apply_update, save
 from backend.utils.role_checker import require_admin, require_delete_user, require_edit_user
+from backend.utils.pagination import Pagination
 
 router = APIRouter()
 
+user_crud = CRUDService(User, "Пользователь не найден")
+
 @router.post("/", response_model=UserResponse)
 def create_user(user: UserCreate, db: Session = Depends(get_db)):
     """
@@ -42,15 +47,16 @@ def create_user(user: UserCreate, db: Session = Depends(get_db)):
         role=UserRole.USER  # Все новые пользователи получают роль USER по умолчанию
     )
     
-    db.add(db_user)
-    db.commit()
-    db.refresh(db_user)
+    save(db, db_user)
     
     return db_user
 
 
 @router.get("/{user_id}", response_model=UserResponse)
 def get_user(user_id: int, current_user: User = Depends(get_current_active_user), db: Session = Depends(get_db)):
+    """
+    Получение пользователя по ID
+    """
     # Проверяем права доступа к просмотру информации пользователя
     if current_user.role != UserRole.ADMIN and current_user.id != user_id:
         raise HTTPException(
@@ -58,23 +64,7 @@ def get_user(user_id: int, current_user: User = Depends(get_current_active_user)
             detail="Недостаточно прав для просмотра информации другого пользователя"
         )
     
-    db_user = db.query(User).filter(User.id == user_id).first()
-    if db_user is None:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Пользователь не найден"
-        )
-    return db_user
-    """
-    Получение пользователя по ID
-    """
-    db_user = db.query(User).filter(User.id == user_id).first()
-    if db_user is None:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Пользователь не найден"
-        )
-    return db_user
+    return user_crud.get_row(db, user_id)
 
 
 @router.put("/{user_id}", response_model=UserResponse)
@@ -82,12 +72,7 @@ def update_user(user_id: int, user: UserUpdate, current_user: User = Depends(req
     """
     Обновление пользователя по ID
     """
-    db_user = db.query(User).filter(User.id == user_id).first()
-    if db_user is None:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Пользователь не найден"
-        )
+    db_user = user_crud.get(db, user_id)
     
     # Обновляем поля пользователя
     update_data = user.dict(exclude_unset=True)
@@ -95,11 +80,11 @@ def update_user(user_id: int, user: UserUpdate, current_user: User = Depends(req
         update_data["hashed_password"] = get_password_hash(update_data["password"])
         del update_data["password"]
     
-    for field, value in update_data.items():
-        setattr(db_user, field, value)
+    previous_username = db_user.username
+    apply_update(db_user, update_data)
     
-    db.commit()
-    db.refresh(db_user)
+    save(db, db_user)
+    invalidate_user(previous_username, db_user.username)
     
     return db_user
 
@@ -109,26 +94,24 @@ def delete_user(user_id: int, current_user: User = Depends(require_delete_user),
     """
     Удаление пользователя по ID
     """
-    db_user = db.query(User).filter(User.id == user_id).first()
-    if db_user is None:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Пользователь не найден"
-        )
+    db_user = user_crud.get(db, user_id)
     
+    username = db_user.username
+    db.query(UserNotification).filter(UserNotification.user_id == user_id).delete(synchronize_session=False)
+    db.query(NotificationCounter).filter(NotificationCounter.user_id == user_id).delete(synchronize_session=False)
     db.delete(db_user)
     db.commit()
+    invalidate_user(username)
     
     return {"message": "Пользователь успешно удален"}
 
 
 @router.get("/", response_model=List[UserResponse])
-def get_users(skip: int = 0, limit: int = 100, current_user: User = Depends(require_admin), db: Session = Depends(get_db)):
+def get_users(pagination: Pagination = Depends(), current_user: User = Depends(require_admin), db: Session = Depends(get_db)):
     """
     Получение списка пользователей с пагинацией
     """
-    users = db.query(User).offset(skip).limit(limit).all()
-    return users
+    return user_crud.list(db, pagination)
 
 
 from pydantic import BaseModel
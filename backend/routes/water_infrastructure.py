@@ -1,8 +1,10 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, status
 from sqlalchemy.orm import Session
-from typing import List
+from typing import List, Optional
+from datetime import datetime, timedelta
 
 from backend.config.database import get_db
+from backend.models.user import User
 from backend.models.water_infrastructure import WaterInfrastructure, WaterLeak
 from backend.schemas.water_infrastructure import (
     WaterInfrastructureCreate, 
@@ -10,18 +12,57 @@ from backend.schemas.water_infrastructure import (
     WaterInfrastructureResponse,
     WaterLeakCreate,
     WaterLeakUpdate,
-    WaterLeakResponse
+    WaterLeakResponse,
+    InfrastructureTelemetryCreate,
+    TelemetryBucketResponse,
+    LeakDetectionResponse
 )
+from backend.config.settings import TELEMETRY_RAW_MAX_DAYS
+from backend.schemas.bulk import BulkIngestResponse
+from backend.utils.bulk_ingest import ingest_stream, resolve_format
+from backend.utils.crud import CRUDService
+from backend.utils.leak_detection import run_leak_detection
+from backend.utils.geo import GeoFilter
+from backend.utils.pagination import Pagination
+from backend.utils.telemetry import BUCKETS, query_downsampled, write_telemetry_batch
+from backend.utils.bulk_crud import BulkHooks, add_bulk_routes, require_parent
+from backend.utils.map_clusters import track_changed_leaks, track_changed_points
+from backend.utils.role_checker import require_engineer
 
 router = APIRouter()
 
+water_infrastructure_crud = CRUDService(WaterInfrastructure, "Объект инфраструктуры не найден")
+water_leak_crud = CRUDService(WaterLeak, "Утечка не найдена")
+
+add_bulk_routes(
+    router, WaterInfrastructure, WaterInfrastructureCreate, WaterInfrastructureUpdate,
+    hooks=BulkHooks(after_write=lambda db, operation, old_rows, new_rows, fields: track_changed_points(
+        db, ("infrastructure", "leaks"), old_rows + new_rows
+    )),
+    dependencies=[Depends(require_engineer)]
+)
+add_bulk_routes(
+    router, WaterLeak, WaterLeakCreate, WaterLeakUpdate,
+    hooks=BulkHooks(
+        validate=require_parent("infrastructure_id", WaterInfrastructure, "Объект инфраструктуры не найден"),
+        after_write=lambda db, operation, old_rows, new_rows, fields: track_changed_leaks(
+            db, {row["infrastructure_id"] for row in old_rows + new_rows}
+        )
+    ),
+    dependencies=[Depends(require_engineer)],
+    path="/leaks/bulk"
+)
+
 @router.get("/", response_model=List[WaterInfrastructureResponse])
-def get_water_infrastructure(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
+def get_water_infrastructure(
+    pagination: Pagination = Depends(),
+    geo: GeoFilter = Depends(),
+    db: Session = Depends(get_db)
+):
     """
     Получить список объектов инфраструктуры водоснабжения
     """
-    infrastructure = db.query(WaterInfrastructure).offset(skip).limit(limit).all()
-    return infrastructure
+    return water_infrastructure_crud.list(db, pagination, geo)
 
 
 @router.post("/", response_model=WaterInfrastructureResponse)
@@ -32,11 +73,73 @@ def create_water_infrastructure(
     """
     Создать новый объект инфраструктуры водоснабжения
     """
-    db_infrastructure = WaterInfrastructure(**infrastructure.dict())
-    db.add(db_infrastructure)
-    db.commit()
-    db.refresh(db_infrastructure)
-    return db_infrastructure
+    return water_infrastructure_crud.create(db, infrastructure)
+
+
+# Маршруты для телеметрии
+@router.post("/telemetry", response_model=BulkIngestResponse)
+async def ingest_telemetry(
+    request: Request,
+    data_format: Optional[str] = Query(None, alias="format"),
+    db: Session = Depends(get_db)
+):
+    """
+    Загрузить показания датчиков (давление, температура, расход) в формате NDJSON или CSV.
+    Повторно присланные показания с тем же объектом и временем пропускаются
+    """
+    resolved_format = resolve_format(data_format, request.headers.get("content-type"))
+    if resolved_format is None:
+        raise HTTPException(
+            status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
+            detail="Поддерживаются только форматы NDJSON и CSV"
+        )
+    return await ingest_stream(
+        db,
+        request.stream(),
+        InfrastructureTelemetryCreate,
+        resolved_format,
+        write_telemetry_batch
+    )
+
+
+@router.post("/leak-detection", response_model=LeakDetectionResponse)
+def detect_leaks(current_user: User = Depends(require_engineer)):
+    """
+    Выполнить поиск утечек по новым показаниям телеметрии (резкое падение давления,
+    устойчивое отклонение давления, рост ночного расхода). Обнаруженные утечки
+    создаются с source = detector. В фоне поиск выполняется каждые LEAK_DETECTION_INTERVAL секунд
+    """
+    return run_leak_detection()
+
+
+@router.get("/{infrastructure_id}/telemetry", response_model=List[TelemetryBucketResponse])
+def get_infrastructure_telemetry(
+    infrastructure_id: int,
+    date_from: datetime,
+    date_to: datetime,
+    bucket: str = "hour",
+    db: Session = Depends(get_db)
+):
+    """
+    Получить показания датчиков за период, агрегированные по интервалам
+    (minute, hour, day, week, month)
+    """
+    if bucket not in BUCKETS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Допустимые интервалы агрегации: {', '.join(BUCKETS)}"
+        )
+    if date_to <= date_from:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Дата окончания периода должна быть больше даты начала"
+        )
+    if bucket == "minute" and date_to - date_from > timedelta(days=TELEMETRY_RAW_MAX_DAYS):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Поминутная детализация доступна для периода не более {TELEMETRY_RAW_MAX_DAYS} дней"
+        )
+    return query_downsampled(db, infrastructure_id, date_from, date_to, bucket)
 
 
 @router.get("/{infrastructure_id}", response_model=WaterInfrastructureResponse)
@@ -47,15 +150,7 @@ def get_water_infrastructure_by_id(
     """
     Получить объект инфраструктуры водоснабжения по ID
     """
-    infrastructure = db.query(WaterInfrastructure).filter(
-        WaterInfrastructure.id == infrastructure_id
-    ).first()
-    if not infrastructure:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Объект инфраструктуры не найден"
-        )
-    return infrastructure
+    return water_infrastructure_crud.get_row(db, infrastructure_id)
 
 
 @router.put("/{infrastructure_id}", response_model=WaterInfrastructureResponse)
@@ -67,22 +162,7 @@ def update_water_infrastructure(
     """
     Обновить объект инфраструктуры водоснабжения
     """
-    db_infrastructure = db.query(WaterInfrastructure).filter(
-        WaterInfrastructure.id == infrastructure_id
-    ).first()
-    if not db_infrastructure:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Объект инфраструктуры не найден"
-        )
-    
-    update_data = infrastructure_update.dict(exclude_unset=True)
-    for field, value in update_data.items():
-        setattr(db_infrastructure, field, value)
-    
-    db.commit()
-    db.refresh(db_infrastructure)
-    return db_infrastructure
+    return water_infrastructure_crud.update(db, infrastructure_id, infrastructure_update)
 
 
 @router.delete("/{infrastructure_id}")
@@ -93,17 +173,7 @@ def delete_water_infrastructure(
     """
     Удалить объект инфраструктуры водоснабжения
     """
-    db_infrastructure = db.query(WaterInfrastructure).filter(
-        WaterInfrastructure.id == infrastructure_id
-    ).first()
-    if not db_infrastructure:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Объект инфраструктуры не найден"
-        )
-    
-    db.delete(db_infrastructure)
-    db.commit()
+    water_infrastructure_crud.delete(db, infrastructure_id)
     return {"message": "Объект инфраструктуры успешно удален"}
 
 
@@ -111,17 +181,13 @@ def delete_water_infrastructure(
 @router.get("/{infrastructure_id}/leaks", response_model=List[WaterLeakResponse])
 def get_leaks_by_infrastructure(
     infrastructure_id: int, 
-    skip: int = 0, 
-    limit: int = 100, 
+    pagination: Pagination = Depends(),
     db: Session = Depends(get_db)
 ):
     """
     Получить список утечек для конкретного объекта инфраструктуры
     """
-    leaks = db.query(WaterLeak).filter(
-        WaterLeak.infrastructure_id == infrastructure_id
-    ).offset(skip).limit(limit).all()
-    return leaks
+    return water_leak_crud.list(db, pagination, None, WaterLeak.infrastructure_id == infrastructure_id)
 
 
 @router.post("/{infrastructure_id}/leaks", response_model=WaterLeakResponse)
@@ -134,20 +200,5 @@ def create_leak(
     Создать новую утечку для объекта инфраструктуры
     """
     # Проверяем, существует ли объект инфраструктуры
-    infrastructure = db.query(WaterInfrastructure).filter(
-        WaterInfrastructure.id == infrastructure_id
-    ).first()
-    if not infrastructure:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Объект инфраструктуры не найден"
-        )
-    
-    db_leak = WaterLeak(
-        infrastructure_id=infrastructure_id,
-        **leak.dict()
-    )
-    db.add(db_leak)
-    db.commit()
-    db.refresh(db_leak)
-    return db_leak
\ No newline at end of file
+    water_infrastructure_crud.get_row(db, infrastructure_id)
+    return water_leak_crud.create(db, leak, infrastructure_id=infrastructure_id)
\ No newline at end of file
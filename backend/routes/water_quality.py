@@ -1,154 +1,279 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
-from typing import List
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, status
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Optional
 
-from backend.config.database import get_db
-from backend.models.water_quality import WaterQuality, WaterQualityAlert
+from backend.config.database import get_async_db
+from backend.models.user import User
+from backend.models.water_quality import WaterQuality, WaterQualityAlert, WaterQualityRule
 from backend.schemas.water_quality import (
     WaterQualityCreate, 
     WaterQualityUpdate, 
     WaterQualityResponse,
     WaterQualityAlertCreate,
     WaterQualityAlertUpdate,
-    WaterQualityAlertResponse
+    WaterQualityAlertResponse,
+    WaterQualityRuleCreate,
+    WaterQualityRuleUpdate,
+    WaterQualityRuleResponse
 )
+from backend.schemas.bulk import BulkIngestResponse
+from backend.utils.bulk_ingest import ingest_stream, resolve_format
+from backend.utils.crud import CRUDService, apply_update, save_async
+from backend.utils.geo import GeoFilter
+from backend.utils.pagination import Pagination
+from backend.utils.quality_rules import DEFAULT_RULES, PARAMETERS, check_rule, emit_alerts, invalidate_rules, rule_errors, write_quality_batch
+from backend.utils.role_checker import require_engineer
+from backend.utils.bulk_crud import UPDATE, BulkHooks, add_bulk_routes
 
 router = APIRouter()
 
+water_quality_crud = CRUDService(WaterQuality, "Данные о качестве воды не найдены")
+water_quality_rule_crud = CRUDService(WaterQualityRule, "Правило не найдено")
+water_quality_alert_crud = CRUDService(WaterQualityAlert, "Уведомление не найдено")
+
+
+def _bulk_emit_alerts(db, operation: str, old_rows: List[dict], new_rows: List[dict], fields) -> None:
+    # Как и при одиночном обновлении: смена точки перепроверяет все показатели,
+    # иначе - только измененные
+    if operation == UPDATE and "location" not in fields:
+        parameters = fields & PARAMETERS.keys()
+        if parameters:
+            emit_alerts(db, new_rows, parameters)
+    elif new_rows:
+        emit_alerts(db, new_rows)
+
+
+add_bulk_routes(
+    router, WaterQuality, WaterQualityCreate, WaterQualityUpdate,
+    hooks=BulkHooks(after_write=_bulk_emit_alerts),
+    dependencies=[Depends(require_engineer)]
+)
+add_bulk_routes(
+    router, WaterQualityRule, WaterQualityRuleCreate, WaterQualityRuleUpdate,
+    hooks=BulkHooks(
+        validate=lambda db, rows: [rule_errors(row["parameter"], row["min_value"], row["max_value"]) for row in rows],
+        after_commit=lambda operation, old_rows, new_rows: invalidate_rules()
+    ),
+    dependencies=[Depends(require_engineer)],
+    path="/rules/bulk"
+)
+add_bulk_routes(
+    router, WaterQualityAlert, WaterQualityAlertCreate, WaterQualityAlertUpdate,
+    dependencies=[Depends(require_engineer)],
+    path="/alerts/bulk"
+)
+
 @router.get("/", response_model=List[WaterQualityResponse])
-def get_water_quality_data(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
+async def get_water_quality_data(
+    pagination: Pagination = Depends(),
+    geo: GeoFilter = Depends(),
+    db: AsyncSession = Depends(get_async_db)
+):
     """
     Получить список данных о качестве воды
     """
-    quality_data = db.query(WaterQuality).offset(skip).limit(limit).all()
-    return quality_data
+    return await water_quality_crud.list_async(db, pagination, geo)
 
 
 @router.post("/", response_model=WaterQualityResponse)
-def create_water_quality_data(
+async def create_water_quality_data(
     quality_data: WaterQualityCreate, 
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Создать новые данные о качестве воды
     """
     db_quality = WaterQuality(**quality_data.dict())
     db.add(db_quality)
-    db.commit()
-    db.refresh(db_quality)
+    await db.flush()
+    await db.run_sync(emit_alerts, [db_quality])
+    await save_async(db, db_quality)
     return db_quality
 
 
-@router.get("/{quality_id}", response_model=WaterQualityResponse)
-def get_water_quality_by_id(
-    quality_id: int, 
-    db: Session = Depends(get_db)
+@router.post("/ingest", response_model=BulkIngestResponse)
+async def ingest_water_quality_data(
+    request: Request,
+    data_format: Optional[str] = Query(None, alias="format"),
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
-    Получить данные о качестве воды по ID
+    Массовая загрузка измерений качества воды в формате NDJSON или CSV.
+    Формат задается параметром format или заголовком Content-Type.
+    Измерения проверяются по пороговым правилам, уведомления создаются в той же транзакции
     """
-    quality = db.query(WaterQuality).filter(
-        WaterQuality.id == quality_id
-    ).first()
-    if not quality:
+    resolved_format = resolve_format(data_format, request.headers.get("content-type"))
+    if resolved_format is None:
         raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Данные о качестве воды не найдены"
+            status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
+            detail="Поддерживаются только форматы NDJSON и CSV"
         )
-    return quality
+    return await ingest_stream(
+        db,
+        request.stream(),
+        WaterQualityCreate,
+        resolved_format,
+        write_quality_batch
+    )
 
 
-@router.put("/{quality_id}", response_model=WaterQualityResponse)
-def update_water_quality(
-    quality_id: int,
-    quality_update: WaterQualityUpdate,
-    db: Session = Depends(get_db)
+# Маршруты для пороговых правил контроля качества воды
+@router.get("/rules", response_model=List[WaterQualityRuleResponse])
+async def get_water_quality_rules(pagination: Pagination = Depends(), db: AsyncSession = Depends(get_async_db)):
+    """
+    Получить список пороговых правил
+    """
+    return await water_quality_rule_crud.list_async(db, pagination)
+
+
+@router.post("/rules", response_model=WaterQualityRuleResponse)
+async def create_water_quality_rule(
+    rule: WaterQualityRuleCreate,
+    current_user: User = Depends(require_engineer),
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
-    Обновить данные о качестве воды
+    Создать пороговое правило
     """
-    db_quality = db.query(WaterQuality).filter(
-        WaterQuality.id == quality_id
-    ).first()
-    if not db_quality:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Данные о качестве воды не найдены"
-        )
+    check_rule(rule.parameter, rule.min_value, rule.max_value)
+    db_rule = WaterQualityRule(**rule.dict())
+    db.add(db_rule)
+    await db.commit()
+    invalidate_rules()
+    return db_rule
+
+
+@router.post("/rules/defaults", response_model=List[WaterQualityRuleResponse])
+async def create_default_water_quality_rules(
+    current_user: User = Depends(require_engineer),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Создать общие правила по умолчанию для показателей, у которых еще нет общих правил
+    """
+    result = await db.execute(
+        select(WaterQualityRule.parameter).filter(WaterQualityRule.location.is_(None))
+    )
+    existing = set(result.scalars().all())
+    db_rules = [WaterQualityRule(**rule) for rule in DEFAULT_RULES if rule["parameter"] not in existing]
+    db.add_all(db_rules)
+    await db.commit()
+    invalidate_rules()
+    return db_rules
+
+
+@router.put("/rules/{rule_id}", response_model=WaterQualityRuleResponse)
+async def update_water_quality_rule(
+    rule_id: int,
+    rule_update: WaterQualityRuleUpdate,
+    current_user: User = Depends(require_engineer),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Обновить пороговое правило
+    """
+    db_rule = await water_quality_rule_crud.get_async(db, rule_id)
     
-    update_data = quality_update.dict(exclude_unset=True)
-    for field, value in update_data.items():
-        setattr(db_quality, field, value)
+    update_data = rule_update.dict(exclude_unset=True)
+    apply_update(db_rule, update_data)
+    check_rule(db_rule.parameter, db_rule.min_value, db_rule.max_value)
     
-    db.commit()
-    db.refresh(db_quality)
-    return db_quality
+    await db.commit()
+    invalidate_rules()
+    return db_rule
 
 
-@router.delete("/{quality_id}")
-def delete_water_quality(
-    quality_id: int, 
-    db: Session = Depends(get_db)
+@router.delete("/rules/{rule_id}")
+async def delete_water_quality_rule(
+    rule_id: int,
+    current_user: User = Depends(require_engineer),
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
-    Удалить данные о качестве воды
+    Удалить пороговое правило
     """
-    db_quality = db.query(WaterQuality).filter(
-        WaterQuality.id == quality_id
-    ).first()
-    if not db_quality:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Данные о качестве воды не найдены"
-        )
-    
-    db.delete(db_quality)
-    db.commit()
-    return {"message": "Данные о качестве воды успешно удалены"}
+    await water_quality_rule_crud.delete_async(db, rule_id)
+    invalidate_rules()
+    return {"message": "Правило успешно удалено"}
 
 
 # Маршруты для уведомлений о качестве воды
 @router.get("/alerts", response_model=List[WaterQualityAlertResponse])
-def get_water_quality_alerts(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
+async def get_water_quality_alerts(pagination: Pagination = Depends(), db: AsyncSession = Depends(get_async_db)):
     """
     Получить список уведомлений о качестве воды
     """
-    alerts = db.query(WaterQualityAlert).offset(skip).limit(limit).all()
-    return alerts
+    return await water_quality_alert_crud.list_async(db, pagination)
 
 
 @router.post("/alerts", response_model=WaterQualityAlertResponse)
-def create_water_quality_alert(
+async def create_water_quality_alert(
     alert: WaterQualityAlertCreate, 
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Создать новое уведомление о качестве воды
     """
-    db_alert = WaterQualityAlert(**alert.dict())
-    db.add(db_alert)
-    db.commit()
-    db.refresh(db_alert)
-    return db_alert
+    return await water_quality_alert_crud.create_async(db, alert)
 
 
 @router.patch("/alerts/{alert_id}/acknowledge")
-def acknowledge_alert(
+async def acknowledge_alert(
     alert_id: int,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Подтвердить уведомление о качестве воды
     """
-    db_alert = db.query(WaterQualityAlert).filter(
-        WaterQualityAlert.id == alert_id
-    ).first()
-    if not db_alert:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Уведомление не найдено"
-        )
+    db_alert = await water_quality_alert_crud.get_async(db, alert_id)
     
     db_alert.acknowledged = True
-    db.commit()
-    return {"message": "Уведомление подтверждено"}
\ No newline at end of file
+    await db.commit()
+    return {"message": "Уведомление подтверждено"}
+
+
+@router.get("/{quality_id}", response_model=WaterQualityResponse)
+async def get_water_quality_by_id(
+    quality_id: int, 
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Получить данные о качестве воды по ID
+    """
+    return await water_quality_crud.get_row_async(db, quality_id)
+
+
+@router.put("/{quality_id}", response_model=WaterQualityResponse)
+async def update_water_quality(
+    quality_id: int,
+    quality_update: WaterQualityUpdate,
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Обновить данные о качестве воды
+    """
+    db_quality = await water_quality_crud.get_async(db, quality_id)
+    
+    update_data = quality_update.dict(exclude_unset=True)
+    apply_update(db_quality, update_data)
+    
+    # Измененные показатели проверяются заново; при смене точки меняются и применимые правила
+    if "location" in update_data:
+        await db.run_sync(emit_alerts, [db_quality])
+    elif update_data.keys() & PARAMETERS.keys():
+        await db.run_sync(emit_alerts, [db_quality], update_data.keys() & PARAMETERS.keys())
+    await save_async(db, db_quality)
+    return db_quality
+
+
+@router.delete("/{quality_id}")
+async def delete_water_quality(
+    quality_id: int, 
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Удалить данные о качестве воды
+    """
+    await water_quality_crud.delete_async(db, quality_id)
+    return {"message": "Данные о качестве воды успешно удалены"}
\ No newline at end of file
@@ -9,4 +9,6 @@ from .complaints import *
 from .tariffs import *
 from .assets import *
 from .demand_forecasting import *
-from .notifications import *
\ No newline at end of file
+from .notifications import *
+from .bulk import *
+from .map import *
\ No newline at end of file
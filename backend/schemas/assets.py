@@ -1,6 +1,6 @@
 from pydantic import BaseModel
-from typing import Optional
-from datetime import datetime
+from typing import List, Optional
+from datetime import date, datetime
 
 
 class WaterAssetBase(BaseModel):
@@ -78,4 +78,53 @@ class AssetMaintenanceResponse(AssetMaintenanceBase):
     updated_at: Optional[datetime] = None
 
     class Config:
-        from_attributes = True
\ No newline at end of file
+        from_attributes = True
+
+
+class AssetValuationProjection(BaseModel):
+    years_ahead: int
+    date: date
+    value: float
+
+
+class AssetValuationGroup(BaseModel):
+    asset_type: Optional[str] = None
+    location: Optional[str] = None
+    assets: int  # Количество активов
+    valued_assets: int  # Активов с заданной стоимостью
+    original_value: float  # Первоначальная стоимость
+    current_value: float  # Остаточная стоимость на дату отчета
+    accumulated_depreciation: float  # Накопленная амортизация
+    fully_depreciated: int  # Полностью амортизированных активов
+    projected: List[AssetValuationProjection]  # Остаточная стоимость через 1..years лет
+
+
+class AssetValuationResponse(BaseModel):
+    as_of: date
+    group_by: List[str]
+    totals: AssetValuationGroup
+    groups: List[AssetValuationGroup]
+
+
+class MaintenanceQueueItem(BaseModel):
+    asset_id: int
+    name: str
+    asset_type: str
+    location: str
+    risk_score: float  # Оценка риска (приоритет обслуживания)
+    due_at: datetime  # Срок обслуживания
+    age_years: float  # Возраст актива в годах
+    repairs: int  # Внеплановых обслуживаний и ремонтов за период истории
+    leaks: int  # Утечек на объектах того же местоположения
+    last_maintenance: Optional[datetime] = None
+
+    class Config:
+        from_attributes = True
+
+
+class MaintenanceQueueRefreshResponse(BaseModel):
+    assets: int  # Обновлено записей очереди
+    skipped: bool  # Пересчет уже выполнялся другим процессом
+
+    class Config:
+        from_attributes = True
@@ -0,0 +1,33 @@
+from pydantic import BaseModel
+from typing import List, Optional
+
+
+class BulkRowError(BaseModel):
+    line: int
+    errors: List[str]
+
+
+class BulkIngestResponse(BaseModel):
+    received: int
+    inserted: int
+    failed: int
+    errors: List[BulkRowError] = []
+    errors_truncated: bool = False
+
+
+class BulkItemResult(BaseModel):
+    index: int
+    id: Optional[int] = None
+    status: str  # created, updated, deleted, invalid, not_found, rolled_back
+    errors: List[str] = []
+
+
+class BulkResult(BaseModel):
+    received: int
+    succeeded: int
+    failed: int
+    results: List[BulkItemResult]
+
+
+class BulkDeleteRequest(BaseModel):
+    ids: List[int]
\ No newline at end of file
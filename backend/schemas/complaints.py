@@ -43,6 +43,7 @@ class ComplaintUpdate(BaseModel):
 
 class ComplaintResponse(ComplaintBase):
     id: int
+    cluster_id: Optional[int] = None  # ID инцидента
     created_at: datetime
     updated_at: Optional[datetime] = None
 
@@ -50,6 +51,11 @@ class ComplaintResponse(ComplaintBase):
         from_attributes = True
 
 
+class ComplaintSearchResult(ComplaintResponse):
+    rank: float  # Релевантность (0 - совпадение только по подстроке)
+    headline: Optional[str] = None  # Фрагменты описания с выделенными совпадениями (экранированный HTML с <mark>)
+
+
 class ComplaintCategoryBase(BaseModel):
     name: str
     description: Optional[str] = None
@@ -71,5 +77,22 @@ class ComplaintCategoryResponse(ComplaintCategoryBase):
     created_at: datetime
     updated_at: Optional[datetime] = None
 
+    class Config:
+        from_attributes = True
+
+
+class ComplaintClusterResponse(BaseModel):
+    id: int
+    category: str
+    status: str
+    location: Optional[str] = None
+    latitude: float
+    longitude: float
+    complaints: int
+    first_seen: datetime
+    last_seen: datetime
+    created_at: datetime
+    updated_at: Optional[datetime] = None
+
     class Config:
         from_attributes = True
\ No newline at end of file
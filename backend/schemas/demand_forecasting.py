@@ -1,5 +1,5 @@
 from pydantic import BaseModel
-from typing import Optional
+from typing import List, Optional
 from datetime import datetime
 
 
@@ -115,4 +115,38 @@ class InvestmentPlanResponse(InvestmentPlanBase):
     updated_at: Optional[datetime] = None
 
     class Config:
-        from_attributes = True
\ No newline at end of file
+        from_attributes = True
+
+
+class WaterDemandAggregateResponse(BaseModel):
+    granularity: str
+    location: str
+    demand_type: str
+    period_start: datetime
+    total_amount: float
+    samples: int
+    min_amount: Optional[float] = None
+    max_amount: Optional[float] = None
+    avg_amount: Optional[float] = None
+
+    class Config:
+        from_attributes = True
+
+
+class DemandForecastPoint(BaseModel):
+    date: datetime
+    amount: float
+
+
+class DemandForecastResponse(BaseModel):
+    location: str
+    demand_type: str
+    last_observed: datetime
+    alpha: float
+    beta: float
+    points: List[DemandForecastPoint]
+
+
+class DemandForecastRunResponse(BaseModel):
+    series: int
+    rows_written: int
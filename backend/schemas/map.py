@@ -0,0 +1,16 @@
+from pydantic import BaseModel
+from typing import Dict, List
+
+
+class MapCluster(BaseModel):
+    count: int
+    latitude: float
+    longitude: float
+    severity: Dict[str, int]
+
+
+class MapClustersResponse(BaseModel):
+    layer: str
+    zoom: int
+    tiles: int
+    clusters: List[MapCluster]
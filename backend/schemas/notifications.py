@@ -1,5 +1,5 @@
 from pydantic import BaseModel
-from typing import Optional
+from typing import List, Optional
 from datetime import datetime
 
 
@@ -36,6 +36,35 @@ class NotificationResponse(NotificationBase):
         from_attributes = True
 
 
+class NotificationIds(BaseModel):
+    notification_ids: List[int]
+
+
+class NotificationReadResult(BaseModel):
+    updated: int
+    unread_count: int
+
+
+class UnreadCountResponse(BaseModel):
+    unread_count: int
+
+
+class NotificationDeliveryResponse(BaseModel):
+    id: int
+    notification_id: int
+    channel: str
+    status: str
+    sent_count: int
+    attempts: int
+    next_attempt_at: datetime
+    last_error: Optional[str] = None
+    created_at: datetime
+    updated_at: Optional[datetime] = None
+
+    class Config:
+        from_attributes = True
+
+
 class NotificationSettingBase(BaseModel):
     user_id: int
     notification_type: str
@@ -67,8 +67,41 @@ class WaterLeakUpdate(BaseModel):
 
 class WaterLeakResponse(WaterLeakBase):
     id: int
+    source: str = "manual"
     created_at: datetime
     updated_at: Optional[datetime] = None
 
     class Config:
-        from_attributes = True
\ No newline at end of file
+        from_attributes = True
+
+
+class InfrastructureTelemetryCreate(BaseModel):
+    infrastructure_id: int
+    ts: datetime
+    pressure: Optional[float] = None
+    temperature: Optional[float] = None
+    flow_rate: Optional[float] = None
+
+
+class TelemetryBucketResponse(BaseModel):
+    bucket: datetime
+    samples: int
+    pressure_min: Optional[float] = None
+    pressure_max: Optional[float] = None
+    pressure_avg: Optional[float] = None
+    temperature_min: Optional[float] = None
+    temperature_max: Optional[float] = None
+    temperature_avg: Optional[float] = None
+    flow_rate_min: Optional[float] = None
+    flow_rate_max: Optional[float] = None
+    flow_rate_avg: Optional[float] = None
+
+
+class LeakDetectionResponse(BaseModel):
+    objects: int  # Проверено объектов инфраструктуры
+    samples: int  # Обработано новых показаний
+    leaks_created: int  # Создано записей об утечках
+    skipped: bool = False  # Проверка уже выполняется другим процессом
+
+    class Config:
+        from_attributes = True
@@ -83,4 +83,37 @@ class WaterQualityAlertResponse(WaterQualityAlertBase):
     updated_at: Optional[datetime] = None
 
     class Config:
-        from_attributes = True
\ No newline at end of file
+        from_attributes = True
+
+
+class WaterQualityRuleBase(BaseModel):
+    parameter: str
+    location: Optional[str] = None
+    min_value: Optional[float] = None
+    max_value: Optional[float] = None
+    alert_type: str = "warning"
+    message: Optional[str] = None
+    is_active: bool = True
+
+
+class WaterQualityRuleCreate(WaterQualityRuleBase):
+    pass
+
+
+class WaterQualityRuleUpdate(BaseModel):
+    parameter: Optional[str] = None
+    location: Optional[str] = None
+    min_value: Optional[float] = None
+    max_value: Optional[float] = None
+    alert_type: Optional[str] = None
+    message: Optional[str] = None
+    is_active: Optional[bool] = None
+
+
+class WaterQualityRuleResponse(WaterQualityRuleBase):
+    id: int
+    created_at: datetime
+    updated_at: Optional[datetime] = None
+
+    class Config:
+        from_attributes = True
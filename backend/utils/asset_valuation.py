@@ -0,0 +1,205 @@
+"""
+Оценка стоимости активов водоснабжения с учетом амортизации линейным методом:
+остаточная стоимость = asset_value * (1 - depreciation_rate * возраст в годах), не ниже нуля,
+где depreciation_rate - доля первоначальной стоимости, списываемая за год.
+Расчет векторизован по всем активам сразу. Данные активов хранятся в памяти процесса
+и перечитываются только после изменения таблицы water_assets
+"""
+import threading
+from dataclasses import dataclass, field
+from datetime import date
+from typing import Dict, List, Sequence, Tuple
+
+import numpy as np
+from sqlalchemy import Date, cast, func, literal_column, select
+from sqlalchemy.orm import Session
+
+from backend.models.assets import WaterAsset
+
+# Поля, по которым допускается группировка отчета
+GROUP_FIELDS = ("asset_type", "location")
+
+DAYS_IN_YEAR = 365.25
+EPOCH = date(1970, 1, 1)
+
+# Количество различных отчетов (группировка, горизонт, дата), хранимых для текущих данных
+MAX_CACHED_REPORTS = 64
+
+
+@dataclass
+class _Snapshot:
+    """
+    Колонки таблицы активов в виде массивов и отчеты, посчитанные по ним
+    """
+    fingerprint: Tuple
+    columns: Dict[str, Tuple[np.ndarray, list]]  # asset_type, location: код значения у каждого актива и значения
+    value: np.ndarray  # Первоначальная стоимость (NaN - не задана)
+    rate: np.ndarray  # Ставка амортизации в год
+    installed: np.ndarray  # Дата установки в днях от 1970-01-01 (NaN - не задана)
+    reports: Dict[Tuple, dict] = field(default_factory=dict)
+
+
+_snapshot = None
+_lock = threading.Lock()
+
+
+def _fingerprint(db: Session) -> Tuple:
+    """
+    Отпечаток содержимого таблицы: количество строк и сумма xmin (номер транзакции,
+    записавшей версию строки). Любая вставка, изменение или удаление меняет отпечаток,
+    в том числе пакетные операции и изменения из других процессов
+    """
+    return tuple(db.execute(
+        select(func.count(), func.coalesce(func.sum(literal_column("xmin::text::bigint")), 0)).select_from(WaterAsset)
+    ).one())
+
+
+def _numbers(column):
+    """
+    Колонка одной строкой чисел через запятую: разбор текста в numpy быстрее,
+    чем построение объектов Python для каждой строки таблицы
+    """
+    return func.array_to_string(func.array_agg(column), ",", "NaN")
+
+
+def _parse_numbers(text) -> np.ndarray:
+    return np.array(text.split(","), dtype=float) if text else np.zeros(0)
+
+
+def _encode(values) -> Tuple[np.ndarray, list]:
+    """
+    Заменяет строки номерами различных значений
+    """
+    labels = list(dict.fromkeys(values))
+    index = {label: code for code, label in enumerate(labels)}
+    return np.fromiter(map(index.__getitem__, values), dtype=np.int64, count=len(values)), labels
+
+
+def _load(db: Session, fingerprint: Tuple) -> _Snapshot:
+    # Вся таблица читается одной строкой массивов; агрегаты одного запроса
+    # получают строки в одном порядке, поэтому элементы массивов соответствуют друг другу
+    asset_type, location, value, rate, installed = db.execute(
+        select(
+            func.array_agg(WaterAsset.asset_type),
+            func.array_agg(WaterAsset.location),
+            _numbers(WaterAsset.asset_value),
+            _numbers(WaterAsset.depreciation_rate),
+            _numbers(cast(WaterAsset.installation_date, Date) - EPOCH),
+        )
+    ).one()
+    return _Snapshot(
+        fingerprint=fingerprint,
+        columns={
+            "asset_type": _encode(asset_type or []),
+            "location": _encode(location or []),
+        },
+        value=_parse_numbers(value),
+        rate=np.nan_to_num(_parse_numbers(rate)).clip(min=0.0),
+        installed=_parse_numbers(installed),
+    )
+
+
+def _current_snapshot(db: Session) -> _Snapshot:
+    global _snapshot
+    fingerprint = _fingerprint(db)
+    with _lock:
+        if _snapshot is not None and _snapshot.fingerprint == fingerprint:
+            return _snapshot
+    snapshot = _load(db, fingerprint)
+    with _lock:
+        _snapshot = snapshot
+    return snapshot
+
+
+def _group_codes(snapshot: _Snapshot, group_by: Sequence[str]):
+    """
+    Номер группы для каждого актива и значения полей группировки для каждой группы
+    """
+    codes = np.zeros(len(snapshot.value), dtype=np.int64)
+    for name in group_by:
+        column, labels = snapshot.columns[name]
+        codes = codes * len(labels) + column
+    groups, inverse = np.unique(codes, return_inverse=True)
+    keys = []
+    for code in groups.tolist():
+        key = {}
+        for name in reversed(group_by):
+            labels = snapshot.columns[name][1]
+            code, position = divmod(code, len(labels))
+            key[name] = labels[position]
+        keys.append({name: key[name] for name in group_by})
+    # Группы упорядочены по значениям полей группировки
+    order = sorted(range(len(keys)), key=lambda index: [keys[index][name] for name in group_by])
+    rank = np.empty(len(keys), dtype=np.int64)
+    rank[order] = np.arange(len(keys))
+    return rank[inverse], [keys[index] for index in order]
+
+
+def _summary(groups: np.ndarray, count: int, snapshot: _Snapshot, remaining: List[np.ndarray], years: int, as_of: date):
+    valued = ~np.isnan(snapshot.value)
+    value = np.where(valued, snapshot.value, 0.0)
+    totals = {
+        "assets": np.bincount(groups, minlength=count),
+        "valued_assets": np.bincount(groups, weights=valued, minlength=count),
+        "original_value": np.bincount(groups, weights=value, minlength=count),
+        "fully_depreciated": np.bincount(groups, weights=valued & (remaining[0] == 0), minlength=count),
+    }
+    projected = [np.bincount(groups, weights=value * share, minlength=count) for share in remaining]
+    summaries = []
+    for index in range(count):
+        summaries.append({
+            "assets": int(totals["assets"][index]),
+            "valued_assets": int(totals["valued_assets"][index]),
+            "original_value": float(totals["original_value"][index]),
+            "current_value": float(projected[0][index]),
+            "accumulated_depreciation": float(totals["original_value"][index] - projected[0][index]),
+            "fully_depreciated": int(totals["fully_depreciated"][index]),
+            "projected": [
+                {"years_ahead": step, "date": _add_years(as_of, step), "value": float(projected[step][index])}
+                for step in range(1, years + 1)
+            ],
+        })
+    return summaries
+
+
+def _add_years(day: date, years: int) -> date:
+    try:
+        return day.replace(year=day.year + years)
+    except ValueError:  # 29 февраля
+        return day.replace(year=day.year + years, day=28)
+
+
+def _compute(snapshot: _Snapshot, group_by: Sequence[str], years: int, as_of: date) -> dict:
+    today = (as_of - EPOCH).days
+    # Активы без даты установки считаются новыми, установленные позже даты отчета - не амортизированными
+    age = np.nan_to_num((today - snapshot.installed) / DAYS_IN_YEAR).clip(min=0.0)
+    # Доля первоначальной стоимости на дату отчета и через 1..years лет
+    remaining = [(1.0 - snapshot.rate * (age + step)).clip(0.0, 1.0) for step in range(years + 1)]
+
+    groups, keys = _group_codes(snapshot, group_by)
+    summaries = _summary(groups, len(keys), snapshot, remaining, years, as_of)
+    total = _summary(np.zeros(len(snapshot.value), dtype=np.int64), 1, snapshot, remaining, years, as_of)[0]
+    return {
+        "as_of": as_of,
+        "group_by": list(group_by),
+        "totals": total,
+        "groups": [{**key, **summary} for key, summary in zip(keys, summaries)],
+    }
+
+
+def valuation_report(db: Session, group_by: Sequence[str], years: int, as_of: date) -> dict:
+    """
+    Возвращает отчет об остаточной стоимости активов на дату as_of и прогноз
+    на years лет вперед по группам group_by (поля из GROUP_FIELDS)
+    """
+    snapshot = _current_snapshot(db)
+    key = (tuple(group_by), years, as_of)
+    with _lock:
+        report = snapshot.reports.get(key)
+    if report is None:
+        report = _compute(snapshot, group_by, years, as_of)
+        with _lock:
+            if len(snapshot.reports) >= MAX_CACHED_REPORTS:
+                snapshot.reports.pop(next(iter(snapshot.reports)))
+            snapshot.reports[key] = report
+    return report
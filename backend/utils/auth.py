@@ -1,3 +1,4 @@
+from dataclasses import dataclass
 from datetime import datetime, timedelta
 from typing import Optional
 from fastapi import HTTPException, status, Depends
@@ -5,10 +6,13 @@ from fastapi.security import OAuth2PasswordBearer
 from jose import JWTError, jwt
 from passlib.context import CryptContext
 from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
 import os
 
-from backend.config.database import get_db
-from backend.models.user import User
+from backend.config.database import SessionLocal
+from backend.config.settings import AUTH_CACHE_SIZE, AUTH_CACHE_TTL
+from backend.models.user import User, UserRole
+from backend.utils.cache import TTLCache
 
 # Ключ для подписи JWT токенов (в реальном приложении нужно хранить в переменных окружения)
 SECRET_KEY = os.getenv("SECRET_KEY", "your-secret-key-here")
@@ -21,6 +25,42 @@ pwd_context = CryptContext(schemes=["plaintext"], deprecated="auto")
 # Для OAuth2
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
 
+
+@dataclass(frozen=True)
+class UserPrincipal:
+    """
+    Данные пользователя, необходимые для авторизации запроса
+    """
+    id: int
+    username: str
+    role: UserRole
+    is_active: bool
+
+
+# Кэш пользователей по имени: проверка токена и ролей без обращения к базе данных
+_principal_cache = TTLCache(maxsize=AUTH_CACHE_SIZE, ttl=AUTH_CACHE_TTL)
+
+
+def invalidate_user(*usernames: str) -> None:
+    """
+    Удаляет пользователей из кэша авторизации (после изменения или удаления)
+    """
+    for username in usernames:
+        _principal_cache.pop(username)
+
+
+def _load_principal(username: str) -> Optional[UserPrincipal]:
+    db = SessionLocal()
+    try:
+        row = db.query(User.id, User.username, User.role, User.is_active).filter(
+            User.username == username
+        ).first()
+    finally:
+        db.close()
+    if row is None:
+        return None
+    return UserPrincipal(id=row.id, username=row.username, role=row.role, is_active=row.is_active)
+
 def verify_password(plain_password, hashed_password):
     """
     Проверяет, соответствует ли введенный пароль хешированному паролю
@@ -60,9 +100,10 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
-async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
+async def get_user_from_token(token: str) -> UserPrincipal:
     """
-    Возвращает текущего пользователя на основе токена
+    Проверяет токен и возвращает пользователя.
+    Пользователь загружается из базы только при отсутствии в кэше
     """
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
@@ -76,12 +117,21 @@ async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = De
             raise credentials_exception
     except JWTError:
         raise credentials_exception
-    user = db.query(User).filter(User.username == username).first()
+    user = _principal_cache.get(username)
     if user is None:
-        raise credentials_exception
+        user = await run_in_threadpool(_load_principal, username)
+        if user is None:
+            raise credentials_exception
+        _principal_cache.set(username, user)
     return user
 
-async def get_current_active_user(current_user: User = Depends(get_current_user)):
+async def get_current_user(token: str = Depends(oauth2_scheme)) -> UserPrincipal:
+    """
+    Возвращает текущего пользователя на основе токена
+    """
+    return await get_user_from_token(token)
+
+async def get_current_active_user(current_user: UserPrincipal = Depends(get_current_user)) -> UserPrincipal:
     """
     Возвращает текущего активного пользователя
     """
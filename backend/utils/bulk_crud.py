@@ -0,0 +1,349 @@
+"""
+Пакетные операции над записями ресурса: POST/PATCH/DELETE /bulk.
+Все записи запроса обрабатываются в одной транзакции пакетными запросами,
+в ответе - результат по каждой записи
+"""
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional, Sequence, Set, Type
+
+from fastapi import APIRouter, Body, Depends, HTTPException, status
+from pydantic import BaseModel, ValidationError
+from sqlalchemy import cast, column, delete, insert, select, update, values
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.orm import Session
+
+from backend.config.database import get_db
+from backend.config.settings import BULK_INGEST_BATCH_SIZE, BULK_MAX_ITEMS
+from backend.schemas.bulk import BulkDeleteRequest, BulkResult
+from backend.utils.bulk_ingest import format_validation_error
+from backend.utils.crud import data_columns
+
+CREATE = "create"
+UPDATE = "update"
+DELETE = "delete"
+
+
+@dataclass
+class BulkHooks:
+    """
+    Действия, которые одиночные маршруты выполняют при изменении записей.
+    validate(db, rows) - проверки сверх схемы для записей в том виде, в котором они будут
+    сохранены (при обновлении - текущие значения с измененными полями); возвращает
+    список ошибок для каждой записи.
+    after_write(db, operation, old_rows, new_rows, fields) вызывается в транзакции
+    (для обновления - по группе записей с одинаковым набором полей fields),
+    after_commit(operation, old_rows, new_rows) - после фиксации
+    """
+    validate: Optional[Callable[[Session, List[Dict[str, Any]]], List[List[str]]]] = None
+    after_write: Optional[Callable[[Session, str, List[dict], List[dict], Optional[Set[str]]], None]] = None
+    after_commit: Optional[Callable[[str, List[dict], List[dict]], None]] = None
+
+
+def require_parent(key: str, parent_model, not_found: str):
+    """
+    Проверка validate: запись, на которую ссылается поле key, существует
+    (как в одиночных маршрутах, где для отсутствующей записи возвращается 404)
+    """
+    def validate(db: Session, rows: List[Dict[str, Any]]) -> List[List[str]]:
+        ids = {row[key] for row in rows if row[key] is not None}
+        found = set(db.execute(select(parent_model.id).where(parent_model.id.in_(ids))).scalars()) if ids else set()
+        return [[] if row[key] is None or row[key] in found else [f"{key}: {not_found}"] for row in rows]
+
+    return validate
+
+
+def _chunks(items: Sequence, size: int = BULK_INGEST_BATCH_SIZE):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+class _Report:
+    def __init__(self, received: int):
+        self.received = received
+        self.results: Dict[int, dict] = {}
+
+    def fail(self, index: int, status_name: str, errors: List[str], item_id: Optional[int] = None) -> None:
+        self.results[index] = {"index": index, "id": item_id, "status": status_name, "errors": errors}
+
+    def succeed(self, index: int, status_name: str, item_id: int) -> None:
+        self.results[index] = {"index": index, "id": item_id, "status": status_name, "errors": []}
+
+    @property
+    def has_failures(self) -> bool:
+        return any(result["errors"] for result in self.results.values())
+
+    def roll_back(self, items) -> dict:
+        """
+        Отмечает прошедшие проверку записи (пары индекс, ID) как не записанные (режим atomic)
+        """
+        for index, item_id in items:
+            self.results[index] = {"index": index, "id": item_id, "status": "rolled_back", "errors": []}
+        return self.build()
+
+    def build(self) -> dict:
+        results = [self.results[index] for index in sorted(self.results)]
+        succeeded = sum(1 for result in results if result["status"] in ("created", "updated", "deleted"))
+        return {
+            "received": self.received,
+            "succeeded": succeeded,
+            "failed": sum(1 for result in results if result["errors"]),
+            "results": results,
+        }
+
+
+def _check_size(items: Sequence) -> None:
+    if len(items) > BULK_MAX_ITEMS:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"Максимальное количество записей в запросе: {BULK_MAX_ITEMS}"
+        )
+
+
+def _write_error(exc: DBAPIError) -> HTTPException:
+    message = str(exc.orig).strip().splitlines()[0] if exc.orig is not None else str(exc)
+    return HTTPException(
+        status_code=status.HTTP_400_BAD_REQUEST,
+        detail=f"Пакет не записан, изменения отменены: {message}"
+    )
+
+
+class BulkOperations:
+    """
+    Реализация пакетных операций для таблицы модели
+    """
+
+    def __init__(self, model, create_schema: Type[BaseModel], update_schema: Type[BaseModel], hooks: Optional[BulkHooks] = None):
+        self.table = model.__table__
+        self.pk = self.table.c.id
+        self.columns = data_columns(self.table)
+        self.create_schema = create_schema
+        self.update_schema = update_schema
+        self.hooks = hooks or BulkHooks()
+
+    def _after_write(self, db: Session, operation: str, old_rows: List[dict], new_rows: List[dict], fields=None) -> None:
+        if self.hooks.after_write is not None and (old_rows or new_rows):
+            self.hooks.after_write(db, operation, old_rows, new_rows, fields)
+
+    def _errors(self, db: Session, rows: List[Dict[str, Any]]) -> List[List[str]]:
+        if self.hooks.validate is None or not rows:
+            return [[] for _ in rows]
+        return self.hooks.validate(db, rows)
+
+    def _commit(self, db: Session, operation: str, old_rows: List[dict], new_rows: List[dict]) -> None:
+        db.commit()
+        if self.hooks.after_commit is not None and (old_rows or new_rows):
+            self.hooks.after_commit(operation, old_rows, new_rows)
+
+    def _existing(self, db: Session, ids: List[int]) -> Dict[int, dict]:
+        """
+        Текущие значения записей (с блокировкой строк до конца транзакции)
+        """
+        existing = {}
+        for chunk in _chunks(ids):
+            rows = db.execute(select(*self.columns).where(self.pk.in_(chunk)).with_for_update()).mappings()
+            existing.update((row["id"], dict(row)) for row in rows)
+        return existing
+
+    def create(self, db: Session, items: List[Dict[str, Any]], atomic: bool) -> dict:
+        _check_size(items)
+        report = _Report(len(items))
+        rows, indexes = [], []
+        for index, item in enumerate(items):
+            try:
+                rows.append(self.create_schema(**item).dict())
+                indexes.append(index)
+            except ValidationError as exc:
+                report.fail(index, "invalid", format_validation_error(exc))
+            except TypeError:
+                report.fail(index, "invalid", ["Ожидался JSON-объект"])
+        valid_indexes, valid_rows = [], []
+        for index, row, errors in zip(indexes, rows, self._errors(db, rows)):
+            if errors:
+                report.fail(index, "invalid", errors)
+                continue
+            valid_indexes.append(index)
+            valid_rows.append(row)
+        indexes, rows = valid_indexes, valid_rows
+        if atomic and report.has_failures:
+            return report.roll_back((index, None) for index in indexes)
+
+        new_rows = []
+        try:
+            for chunk in _chunks(rows):
+                inserted = db.execute(
+                    insert(self.table).returning(*self.columns, sort_by_parameter_order=True), chunk
+                ).mappings().all()
+                new_rows.extend(dict(row) for row in inserted)
+            self._after_write(db, CREATE, [], new_rows)
+            self._commit(db, CREATE, [], new_rows)
+        except DBAPIError as exc:
+            db.rollback()
+            raise _write_error(exc)
+
+        for index, row in zip(indexes, new_rows):
+            report.succeed(index, "created", row["id"])
+        return report.build()
+
+    def _update_group(self, db: Session, fields: tuple, changes: List[dict]) -> List[dict]:
+        """
+        Обновляет записи с одинаковым набором полей одним запросом UPDATE ... FROM (VALUES ...)
+        """
+        data = values(
+            column("id", self.pk.type),
+            *[column(field, self.table.c[field].type) for field in fields],
+            name="bulk_values"
+        ).data([(change["id"], *[change[field] for field in fields]) for change in changes])
+        # Значения VALUES приходят без типа колонки, поэтому приводятся явно
+        statement = update(self.table).where(self.pk == data.c.id).values(
+            {field: cast(data.c[field], self.table.c[field].type) for field in fields}
+        ).returning(*self.columns)
+        return [dict(row) for row in db.execute(statement).mappings()]
+
+    def update(self, db: Session, items: List[Dict[str, Any]], atomic: bool) -> dict:
+        _check_size(items)
+        report = _Report(len(items))
+        changes: Dict[int, tuple] = {}
+        for index, item in enumerate(items):
+            if not isinstance(item, dict):
+                report.fail(index, "invalid", ["Ожидался JSON-объект"])
+                continue
+            item_id = item.get("id")
+            if not isinstance(item_id, int) or isinstance(item_id, bool):
+                report.fail(index, "invalid", ["id: требуется целочисленный идентификатор записи"])
+                continue
+            if item_id in changes:
+                report.fail(index, "invalid", ["id: запись уже изменяется в этом запросе"], item_id)
+                continue
+            try:
+                update_data = self.update_schema(**{k: v for k, v in item.items() if k != "id"}).dict(exclude_unset=True)
+            except ValidationError as exc:
+                report.fail(index, "invalid", format_validation_error(exc), item_id)
+                continue
+            if not update_data:
+                report.fail(index, "invalid", ["Нет полей для обновления"], item_id)
+                continue
+            changes[item_id] = (index, update_data)
+
+        try:
+            existing = self._existing(db, list(changes))
+            for item_id, (index, _) in list(changes.items()):
+                if item_id not in existing:
+                    report.fail(index, "not_found", ["Запись не найдена"], item_id)
+                    del changes[item_id]
+            merged = [{**existing[item_id], **update_data} for item_id, (_, update_data) in changes.items()]
+            for (item_id, (index, _)), errors in zip(list(changes.items()), self._errors(db, merged)):
+                if errors:
+                    report.fail(index, "invalid", errors, item_id)
+                    del changes[item_id]
+            if atomic and report.has_failures:
+                db.rollback()
+                return report.roll_back((index, item_id) for item_id, (index, _) in changes.items())
+
+            groups: Dict[tuple, List[dict]] = {}
+            for item_id, (_, update_data) in changes.items():
+                groups.setdefault(tuple(sorted(update_data)), []).append({"id": item_id, **update_data})
+
+            old_rows, new_rows = [], []
+            for fields, group in groups.items():
+                for chunk in _chunks(group):
+                    updated = self._update_group(db, fields, chunk)
+                    chunk_old = [existing[row["id"]] for row in updated]
+                    self._after_write(db, UPDATE, chunk_old, updated, set(fields))
+                    old_rows.extend(chunk_old)
+                    new_rows.extend(updated)
+            self._commit(db, UPDATE, old_rows, new_rows)
+        except DBAPIError as exc:
+            db.rollback()
+            raise _write_error(exc)
+
+        for item_id, (index, _) in changes.items():
+            report.succeed(index, "updated", item_id)
+        return report.build()
+
+    def delete(self, db: Session, ids: List[int], atomic: bool) -> dict:
+        _check_size(ids)
+        report = _Report(len(ids))
+        unique_ids: Dict[int, int] = {}
+        for index, item_id in enumerate(ids):
+            if item_id in unique_ids:
+                report.fail(index, "invalid", ["id: запись уже удаляется в этом запросе"], item_id)
+            else:
+                unique_ids[item_id] = index
+
+        try:
+            existing = self._existing(db, list(unique_ids))
+            for item_id, index in list(unique_ids.items()):
+                if item_id not in existing:
+                    report.fail(index, "not_found", ["Запись не найдена"], item_id)
+                    del unique_ids[item_id]
+            if atomic and report.has_failures:
+                db.rollback()
+                return report.roll_back((index, item_id) for item_id, index in unique_ids.items())
+
+            old_rows = []
+            for chunk in _chunks(list(unique_ids)):
+                deleted = db.execute(delete(self.table).where(self.pk.in_(chunk)).returning(*self.columns)).mappings()
+                old_rows.extend(dict(row) for row in deleted)
+            self._after_write(db, DELETE, old_rows, [])
+            self._commit(db, DELETE, old_rows, [])
+        except DBAPIError as exc:
+            db.rollback()
+            raise _write_error(exc)
+
+        for item_id, index in unique_ids.items():
+            report.succeed(index, "deleted", item_id)
+        return report.build()
+
+
+def add_bulk_routes(
+    router: APIRouter,
+    model,
+    create_schema: Type[BaseModel],
+    update_schema: Type[BaseModel],
+    hooks: Optional[BulkHooks] = None,
+    dependencies: Optional[list] = None,
+    path: str = "/bulk"
+) -> BulkOperations:
+    """
+    Регистрирует POST/PATCH/DELETE /bulk для ресурса (для вложенных ресурсов роутера -
+    по пути path, например /payment-methods/bulk). Вызывается до объявления
+    маршрутов /{id}, иначе DELETE /bulk будет перехвачен маршрутом удаления по ID.
+    atomic=true - если хотя бы одна запись не прошла проверку, не записывается ничего
+    """
+    operations = BulkOperations(model, create_schema, update_schema, hooks)
+    name = model.__tablename__
+
+    @router.post(path, response_model=BulkResult, dependencies=dependencies, name=f"bulk_create_{name}")
+    def bulk_create(
+        items: List[Any] = Body(..., description=f"Записи по схеме {create_schema.__name__}"),
+        atomic: bool = False,
+        db: Session = Depends(get_db)
+    ):
+        """
+        Создать записи пакетом
+        """
+        return operations.create(db, items, atomic)
+
+    @router.patch(path, response_model=BulkResult, dependencies=dependencies, name=f"bulk_update_{name}")
+    def bulk_update(
+        items: List[Any] = Body(..., description=f"Записи с полем id и полями по схеме {update_schema.__name__}"),
+        atomic: bool = False,
+        db: Session = Depends(get_db)
+    ):
+        """
+        Обновить записи пакетом (передаются только изменяемые поля)
+        """
+        return operations.update(db, items, atomic)
+
+    @router.delete(path, response_model=BulkResult, dependencies=dependencies, name=f"bulk_delete_{name}")
+    def bulk_delete(
+        request: BulkDeleteRequest,
+        atomic: bool = False,
+        db: Session = Depends(get_db)
+    ):
+        """
+        Удалить записи пакетом
+        """
+        return operations.delete(db, request.ids, atomic)
+
+    return operations
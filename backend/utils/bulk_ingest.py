@@ -0,0 +1,233 @@
+"""
+Потоковый разбор и пакетная запись данных в форматах NDJSON и CSV
+"""
+import codecs
+import csv
+import json
+from collections import deque
+from typing import AsyncIterator, Callable, List, Optional, Tuple, Type, Union
+
+from fastapi import HTTPException, status
+from pydantic import BaseModel, ValidationError
+from sqlalchemy import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+
+from backend.config.settings import BULK_INGEST_BATCH_SIZE, BULK_INGEST_MAX_ERRORS
+
+FORMAT_NDJSON = "ndjson"
+FORMAT_CSV = "csv"
+
+CONTENT_TYPES = {
+    "application/x-ndjson": FORMAT_NDJSON,
+    "application/ndjson": FORMAT_NDJSON,
+    "application/jsonlines": FORMAT_NDJSON,
+    "text/csv": FORMAT_CSV,
+    "application/csv": FORMAT_CSV,
+}
+
+
+def resolve_format(data_format: Optional[str], content_type: Optional[str]) -> Optional[str]:
+    """
+    Определяет формат тела запроса по параметру format или заголовку Content-Type
+    """
+    if data_format:
+        data_format = data_format.lower()
+        return data_format if data_format in (FORMAT_NDJSON, FORMAT_CSV) else None
+    if content_type:
+        return CONTENT_TYPES.get(content_type.split(";")[0].strip().lower())
+    return None
+
+
+def insert_rows(model) -> Callable[[Session, List[dict]], None]:
+    """
+    Возвращает функцию пакетной вставки строк в таблицу модели.
+    Весь пакет уходит одним executemany (multi-row VALUES в psycopg2)
+    """
+    statement = insert(model.__table__)
+
+    def write_batch(db: Session, rows: List[dict]) -> None:
+        db.execute(statement, rows)
+
+    return write_batch
+
+
+async def iter_lines(chunks: AsyncIterator[bytes]) -> AsyncIterator[Tuple[int, str]]:
+    """
+    Разбивает поток байтов на строки, не загружая тело запроса целиком
+    """
+    decoder = codecs.getincrementaldecoder("utf-8-sig")()
+    buffer = ""
+    line_no = 0
+    async for chunk in chunks:
+        buffer += decoder.decode(chunk)
+        *lines, buffer = buffer.split("\n")
+        for line in lines:
+            line_no += 1
+            yield line_no, line.rstrip("\r")
+    buffer += decoder.decode(b"", final=True)
+    if buffer:
+        line_no += 1
+        yield line_no, buffer.rstrip("\r")
+
+
+class _LineSource:
+    """
+    Источник строк для csv.reader. Когда строки заканчиваются, чтение прерывается
+    (underflow = True), но источник можно пополнить и читать дальше
+    """
+
+    def __init__(self):
+        self.lines = deque()
+        self.underflow = False
+
+    def __iter__(self):
+        return self
+
+    def __next__(self) -> str:
+        if not self.lines:
+            self.underflow = True
+            raise StopIteration
+        return self.lines.popleft()
+
+
+async def iter_records(
+    chunks: AsyncIterator[bytes],
+    data_format: str
+) -> AsyncIterator[Tuple[int, Optional[dict], Optional[str]]]:
+    """
+    Возвращает записи потока в виде (номер строки, запись, ошибка разбора).
+    Запись CSV может занимать несколько строк (перевод строки в поле в кавычках):
+    где заканчивается запись, определяет сам csv.reader - если ему не хватило строк,
+    запись читается заново после следующей строки. Номер записи - номер ее первой строки
+    """
+    header = None
+    source = _LineSource()
+    reader = csv.reader(source)
+    # Строки текущей записи CSV
+    pending = []
+    record_start = 0
+    async for line_no, line in iter_lines(chunks):
+        if not pending and not line.strip():
+            continue
+
+        if data_format == FORMAT_NDJSON:
+            try:
+                record = json.loads(line)
+            except ValueError as exc:
+                yield line_no, None, f"Некорректный JSON: {exc}"
+                continue
+            if not isinstance(record, dict):
+                yield line_no, None, "Ожидался JSON-объект"
+                continue
+            yield line_no, record, None
+            continue
+
+        if not pending:
+            record_start = line_no
+        pending.append(line + "\n")
+        # Строка без кавычек не может закрыть поле в кавычках, начатое на предыдущих строках
+        if len(pending) > 1 and '"' not in line:
+            continue
+        source.lines.extend(pending)
+        source.underflow = False
+        try:
+            values = next(reader)
+        except csv.Error as exc:
+            # Например, поле длиннее csv.field_size_limit() - запись пропускается
+            source.lines.clear()
+            pending = []
+            yield record_start, None, f"Некорректная запись CSV: {exc}"
+            continue
+        if source.underflow:
+            # Поле в кавычках продолжается на следующей строке
+            continue
+        pending = []
+        if header is None:
+            header = [name.strip() for name in values]
+            continue
+        if len(values) != len(header):
+            yield record_start, None, f"Ожидалось колонок: {len(header)}, получено: {len(values)}"
+            continue
+        # Пустая ячейка CSV означает отсутствие значения - поле получит значение по умолчанию
+        yield record_start, {name: value for name, value in zip(header, values) if value != ""}, None
+
+    if pending:
+        yield record_start, None, "Не закрыта кавычка поля CSV"
+
+
+async def run_in_session(db: Union[Session, AsyncSession], fn: Callable, *args):
+    """
+    Выполняет синхронную функцию fn(session, *args): для асинхронной сессии через run_sync,
+    для обычной - в пуле потоков
+    """
+    if isinstance(db, AsyncSession):
+        return await db.run_sync(fn, *args)
+    return await run_in_threadpool(fn, db, *args)
+
+
+def format_validation_error(exc: ValidationError) -> List[str]:
+    return [
+        f"{'.'.join(str(part) for part in error['loc'])}: {error['msg']}"
+        for error in exc.errors()
+    ]
+
+
+async def ingest_stream(
+    db: Union[Session, AsyncSession],
+    chunks: AsyncIterator[bytes],
+    schema: Type[BaseModel],
+    data_format: str,
+    write_batch: Callable[[Session, List[dict]], Optional[int]],
+    batch_size: int = BULK_INGEST_BATCH_SIZE
+) -> dict:
+    """
+    Валидирует записи потока по схеме и записывает корректные записи пакетами
+    в одной транзакции. Возвращает отчет с ошибками по номерам строк
+    """
+    report = {"received": 0, "inserted": 0, "failed": 0, "errors": [], "errors_truncated": False}
+
+    def add_error(line_no: int, errors: List[str]) -> None:
+        report["failed"] += 1
+        if len(report["errors"]) < BULK_INGEST_MAX_ERRORS:
+            report["errors"].append({"line": line_no, "errors": errors})
+        else:
+            report["errors_truncated"] = True
+
+    async def flush(rows: List[dict]) -> None:
+        written = await run_in_session(db, write_batch, rows)
+        # Функция записи может вернуть число фактически записанных строк (например, без дубликатов)
+        report["inserted"] += len(rows) if written is None else written
+
+    batch = []
+    try:
+        async for line_no, record, error in iter_records(chunks, data_format):
+            report["received"] += 1
+            if error:
+                add_error(line_no, [error])
+                continue
+            try:
+                batch.append(schema(**record).dict())
+            except ValidationError as exc:
+                add_error(line_no, format_validation_error(exc))
+                continue
+
+            if len(batch) >= batch_size:
+                await flush(batch)
+                batch = []
+
+        if batch:
+            await flush(batch)
+        await run_in_session(db, Session.commit)
+    except UnicodeDecodeError:
+        await run_in_session(db, Session.rollback)
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Тело запроса должно быть в кодировке UTF-8"
+        )
+    except Exception:
+        await run_in_session(db, Session.rollback)
+        raise
+
+    return report
@@ -0,0 +1,186 @@
+"""
+Объединение жалоб в инциденты. Новая жалоба с координатами присоединяется к открытому
+инциденту той же категории, центр которого не дальше COMPLAINT_CLUSTER_RADIUS метров,
+а последняя жалоба поступила не раньше чем за COMPLAINT_CLUSTER_WINDOW_MINUTES минут;
+иначе создается новый инцидент. Центр инцидента - среднее координат его жалоб.
+Кандидаты ищутся по сетке с шагом COMPLAINT_CLUSTER_RADIUS: центр подходящего инцидента
+лежит в одной из 3x3 соседних ячеек, поэтому поиск - один проход по индексу
+(category, cell_y, cell_x, last_seen) открытых инцидентов
+"""
+import math
+from datetime import timedelta
+from typing import Dict, Iterable, List, Mapping, Optional, Set
+
+from sqlalchemy import func, select, update
+from sqlalchemy.orm import Session
+from sqlalchemy.orm.attributes import set_committed_value
+from sqlalchemy.orm.util import identity_key
+
+from backend.config.settings import COMPLAINT_CLUSTER_RADIUS, COMPLAINT_CLUSTER_WINDOW_MINUTES
+from backend.models.complaints import Complaint, ComplaintCluster
+from backend.utils.crud import data_columns
+from backend.utils.geo import METERS_PER_DEGREE, distance_expression
+
+OPEN = "open"
+RESOLVED = "resolved"
+
+# Ключ advisory-блокировки (вместе с хэшем категории): жалобы одной категории
+# присоединяются к инцидентам по очереди, чтобы одновременные жалобы не создали два инцидента
+CLUSTER_LOCK_KEY = 72_025
+
+# Поля жалобы, от которых зависит инцидент
+CLUSTER_FIELDS = ("category", "latitude", "longitude")
+
+
+def complaint_row(complaint: Complaint) -> dict:
+    """
+    Значения колонок ORM-объекта жалобы в виде словаря (как строки пакетных операций)
+    """
+    return {column.key: getattr(complaint, column.key) for column in data_columns(Complaint.__table__)}
+
+
+def _cell_y(latitude: float) -> int:
+    return math.floor(latitude * METERS_PER_DEGREE / COMPLAINT_CLUSTER_RADIUS)
+
+
+def _cell_x(longitude: float, cell_y: int) -> int:
+    # Шаг по долготе в метрах одинаков внутри строки сетки (по широте ее середины)
+    row_latitude = min(abs(cell_y + 0.5) * COMPLAINT_CLUSTER_RADIUS / METERS_PER_DEGREE, 90.0)
+    return math.floor(longitude * METERS_PER_DEGREE * math.cos(math.radians(row_latitude)) / COMPLAINT_CLUSTER_RADIUS)
+
+
+def _place(cluster: ComplaintCluster, latitude: float, longitude: float) -> None:
+    cluster.latitude = latitude
+    cluster.longitude = longitude
+    cluster.cell_y = _cell_y(latitude)
+    cluster.cell_x = _cell_x(longitude, cluster.cell_y)
+
+
+def _attach(db: Session, row: Mapping) -> int:
+    """
+    Присоединяет жалобу к ближайшему подходящему инциденту или создает новый; возвращает ID инцидента
+    """
+    latitude, longitude, created_at = row["latitude"], row["longitude"], row["created_at"]
+    db.execute(select(func.pg_advisory_xact_lock(CLUSTER_LOCK_KEY, func.hashtext(row["category"]))))
+
+    cell_y = _cell_y(latitude)
+    rows = (cell_y - 1, cell_y, cell_y + 1)
+    columns = [_cell_x(longitude, row_y) for row_y in rows]
+    distance = distance_expression(ComplaintCluster.latitude, ComplaintCluster.longitude, latitude, longitude)
+    cluster = db.execute(
+        select(ComplaintCluster).where(
+            ComplaintCluster.category == row["category"],
+            ComplaintCluster.status == OPEN,
+            ComplaintCluster.cell_y.in_(rows),
+            ComplaintCluster.cell_x.between(min(columns) - 1, max(columns) + 1),
+            ComplaintCluster.last_seen >= created_at - timedelta(minutes=COMPLAINT_CLUSTER_WINDOW_MINUTES),
+            distance <= COMPLAINT_CLUSTER_RADIUS
+        ).order_by(distance).limit(1)
+    ).scalar()
+
+    if cluster is None:
+        cluster = ComplaintCluster(
+            category=row["category"],
+            status=OPEN,
+            location=row["location"],
+            complaints=1,
+            first_seen=created_at,
+            last_seen=created_at
+        )
+        _place(cluster, latitude, longitude)
+        db.add(cluster)
+        db.flush()
+        return cluster.id
+
+    count = cluster.complaints
+    _place(
+        cluster,
+        (cluster.latitude * count + latitude) / (count + 1),
+        (cluster.longitude * count + longitude) / (count + 1)
+    )
+    cluster.complaints = count + 1
+    cluster.first_seen = min(cluster.first_seen, created_at)
+    cluster.last_seen = max(cluster.last_seen, created_at)
+    # Сессии работают без autoflush: следующая жалоба ищет инцидент по уже сохраненному центру
+    db.flush()
+    return cluster.id
+
+
+def _recount(db: Session, cluster_ids: Set[int]) -> None:
+    """
+    Пересчитывает центр, количество и время жалоб инцидентов; инциденты без жалоб удаляются
+    """
+    stats = {
+        row.cluster_id: row for row in db.execute(
+            select(
+                Complaint.cluster_id,
+                func.count().label("complaints"),
+                func.avg(Complaint.latitude).label("latitude"),
+                func.avg(Complaint.longitude).label("longitude"),
+                func.min(Complaint.created_at).label("first_seen"),
+                func.max(Complaint.created_at).label("last_seen"),
+            ).where(Complaint.cluster_id.in_(cluster_ids)).group_by(Complaint.cluster_id)
+        )
+    }
+    for cluster in db.execute(select(ComplaintCluster).where(ComplaintCluster.id.in_(cluster_ids))).scalars():
+        row = stats.get(cluster.id)
+        if row is None:
+            db.delete(cluster)
+            continue
+        _place(cluster, row.latitude, row.longitude)
+        cluster.complaints = row.complaints
+        cluster.first_seen = row.first_seen
+        cluster.last_seen = row.last_seen
+    db.flush()
+
+
+def _set_cluster(db: Session, complaint_ids: List[int], cluster_id: Optional[int]) -> None:
+    """
+    Записывает ID инцидента жалобам; загруженные в сессию объекты жалоб получают
+    то же значение без повторного UPDATE при фиксации
+    """
+    db.execute(
+        update(Complaint).where(Complaint.id.in_(complaint_ids)).values(cluster_id=cluster_id),
+        execution_options={"synchronize_session": False}
+    )
+    for complaint_id in complaint_ids:
+        complaint = db.identity_map.get(identity_key(Complaint, complaint_id))
+        if complaint is not None:
+            set_committed_value(complaint, "cluster_id", cluster_id)
+
+
+def update_clusters(db: Session, old_rows: Iterable[Mapping], new_rows: Iterable[Mapping]) -> Dict[int, int]:
+    """
+    Согласует инциденты с изменившимися жалобами (строки до и после записи, как в пакетных
+    операциях): новые жалобы и жалобы с измененными категорией или координатами присоединяются
+    к инцидентам заново, инциденты удаленных и перемещенных жалоб пересчитываются.
+    Возвращает ID инцидента для каждой присоединенной жалобы. Транзакцию не фиксирует
+    """
+    old = {row["id"]: row for row in old_rows}
+    new = {row["id"]: row for row in new_rows}
+    changed = {
+        complaint_id for complaint_id, row in new.items()
+        if complaint_id not in old or any(row[name] != old[complaint_id][name] for name in CLUSTER_FIELDS)
+    }
+    detached = [
+        complaint_id for complaint_id, row in old.items()
+        if row["cluster_id"] is not None and (complaint_id not in new or complaint_id in changed)
+    ]
+    if detached:
+        moved = [complaint_id for complaint_id in detached if complaint_id in new]
+        if moved:
+            _set_cluster(db, moved, None)
+        _recount(db, {old[complaint_id]["cluster_id"] for complaint_id in detached})
+
+    pending = sorted(
+        (new[complaint_id] for complaint_id in changed
+         if new[complaint_id]["latitude"] is not None and new[complaint_id]["longitude"] is not None),
+        key=lambda row: (row["created_at"], row["id"])
+    )
+    assigned = {row["id"]: _attach(db, row) for row in pending}
+    members: Dict[int, List[int]] = {}
+    for complaint_id, cluster_id in assigned.items():
+        members.setdefault(cluster_id, []).append(complaint_id)
+    for cluster_id, complaint_ids in members.items():
+        _set_cluster(db, complaint_ids, cluster_id)
+    return assigned
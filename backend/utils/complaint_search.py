@@ -0,0 +1,100 @@
+"""
+Поиск жалоб: полнотекстовый по вектору search_vector (описание, местоположение, имя)
+и подстрочный по тем же полям (ILIKE по индексам pg_trgm).
+Ранжирование и подсветка: ts_rank_cd по весам вектора и ts_headline по описанию.
+Подсветка - безопасный HTML: текст описания экранируется, разметку составляют только <mark>.
+По релевантности упорядочиваются COMPLAINT_SEARCH_CANDIDATES последних (по id) совпадений:
+для частых слов ранг не вычисляется по всем строкам таблицы, и время поиска не зависит
+от числа совпадений. Если совпадений больше, строки результата содержат truncated = true
+(маршрут возвращает заголовок X-Search-Truncated), и более старые совпадения в выдачу
+не попадают. Подсветка строится только для строк запрошенной страницы
+"""
+import html
+from typing import Optional
+
+from sqlalchemy import Float, cast, func, literal_column, or_, select
+
+from backend.config.settings import COMPLAINT_SEARCH_CANDIDATES
+from backend.models.complaints import Complaint
+from backend.utils.crud import data_columns
+from backend.utils.pagination import Pagination
+
+# Конфигурация задается константой SQL, а не параметром запроса: тогда tsquery вычисляется
+# один раз при планировании, а не для каждой проверяемой строки
+SEARCH_CONFIG = literal_column("'russian'::regconfig")
+
+# Заголовок ответа: совпадений больше COMPLAINT_SEARCH_CANDIDATES, упорядочены только последние
+SEARCH_TRUNCATED_HEADER = "X-Search-Truncated"
+
+# Границы совпадений в подсветке: управляющие символы, которые заменяются на <mark> и </mark>
+# после экранирования описания (из самого описания они удаляются)
+HEADLINE_START, HEADLINE_STOP = "\x02", "\x03"
+
+# Выделение совпадений и размер фрагментов описания в подсветке
+HEADLINE_OPTIONS = (
+    f"StartSel={HEADLINE_START}, StopSel={HEADLINE_STOP}, "
+    "MaxWords=30, MinWords=10, MaxFragments=2, FragmentDelimiter= … "
+)
+
+
+def headline_html(headline: Optional[str]) -> Optional[str]:
+    """
+    Фрагменты ts_headline в виде HTML: описание экранируется, совпадения выделяются <mark>
+    """
+    if headline is None:
+        return None
+    return html.escape(headline).replace(HEADLINE_START, "<mark>").replace(HEADLINE_STOP, "</mark>")
+
+
+def _contains(column, text: str):
+    """
+    Условие вхождения подстроки без учета регистра (символы шаблона LIKE экранируются)
+    """
+    escaped = text.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    return column.ilike(f"%{escaped}%", escape="\\")
+
+
+def search_statement(
+    pagination: Pagination,
+    text: str,
+    status: Optional[str] = None,
+    category: Optional[str] = None,
+    priority: Optional[str] = None
+):
+    """
+    Запрос страницы результатов поиска по убыванию релевантности (rank, затем id).
+    Страница выбирается по ключу (rank, id), поэтому доступна keyset-пагинация.
+    Колонка truncated - совпадений больше COMPLAINT_SEARCH_CANDIDATES
+    (читается на одно совпадение больше, чем упорядочивается)
+    """
+    query = func.websearch_to_tsquery(SEARCH_CONFIG, text)
+    # ts_rank_cd возвращает real; double precision сохраняет значение в курсоре без потери точности
+    rank = cast(func.ts_rank_cd(Complaint.search_vector, query), Float).label("rank")
+
+    matches = select(Complaint.id, rank).where(or_(
+        Complaint.search_vector.op("@@")(query),
+        _contains(Complaint.description, text),
+        _contains(Complaint.location, text),
+        _contains(Complaint.full_name, text),
+    ))
+    for column, value in ((Complaint.status, status), (Complaint.category, category), (Complaint.priority, priority)):
+        if value is not None:
+            matches = matches.where(column == value)
+    matches = matches.order_by(Complaint.id.desc()).limit(COMPLAINT_SEARCH_CANDIDATES + 1).cte("matches")
+    candidates = select(matches).order_by(matches.c.id.desc()).limit(COMPLAINT_SEARCH_CANDIDATES).subquery()
+    truncated = select(func.count()).select_from(matches).scalar_subquery() > COMPLAINT_SEARCH_CANDIDATES
+    page = pagination.apply(
+        select(candidates.c.id, candidates.c.rank), candidates.c.rank, candidates.c.id, descending=True
+    ).subquery()
+
+    return select(
+        *data_columns(Complaint.__table__),
+        page.c.rank,
+        func.ts_headline(
+            SEARCH_CONFIG,
+            func.translate(Complaint.description, HEADLINE_START + HEADLINE_STOP, ""),
+            query,
+            HEADLINE_OPTIONS
+        ).label("headline"),
+        truncated.label("truncated"),
+    ).join(page, page.c.id == Complaint.id).order_by(page.c.rank.desc(), Complaint.id.desc())
@@ -0,0 +1,150 @@
+"""
+Общие операции маршрутов CRUD. Запись выполняется одним INSERT/UPDATE ... RETURNING
+без повторного SELECT (db.refresh): значения, заданные базой, модели получают через
+eager_defaults, а сессии не сбрасывают объекты при commit (см. config/database.py)
+"""
+from typing import Any, Dict, List, Optional, TypeVar
+
+from fastapi import HTTPException, status
+from pydantic import BaseModel
+from sqlalchemy import lambda_stmt, select
+from sqlalchemy.engine import Result
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from backend.utils.geo import GeoFilter
+from backend.utils.pagination import Pagination
+
+T = TypeVar("T")
+
+
+def _dicts(result: Result) -> List[dict]:
+    # Словари проверяются схемой ответа заметно быстрее, чем Row по атрибутам
+    keys = list(result.keys())
+    return [dict(zip(keys, row)) for row in result]
+
+
+def data_columns(table) -> list:
+    """
+    Колонки таблицы без вычисляемых базой служебных колонок (например, поисковых векторов)
+    """
+    return [column for column in table.c if column.computed is None]
+
+
+def apply_update(obj: T, update_data: Dict[str, Any]) -> T:
+    """
+    Переносит в объект переданные поля (результат schema.dict(exclude_unset=True))
+    """
+    for field, value in update_data.items():
+        setattr(obj, field, value)
+    return obj
+
+
+def save(db: Session, obj: T) -> T:
+    """
+    Сохраняет новый или измененный объект и фиксирует транзакцию
+    """
+    db.add(obj)
+    db.commit()
+    return obj
+
+
+async def save_async(db: AsyncSession, obj: T) -> T:
+    """
+    Асинхронный вариант save
+    """
+    db.add(obj)
+    await db.commit()
+    return obj
+
+
+class CRUDService:
+    """
+    Типовые операции ресурса. Списки и чтение по ID выбирают колонки таблицы без создания
+    ORM-объектов: строки передаются в схему ответа словарями.
+    Запросы строятся один раз, скомпилированный SQL берется из кэша SQLAlchemy
+    (чтение по ID - lambda_stmt). ORM-объекты загружаются только для записи
+    """
+
+    def __init__(self, model, not_found: str):
+        self.model = model
+        self.not_found = not_found
+        table = model.__table__
+        self.key = table.c.id
+        columns = data_columns(table)
+        self.rows = select(*columns)
+        self._row_by_id = lambda item_id: lambda_stmt(lambda: select(*columns).where(table.c.id == item_id))
+
+    def _missing(self) -> HTTPException:
+        return HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=self.not_found)
+
+    def list_statement(self, geo: Optional[GeoFilter] = None, *conditions):
+        """
+        Запрос строк списка с фильтрами по координатам и дополнительными условиями
+        """
+        statement = self.rows.where(*conditions) if conditions else self.rows
+        return statement if geo is None else geo.apply(statement, self.model)
+
+    def list(self, db: Session, pagination: Pagination, geo: Optional[GeoFilter] = None, *conditions) -> List[dict]:
+        statement = pagination.apply(self.list_statement(geo, *conditions), self.key)
+        return pagination.page(_dicts(db.execute(statement)))
+
+    async def list_async(
+        self, db: AsyncSession, pagination: Pagination, geo: Optional[GeoFilter] = None, *conditions
+    ) -> List[dict]:
+        result = await db.execute(pagination.apply(self.list_statement(geo, *conditions), self.key))
+        return pagination.page(_dicts(result))
+
+    def get_row(self, db: Session, item_id: int) -> dict:
+        """
+        Запись для ответа (404, если записи нет)
+        """
+        rows = _dicts(db.execute(self._row_by_id(item_id)))
+        if not rows:
+            raise self._missing()
+        return rows[0]
+
+    async def get_row_async(self, db: AsyncSession, item_id: int) -> dict:
+        rows = _dicts(await db.execute(self._row_by_id(item_id)))
+        if not rows:
+            raise self._missing()
+        return rows[0]
+
+    def get(self, db: Session, item_id: int):
+        """
+        ORM-объект записи для изменения (404, если записи нет)
+        """
+        obj = db.get(self.model, item_id)
+        if obj is None:
+            raise self._missing()
+        return obj
+
+    async def get_async(self, db: AsyncSession, item_id: int):
+        obj = await db.get(self.model, item_id)
+        if obj is None:
+            raise self._missing()
+        return obj
+
+    def create(self, db: Session, data: BaseModel, **values):
+        """
+        Создает запись по схеме; values (например, ID родителя из пути) заменяют поля схемы
+        """
+        return save(db, self.model(**{**data.dict(), **values}))
+
+    async def create_async(self, db: AsyncSession, data: BaseModel, **values):
+        return await save_async(db, self.model(**{**data.dict(), **values}))
+
+    def update(self, db: Session, item_id: int, data: BaseModel):
+        return save(db, apply_update(self.get(db, item_id), data.dict(exclude_unset=True)))
+
+    async def update_async(self, db: AsyncSession, item_id: int, data: BaseModel):
+        obj = await self.get_async(db, item_id)
+        return await save_async(db, apply_update(obj, data.dict(exclude_unset=True)))
+
+    def delete(self, db: Session, item_id: int) -> None:
+        db.delete(self.get(db, item_id))
+        db.commit()
+
+    async def delete_async(self, db: AsyncSession, item_id: int) -> None:
+        await db.delete(await self.get_async(db, item_id))
+        await db.commit()
@@ -0,0 +1,128 @@
+"""
+Метрики пулов подключений к базе данных в формате Prometheus
+"""
+import threading
+import time
+from typing import Dict, List, Type
+
+from sqlalchemy import exc
+from sqlalchemy.pool import Pool
+
+# Границы гистограммы ожидания подключения из пула, в секундах
+WAIT_BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+class PoolMetrics:
+    """
+    Счетчики одного пула: время ожидания выдачи подключения и ошибки выдачи
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self.pool = None
+        self.wait_buckets = [0] * len(WAIT_BUCKETS)
+        self.wait_count = 0
+        self.wait_sum = 0.0
+        self.wait_max = 0.0
+        self.timeouts = 0
+        self.errors = 0
+        self._lock = threading.Lock()
+
+    def observe_wait(self, seconds: float) -> None:
+        with self._lock:
+            self.wait_count += 1
+            self.wait_sum += seconds
+            self.wait_max = max(self.wait_max, seconds)
+            for index, bound in enumerate(WAIT_BUCKETS):
+                if seconds <= bound:
+                    self.wait_buckets[index] += 1
+
+    def observe_failure(self, error: Exception) -> None:
+        with self._lock:
+            if isinstance(error, exc.TimeoutError):
+                self.timeouts += 1
+            else:
+                self.errors += 1
+
+
+# Метрики всех пулов процесса по имени
+pool_metrics: Dict[str, PoolMetrics] = {}
+
+
+def instrumented_pool(base: Type[Pool], name: str) -> Type[Pool]:
+    """
+    Возвращает класс пула на основе base, который учитывает время ожидания
+    и ошибки выдачи подключений в метриках с именем name.
+    Класс (а не экземпляр) нужен, чтобы метрики сохранялись при пересоздании пула
+    """
+    metrics = pool_metrics.setdefault(name, PoolMetrics(name))
+
+    class InstrumentedPool(base):
+        def __init__(self, *args, **kwargs):
+            super().__init__(*args, **kwargs)
+            metrics.pool = self
+
+        def _do_get(self):
+            started = time.perf_counter()
+            try:
+                connection = super()._do_get()
+            except Exception as error:
+                metrics.observe_failure(error)
+                raise
+            metrics.observe_wait(time.perf_counter() - started)
+            return connection
+
+    InstrumentedPool.__name__ = f"Instrumented{base.__name__}"
+    return InstrumentedPool
+
+
+def _format_value(value: float) -> str:
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def render_prometheus() -> str:
+    """
+    Формирует текст метрик всех пулов в формате Prometheus
+    """
+    lines: List[str] = []
+
+    def metric(name: str, kind: str, help_text: str, samples) -> None:
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {kind}")
+        for labels, value in samples:
+            label_text = ",".join(f'{key}="{label}"' for key, label in labels.items())
+            lines.append(f"{name}{{{label_text}}} {_format_value(value)}")
+
+    pools = [metrics for metrics in pool_metrics.values() if metrics.pool is not None]
+
+    metric("db_pool_size", "gauge", "Configured pool size", [
+        ({"pool": m.name}, m.pool.size()) for m in pools
+    ])
+    metric("db_pool_checked_out", "gauge", "Connections currently checked out", [
+        ({"pool": m.name}, m.pool.checkedout()) for m in pools
+    ])
+    metric("db_pool_checked_in", "gauge", "Idle connections in the pool", [
+        ({"pool": m.name}, m.pool.checkedin()) for m in pools
+    ])
+    metric("db_pool_overflow", "gauge", "Overflow connections beyond pool size (negative while the pool is not full)", [
+        ({"pool": m.name}, m.pool.overflow()) for m in pools
+    ])
+    metric("db_pool_checkout_failures_total", "counter", "Failed connection checkouts", [
+        sample
+        for m in pools
+        for sample in (({"pool": m.name, "reason": "timeout"}, m.timeouts), ({"pool": m.name, "reason": "error"}, m.errors))
+    ])
+    metric("db_pool_checkout_wait_max_seconds", "gauge", "Longest connection checkout wait", [
+        ({"pool": m.name}, m.wait_max) for m in pools
+    ])
+
+    lines.append("# HELP db_pool_checkout_wait_seconds Time spent waiting for a connection from the pool")
+    lines.append("# TYPE db_pool_checkout_wait_seconds histogram")
+    for m in pools:
+        for bound, count in zip(WAIT_BUCKETS, m.wait_buckets):
+            lines.append(f'db_pool_checkout_wait_seconds_bucket{{pool="{m.name}",le="{bound}"}} {count}')
+        lines.append(f'db_pool_checkout_wait_seconds_bucket{{pool="{m.name}",le="+Inf"}} {m.wait_count}')
+        lines.append(f'db_pool_checkout_wait_seconds_sum{{pool="{m.name}"}} {_format_value(m.wait_sum)}')
+        lines.append(f'db_pool_checkout_wait_seconds_count{{pool="{m.name}"}} {m.wait_count}')
+
+    return "\n".join(lines) + "\n"
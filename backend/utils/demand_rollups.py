@@ -0,0 +1,164 @@
+"""
+Инкрементальные агрегаты фактического спроса на воду по часам, дням и месяцам
+"""
+from datetime import datetime
+from typing import Iterable, Set, Tuple
+
+from sqlalchemy import DateTime, String, column, delete, func, insert, literal, literal_column, select, true, values
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.orm import Session
+
+from backend.models.demand_forecasting import WaterDemand, WaterDemandRollup
+
+GRANULARITIES = ("hour", "day", "month")
+
+# Ключ периода исходной записи: (местоположение, тип спроса, дата спроса)
+DemandKey = Tuple[str, str, datetime]
+
+_rollup_table = WaterDemandRollup.__table__
+
+
+def period_start(value: datetime, granularity: str) -> datetime:
+    """
+    Возвращает начало периода заданной гранулярности (аналог date_trunc)
+    """
+    value = value.replace(minute=0, second=0, microsecond=0)
+    if granularity in ("day", "month"):
+        value = value.replace(hour=0)
+    if granularity == "month":
+        value = value.replace(day=1)
+    return value
+
+
+def demand_key(demand) -> DemandKey:
+    """
+    Ключ периода для записи о спросе (ORM-объекта или словаря)
+    """
+    if isinstance(demand, dict):
+        return demand["location"], demand.get("demand_type") or "", demand["demand_date"]
+    return demand.location, demand.demand_type or "", demand.demand_date
+
+
+def add_to_rollups(db: Session, demands: Iterable) -> None:
+    """
+    Добавляет новые фактические записи о спросе в агрегаты всех гранулярностей
+    одним пакетным upsert. Прогнозные записи пропускаются
+    """
+    buckets = {}
+    for demand in demands:
+        forecasted = demand.get("forecasted") if isinstance(demand, dict) else demand.forecasted
+        if forecasted:
+            continue
+        location, demand_type, demand_date = demand_key(demand)
+        amount = demand["demand_amount"] if isinstance(demand, dict) else demand.demand_amount
+        for granularity in GRANULARITIES:
+            key = (granularity, location, demand_type, period_start(demand_date, granularity))
+            bucket = buckets.get(key)
+            if bucket is None:
+                buckets[key] = {
+                    "granularity": key[0],
+                    "location": key[1],
+                    "demand_type": key[2],
+                    "period_start": key[3],
+                    "total_amount": amount,
+                    "samples": 1,
+                    "min_amount": amount,
+                    "max_amount": amount,
+                }
+                continue
+            bucket["total_amount"] += amount
+            bucket["samples"] += 1
+            bucket["min_amount"] = min(bucket["min_amount"], amount)
+            bucket["max_amount"] = max(bucket["max_amount"], amount)
+
+    if not buckets:
+        return
+
+    statement = pg_insert(_rollup_table)
+    excluded = statement.excluded
+    db.execute(
+        statement.on_conflict_do_update(
+            index_elements=[
+                _rollup_table.c.granularity,
+                _rollup_table.c.location,
+                _rollup_table.c.demand_type,
+                _rollup_table.c.period_start,
+            ],
+            set_={
+                "total_amount": _rollup_table.c.total_amount + excluded.total_amount,
+                "samples": _rollup_table.c.samples + excluded.samples,
+                "min_amount": func.least(_rollup_table.c.min_amount, excluded.min_amount),
+                "max_amount": func.greatest(_rollup_table.c.max_amount, excluded.max_amount),
+            }
+        ),
+        list(buckets.values())
+    )
+
+
+def _aggregate_select(granularity: str):
+    # Гранулярность подставляется литералом, чтобы выражение в SELECT и GROUP BY совпадало
+    period = func.date_trunc(literal_column(f"'{granularity}'"), WaterDemand.demand_date)
+    demand_type = func.coalesce(WaterDemand.demand_type, "")
+    return select(
+        literal(granularity).label("granularity"),
+        WaterDemand.location,
+        demand_type.label("demand_type"),
+        period.label("period_start"),
+        func.sum(WaterDemand.demand_amount),
+        func.count(),
+        func.min(WaterDemand.demand_amount),
+        func.max(WaterDemand.demand_amount),
+    ).where(
+        WaterDemand.forecasted.isnot(true())
+    ).group_by(WaterDemand.location, demand_type, period)
+
+
+_ROLLUP_COLUMNS = [
+    "granularity", "location", "demand_type", "period_start",
+    "total_amount", "samples", "min_amount", "max_amount",
+]
+
+
+def refresh_rollups(db: Session, keys: Set[DemandKey]) -> None:
+    """
+    Пересчитывает из исходных данных периоды, затронутые изменением или удалением записей.
+    min/max нельзя уменьшить инкрементально, поэтому такие периоды пересобираются целиком:
+    для каждой гранулярности один DELETE и один INSERT ... SELECT по списку периодов (VALUES)
+    """
+    for granularity in GRANULARITIES:
+        periods = {
+            (location, demand_type, period_start(demand_date, granularity))
+            for location, demand_type, demand_date in keys
+        }
+        if not periods:
+            return
+        affected = values(
+            column("location", String), column("demand_type", String), column("period_start", DateTime),
+            name="periods"
+        ).data(sorted(periods))
+
+        db.execute(delete(_rollup_table).where(
+            _rollup_table.c.granularity == granularity,
+            _rollup_table.c.location == affected.c.location,
+            _rollup_table.c.demand_type == affected.c.demand_type,
+            _rollup_table.c.period_start == affected.c.period_start,
+        ))
+        db.execute(insert(_rollup_table).from_select(
+            _ROLLUP_COLUMNS,
+            _aggregate_select(granularity).join(
+                affected,
+                (WaterDemand.location == affected.c.location)
+                & (func.coalesce(WaterDemand.demand_type, "") == affected.c.demand_type)
+                & (WaterDemand.demand_date >= affected.c.period_start)
+                & (WaterDemand.demand_date < affected.c.period_start + literal_column(f"interval '1 {granularity}'"))
+            )
+        ))
+
+
+def rebuild_rollups(db: Session) -> None:
+    """
+    Полностью пересобирает агрегаты из исходных данных
+    """
+    db.execute(delete(_rollup_table))
+    for granularity in GRANULARITIES:
+        db.execute(insert(_rollup_table).from_select(_ROLLUP_COLUMNS, _aggregate_select(granularity)))
@@ -0,0 +1,201 @@
+"""
+Потоковая выгрузка таблиц для аналитики в форматах CSV, Apache Arrow IPC и Parquet.
+Строки читаются серверным курсором пакетами по EXPORT_BATCH_SIZE, поэтому расход памяти
+не зависит от объема выгрузки
+"""
+import csv
+import io
+from datetime import datetime
+from typing import Iterator, List, Optional
+
+from fastapi import HTTPException, status
+from sqlalchemy import Boolean, DateTime, Float, Integer, select
+
+from backend.config.database import engine
+from backend.config.settings import EXPORT_BATCH_SIZE
+from backend.utils.crud import data_columns
+
+FORMAT_CSV = "csv"
+FORMAT_ARROW = "arrow"
+FORMAT_PARQUET = "parquet"
+
+# Тип содержимого и расширение файла для каждого формата
+EXPORT_FORMATS = {
+    FORMAT_CSV: ("text/csv; charset=utf-8", "csv"),
+    FORMAT_ARROW: ("application/vnd.apache.arrow.stream", "arrows"),
+    FORMAT_PARQUET: ("application/vnd.apache.parquet", "parquet"),
+}
+
+
+class ExportDataset:
+    """
+    Выгружаемая таблица и колонка даты для фильтра по периоду и порядка строк
+    """
+
+    def __init__(self, model, date_column):
+        self.name = model.__tablename__
+        self.table = model.__table__
+        self.date_column = self.table.c[date_column.key]
+        # Служебные вычисляемые колонки (ячейка сетки координат) не выгружаются
+        self.columns = {column.key: column for column in data_columns(self.table)}
+
+    def select_columns(self, names: Optional[List[str]]):
+        """
+        Возвращает колонки выгрузки (все, если список не задан)
+        """
+        if not names:
+            return list(self.columns.values())
+        unknown = [name for name in names if name not in self.columns]
+        if unknown:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Неизвестные колонки: {', '.join(unknown)}"
+            )
+        return [self.columns[name] for name in names]
+
+    def statement(
+        self,
+        columns,
+        date_from: Optional[datetime] = None,
+        date_to: Optional[datetime] = None,
+        **filters
+    ):
+        """
+        Строит запрос выгрузки в порядке даты (id - для устойчивого порядка при равных датах)
+        """
+        statement = select(*columns).order_by(self.date_column, self.table.c.id)
+        if date_from is not None:
+            statement = statement.where(self.date_column >= date_from)
+        if date_to is not None:
+            statement = statement.where(self.date_column < date_to)
+        for name, value in filters.items():
+            if value is not None:
+                statement = statement.where(self.table.c[name] == value)
+        return statement
+
+
+def _require_pyarrow():
+    try:
+        import pyarrow
+        import pyarrow.ipc
+        import pyarrow.parquet
+    except ImportError:
+        raise HTTPException(
+            status_code=status.HTTP_501_NOT_IMPLEMENTED,
+            detail="Для форматов arrow и parquet требуется пакет pyarrow (pip install pyarrow)"
+        )
+    return pyarrow
+
+
+def check_format(data_format: str) -> str:
+    """
+    Проверяет формат выгрузки до начала ответа: после отправки заголовков
+    сообщить об ошибке клиенту уже нельзя
+    """
+    data_format = data_format.lower()
+    if data_format not in EXPORT_FORMATS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Поддерживаемые форматы выгрузки: {', '.join(EXPORT_FORMATS)}"
+        )
+    if data_format != FORMAT_CSV:
+        _require_pyarrow()
+    return data_format
+
+
+def _arrow_type(pa, column):
+    column_type = column.type
+    if isinstance(column_type, Boolean):
+        return pa.bool_()
+    if isinstance(column_type, Integer):
+        return pa.int64()
+    if isinstance(column_type, Float):
+        return pa.float64()
+    if isinstance(column_type, DateTime):
+        return pa.timestamp("us", tz="UTC" if column_type.timezone else None)
+    return pa.string()
+
+
+class _Sink(io.RawIOBase):
+    """
+    Буфер для записи pyarrow: накопленные байты забираются после каждого пакета
+    """
+
+    def __init__(self):
+        self._chunks = []
+        self._position = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        data = bytes(data)
+        self._chunks.append(data)
+        self._position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._position
+
+    def take(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def _partitions(statement) -> Iterator[list]:
+    """
+    Читает результат серверным курсором (stream_results) пакетами по EXPORT_BATCH_SIZE строк.
+    Подключение берется на время выгрузки: сессия запроса к началу потоковой передачи уже закрыта
+    """
+    with engine.connect() as connection:
+        result = connection.execution_options(yield_per=EXPORT_BATCH_SIZE).execute(statement)
+        for partition in result.partitions():
+            yield partition
+
+
+def _stream_csv(statement, columns) -> Iterator[bytes]:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow([column.key for column in columns])
+    for partition in _partitions(statement):
+        writer.writerows(
+            [value.isoformat() if isinstance(value, datetime) else value for value in row]
+            for row in partition
+        )
+        yield buffer.getvalue().encode()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode()
+
+
+def _stream_arrow(statement, columns, data_format: str) -> Iterator[bytes]:
+    pa = _require_pyarrow()
+    schema = pa.schema([pa.field(column.key, _arrow_type(pa, column)) for column in columns])
+    sink = _Sink()
+    if data_format == FORMAT_PARQUET:
+        writer = pa.parquet.ParquetWriter(sink, schema)
+    else:
+        writer = pa.ipc.new_stream(sink, schema)
+    with writer:
+        for partition in _partitions(statement):
+            # Строки пакета раскладываются по колонкам; каждый пакет - отдельный
+            # record batch (Arrow) или row group (Parquet)
+            values = list(zip(*partition))
+            writer.write_batch(pa.record_batch(
+                [pa.array(values[index], type=field.type) for index, field in enumerate(schema)],
+                schema=schema
+            ))
+            yield sink.take()
+    # Завершение потока Arrow и футер Parquet записываются при закрытии
+    yield sink.take()
+
+
+def stream_export(statement, columns, data_format: str) -> Iterator[bytes]:
+    """
+    Возвращает генератор содержимого выгрузки в заданном формате
+    """
+    if data_format == FORMAT_CSV:
+        return _stream_csv(statement, columns)
+    return _stream_arrow(statement, columns, data_format)
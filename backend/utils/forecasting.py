@@ -0,0 +1,251 @@
+"""
+Прогнозирование спроса на воду: сезонная декомпозиция с недельной сезонностью
+и линейное экспоненциальное сглаживание (Холт), векторизованные по всем рядам сразу
+"""
+import threading
+import time
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+from sqlalchemy import and_, delete, func, insert, or_, select, tuple_
+from sqlalchemy.orm import Session
+
+from backend.config.settings import CACHE_TTL, FORECAST_HISTORY_DAYS
+from backend.models.demand_forecasting import WaterDemand, WaterDemandRollup
+
+SEASON_LENGTH = 7  # Недельная сезонность
+MIN_SEASONAL_HISTORY = 2 * SEASON_LENGTH  # Меньше двух недель - сезонность не оценивается
+
+# Сетка параметров сглаживания, лучшая пара выбирается для каждого ряда по ошибке прогноза на шаг вперед
+ALPHAS = np.array([0.1, 0.3, 0.5, 0.7])
+BETAS = np.array([0.01, 0.1, 0.3])
+
+# Ключ ряда: (местоположение, тип спроса)
+SeriesKey = Tuple[str, str]
+
+
+@dataclass
+class FittedSeries:
+    """
+    Обученная модель одного ряда
+    """
+    location: str
+    demand_type: str
+    last_observed: datetime
+    level: float
+    trend: float
+    season: np.ndarray  # Сезонные поправки по дням недели (0 - понедельник)
+    alpha: float
+    beta: float
+    fitted_at: float
+
+    def forecast(self, horizon: int) -> List[Tuple[datetime, float]]:
+        steps = np.arange(1, horizon + 1)
+        dates = [self.last_observed + timedelta(days=int(step)) for step in steps]
+        weekdays = np.array([date.weekday() for date in dates])
+        values = np.maximum(self.level + steps * self.trend + self.season[weekdays], 0.0)
+        return list(zip(dates, values.tolist()))
+
+
+_cache: Dict[SeriesKey, FittedSeries] = {}
+_cache_lock = threading.Lock()
+
+
+def invalidate_forecasts(locations: Iterable[str]) -> None:
+    """
+    Сбрасывает обученные модели для местоположений, данные которых изменились
+    """
+    locations = set(locations)
+    with _cache_lock:
+        for key in [key for key in _cache if key[0] in locations]:
+            del _cache[key]
+
+
+def _fill_gaps(values: np.ndarray) -> np.ndarray:
+    """
+    Заполняет пропуски последним известным значением, ведущие пропуски - первым известным
+    """
+    rows, columns = values.shape
+    missing = np.isnan(values)
+    index = np.where(missing, 0, np.arange(columns))
+    np.maximum.accumulate(index, axis=1, out=index)
+    filled = values[np.arange(rows)[:, None], index]
+    first_valid = np.argmax(~missing, axis=1)
+    leading = np.arange(columns)[None, :] < first_valid[:, None]
+    return np.where(leading, values[np.arange(rows), first_valid][:, None], filled)
+
+
+def _fit_batch(values: np.ndarray, weekdays: np.ndarray):
+    """
+    Обучает модели для матрицы рядов (ряды x дни) за один проход.
+    Возвращает уровень, тренд, сезонность и параметры сглаживания для каждого ряда
+    """
+    series_count, length = values.shape
+
+    # Сезонная составляющая: средние отклонения от центрированного скользящего среднего по дням недели
+    season = np.zeros((series_count, SEASON_LENGTH))
+    if length >= MIN_SEASONAL_HISTORY:
+        half = SEASON_LENGTH // 2
+        padded = np.pad(values, ((0, 0), (half, half)), mode="edge")
+        cumulative = np.cumsum(np.pad(padded, ((0, 0), (1, 0))), axis=1)
+        moving_average = (cumulative[:, SEASON_LENGTH:] - cumulative[:, :-SEASON_LENGTH]) / SEASON_LENGTH
+        detrended = values - moving_average
+        for weekday in range(SEASON_LENGTH):
+            columns = weekdays == weekday
+            if columns.any():
+                season[:, weekday] = detrended[:, columns].mean(axis=1)
+        season -= season.mean(axis=1, keepdims=True)
+    deseasonalized = values - season[:, weekdays]
+
+    # Метод Холта для всех рядов и всех пар (alpha, beta) одновременно: массивы (пары, ряды)
+    alpha = np.repeat(ALPHAS, len(BETAS))[:, None]
+    beta = np.tile(BETAS, len(ALPHAS))[:, None]
+    level = np.tile(deseasonalized[:, 0], (len(alpha), 1))
+    initial_span = min(SEASON_LENGTH, length - 1)
+    initial_trend = (deseasonalized[:, initial_span] - deseasonalized[:, 0]) / initial_span if initial_span else np.zeros(series_count)
+    trend = np.tile(initial_trend, (len(alpha), 1))
+    squared_error = np.zeros_like(level)
+    for step in range(1, length):
+        observed = deseasonalized[:, step]
+        squared_error += (observed - level - trend) ** 2
+        new_level = alpha * observed + (1 - alpha) * (level + trend)
+        trend = beta * (new_level - level) + (1 - beta) * trend
+        level = new_level
+
+    best = np.argmin(squared_error, axis=0)
+    columns = np.arange(series_count)
+    return level[best, columns], trend[best, columns], season, alpha[best, 0], beta[best, 0]
+
+
+def _load_history(db: Session, location: Optional[str], demand_type: Optional[str]):
+    """
+    Загружает дневные агрегаты фактического спроса за период обучения.
+    Период отсчитывается от последнего наблюдения каждого ряда: ряд, переставший
+    поступать раньше других, не дополняется значениями до общей последней даты.
+    Возвращает последние даты рядов и строки агрегатов
+    """
+    filters = [WaterDemandRollup.granularity == "day"]
+    if location:
+        filters.append(WaterDemandRollup.location == location)
+    if demand_type:
+        filters.append(WaterDemandRollup.demand_type == demand_type)
+
+    ends = select(
+        WaterDemandRollup.location,
+        WaterDemandRollup.demand_type,
+        func.max(WaterDemandRollup.period_start).label("last_observed")
+    ).where(*filters).group_by(WaterDemandRollup.location, WaterDemandRollup.demand_type).subquery()
+    rows = db.execute(
+        select(
+            WaterDemandRollup.location,
+            WaterDemandRollup.demand_type,
+            WaterDemandRollup.period_start,
+            WaterDemandRollup.total_amount,
+            ends.c.last_observed
+        ).join(ends, and_(
+            WaterDemandRollup.location == ends.c.location,
+            WaterDemandRollup.demand_type == ends.c.demand_type
+        )).where(
+            *filters,
+            WaterDemandRollup.period_start >= ends.c.last_observed - timedelta(days=FORECAST_HISTORY_DAYS - 1)
+        )
+    ).all()
+    return {(row.location, row.demand_type): row.last_observed for row in rows}, rows
+
+
+def fit_models(db: Session, location: Optional[str] = None, demand_type: Optional[str] = None) -> List[FittedSeries]:
+    """
+    Возвращает обученные модели для всех рядов, подходящих под фильтры.
+    Прогноз ряда начинается со дня после его последнего наблюдения.
+    Модели из кэша используются повторно, остальные обучаются пакетами
+    (по одному на каждую последнюю дату наблюдения, обычно общую для всех рядов)
+    """
+    ends, rows = _load_history(db, location, demand_type)
+    if not rows:
+        return []
+
+    now = time.monotonic()
+    keys = sorted(ends)
+    with _cache_lock:
+        cached = {
+            key: _cache[key] for key in keys
+            if key in _cache and _cache[key].last_observed == ends[key] and now - _cache[key].fitted_at < CACHE_TTL
+        }
+
+    groups: Dict[datetime, List[SeriesKey]] = {}
+    for key in keys:
+        if key not in cached:
+            groups.setdefault(ends[key], []).append(key)
+    series_rows: Dict[SeriesKey, list] = {}
+    if groups:
+        for row in rows:
+            series_rows.setdefault((row.location, row.demand_type), []).append(row)
+
+    for end, missing in groups.items():
+        start = min(row.period_start for key in missing for row in series_rows[key])
+        length = (end - start).days + 1
+        values = np.full((len(missing), length), np.nan)
+        for index, key in enumerate(missing):
+            for row in series_rows[key]:
+                values[index, (row.period_start - start).days] = row.total_amount
+        weekdays = (np.arange(length) + start.weekday()) % SEASON_LENGTH
+
+        level, trend, season, alpha, beta = _fit_batch(_fill_gaps(values), weekdays)
+        fitted = {
+            key: FittedSeries(
+                location=key[0],
+                demand_type=key[1],
+                last_observed=end,
+                level=float(level[index]),
+                trend=float(trend[index]),
+                season=season[index],
+                alpha=float(alpha[index]),
+                beta=float(beta[index]),
+                fitted_at=now
+            )
+            for index, key in enumerate(missing)
+        }
+        with _cache_lock:
+            _cache.update(fitted)
+        cached.update(fitted)
+
+    return [cached[key] for key in keys]
+
+
+def persist_forecasts(db: Session, models: List[FittedSeries], horizon: int) -> int:
+    """
+    Заменяет ранее сохраненные будущие прогнозы рядов новыми (записи с forecasted=True).
+    Возвращает количество записанных строк
+    """
+    if not models:
+        return 0
+
+    # У рядов может быть разная последняя дата наблюдения: условие строится по группам рядов
+    series_by_end: Dict[datetime, List[SeriesKey]] = {}
+    for model in models:
+        series_by_end.setdefault(model.last_observed, []).append((model.location, model.demand_type))
+    db.execute(delete(WaterDemand.__table__).where(
+        WaterDemand.forecasted.is_(True),
+        or_(*[
+            and_(
+                tuple_(WaterDemand.location, func.coalesce(WaterDemand.demand_type, "")).in_(series),
+                WaterDemand.demand_date > end
+            )
+            for end, series in series_by_end.items()
+        ])
+    ))
+    rows = [
+        {
+            "location": model.location,
+            "demand_type": model.demand_type or None,
+            "demand_date": date,
+            "demand_amount": amount,
+            "forecasted": True,
+        }
+        for model in models
+        for date, amount in model.forecast(horizon)
+    ]
+    db.execute(insert(WaterDemand.__table__), rows)
+    return len(rows)
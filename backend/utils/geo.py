@@ -0,0 +1,194 @@
+"""
+Фильтрация объектов по координатам: прямоугольная область карты и радиус вокруг точки.
+Кандидаты отбираются по индексу ячейки сетки geo_cell (вычисляемая колонка моделей с координатами),
+точное условие по широте и долготе проверяется только для строк найденных ячеек
+"""
+import math
+from typing import List, Optional, Tuple
+
+from fastapi import HTTPException, Query, status
+from sqlalchemy import and_, func, or_
+
+from backend.config.settings import GEO_MAX_RADIUS
+
+EARTH_RADIUS = 6371008.8  # Средний радиус Земли в метрах
+METERS_PER_DEGREE = math.pi * EARTH_RADIUS / 180
+
+# Сетка ячеек geo_cell: шаг в градусах и число ячеек в строке (по долготе).
+# Номер ячейки = строка * GEO_CELL_COLUMNS + столбец, поэтому ячейки одной строки
+# идут подряд, и часть строки в прямоугольнике - один диапазон индекса.
+# Изменение шага требует миграции (пересчета колонок geo_cell)
+GEO_CELL_DEGREES = 0.01
+GEO_CELL_COLUMNS = 36000
+GEO_CELL_SQL = (
+    "floor((latitude + 90) / 0.01::float8)::bigint * 36000"
+    " + least(floor((longitude + 180) / 0.01::float8)::bigint, 35999)"
+)
+
+# Прямоугольник выше этого числа строк сетки отбирается одним диапазоном по полосе широт
+GEO_CELL_MAX_ROWS = 256
+
+
+def _parse_numbers(value: str, count: int, name: str) -> List[float]:
+    try:
+        numbers = [float(part) for part in value.split(",")]
+        if len(numbers) != count or not all(math.isfinite(number) for number in numbers):
+            raise ValueError
+        return numbers
+    except ValueError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Некорректное значение параметра {name}"
+        )
+
+
+def _check_coordinates(latitude: float, longitude: float, name: str) -> None:
+    if not (-90 <= latitude <= 90 and -180 <= longitude <= 180):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Координаты в параметре {name} вне допустимого диапазона"
+        )
+
+
+def parse_bbox(value: str, name: str = "within_bbox") -> Tuple[float, float, float, float]:
+    """
+    Разбирает прямоугольник в формате min_lon,min_lat,max_lon,max_lat
+    """
+    min_lon, min_lat, max_lon, max_lat = _parse_numbers(value, 4, name)
+    _check_coordinates(min_lat, min_lon, name)
+    _check_coordinates(max_lat, max_lon, name)
+    if min_lat > max_lat:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"В параметре {name} min_lat больше max_lat"
+        )
+    return min_lon, min_lat, max_lon, max_lat
+
+
+def _wrap_longitude(lon: float) -> float:
+    return (lon + 180) % 360 - 180
+
+
+def _cell_row(lat: float) -> int:
+    # Та же арифметика double precision, что и в GEO_CELL_SQL
+    return math.floor((lat + 90) / GEO_CELL_DEGREES)
+
+
+def _cell_column(lon: float) -> int:
+    return min(math.floor((lon + 180) / GEO_CELL_DEGREES), GEO_CELL_COLUMNS - 1)
+
+
+def cell_condition(cell, min_lon: float, min_lat: float, max_lon: float, max_lat: float):
+    """
+    Условие по колонке geo_cell для ячеек, пересекающих прямоугольник: по диапазону
+    номеров на каждую строку сетки (два, если прямоугольник пересекает 180-й меридиан)
+    """
+    first_row, last_row = _cell_row(min_lat), _cell_row(max_lat)
+    if min_lon <= max_lon:
+        spans = [(_cell_column(min_lon), _cell_column(max_lon))]
+    else:
+        spans = [(_cell_column(min_lon), GEO_CELL_COLUMNS - 1), (0, _cell_column(max_lon))]
+    if last_row - first_row + 1 > GEO_CELL_MAX_ROWS or spans == [(0, GEO_CELL_COLUMNS - 1)]:
+        return cell.between(first_row * GEO_CELL_COLUMNS, (last_row + 1) * GEO_CELL_COLUMNS - 1)
+    return or_(*[
+        cell.between(row * GEO_CELL_COLUMNS + start, row * GEO_CELL_COLUMNS + end)
+        for row in range(first_row, last_row + 1)
+        for start, end in spans
+    ])
+
+
+def bbox_condition(
+    latitude, longitude, min_lon: float, min_lat: float, max_lon: float, max_lat: float, cell=None
+):
+    """
+    Условие попадания в прямоугольник. Если min_lon > max_lon,
+    прямоугольник пересекает 180-й меридиан. С колонкой cell (geo_cell)
+    строки отбираются по ее индексу, координаты проверяются для найденных строк
+    """
+    latitude_condition = latitude.between(min_lat, max_lat)
+    if min_lon <= max_lon:
+        condition = and_(latitude_condition, longitude.between(min_lon, max_lon))
+    else:
+        condition = and_(latitude_condition, or_(longitude >= min_lon, longitude <= max_lon))
+    if cell is None:
+        return condition
+    return and_(cell_condition(cell, min_lon, min_lat, max_lon, max_lat), condition)
+
+
+def radius_bbox(lat: float, lon: float, radius: float) -> Tuple[float, float, float, float]:
+    """
+    Описанный вокруг круга прямоугольник (min_lon, min_lat, max_lon, max_lat)
+    для предварительного отбора по индексу
+    """
+    delta_lat = radius / METERS_PER_DEGREE
+    min_lat, max_lat = max(lat - delta_lat, -90.0), min(lat + delta_lat, 90.0)
+    cos_lat = math.cos(math.radians(max(abs(min_lat), abs(max_lat))))
+    delta_lon = radius / (METERS_PER_DEGREE * cos_lat) if cos_lat > 1e-9 else 180.0
+    if delta_lon >= 180:
+        return -180.0, min_lat, 180.0, max_lat
+    return _wrap_longitude(lon - delta_lon), min_lat, _wrap_longitude(lon + delta_lon), max_lat
+
+
+def distance_expression(latitude, longitude, lat: float, lon: float):
+    """
+    SQL-выражение расстояния в метрах до точки (формула гаверсинусов)
+    """
+    phi = func.radians(latitude)
+    delta_phi = func.radians(latitude - lat)
+    delta_lambda = func.radians(longitude - lon)
+    a = (
+        func.power(func.sin(delta_phi / 2), 2)
+        + math.cos(math.radians(lat)) * func.cos(phi) * func.power(func.sin(delta_lambda / 2), 2)
+    )
+    return 2 * EARTH_RADIUS * func.asin(func.sqrt(func.least(a, 1.0)))
+
+
+class GeoFilter:
+    """
+    Зависимость для списковых маршрутов объектов с координатами:
+    - within_bbox=min_lon,min_lat,max_lon,max_lat - объекты в прямоугольной области карты;
+    - near=lat,lon и radius (в метрах) - объекты в радиусе от точки.
+    Отбор идет по индексу geo_cell, точное расстояние проверяется только для кандидатов
+    """
+
+    def __init__(
+        self,
+        within_bbox: Optional[str] = Query(None, description="Область карты: min_lon,min_lat,max_lon,max_lat"),
+        near: Optional[str] = Query(None, description="Точка: lat,lon"),
+        radius: float = Query(1000, gt=0, le=GEO_MAX_RADIUS, description="Радиус поиска для near в метрах")
+    ):
+        self.bbox = None
+        self.point = None
+        self.radius = radius
+        if within_bbox:
+            self.bbox = parse_bbox(within_bbox)
+        if near:
+            lat, lon = _parse_numbers(near, 2, "near")
+            _check_coordinates(lat, lon, "near")
+            self.point = (lat, lon)
+
+    @property
+    def active(self) -> bool:
+        return self.bbox is not None or self.point is not None
+
+    def conditions(self, latitude, longitude, cell=None) -> list:
+        """
+        Условия фильтрации для колонок широты и долготы (и ячейки сетки, если она есть)
+        """
+        conditions = []
+        if self.bbox is not None:
+            conditions.append(bbox_condition(latitude, longitude, *self.bbox, cell=cell))
+        if self.point is not None:
+            lat, lon = self.point
+            conditions.append(bbox_condition(latitude, longitude, *radius_bbox(lat, lon, self.radius), cell=cell))
+            conditions.append(distance_expression(latitude, longitude, lat, lon) <= self.radius)
+        return conditions
+
+    def apply(self, query, model):
+        """
+        Добавляет фильтры к запросу (Query или select) по колонкам latitude/longitude
+        и geo_cell модели (у моделей без geo_cell - только по координатам)
+        """
+        if not self.active:
+            return query
+        return query.filter(*self.conditions(model.latitude, model.longitude, getattr(model, "geo_cell", None)))
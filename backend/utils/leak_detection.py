@@ -0,0 +1,431 @@
+"""
+Поиск утечек по телеметрии объектов инфраструктуры водоснабжения:
+- резкое падение давления относительно среднего за предыдущие минуты;
+- устойчивое отклонение давления ниже базового уровня (по почасовым агрегатам);
+- рост минимального ночного расхода относительно предыдущих ночей.
+Проверка инкрементальная: для каждого объекта обрабатываются только показания,
+поступившие после прошлого прохода (с небольшим окном контекста), расчеты
+векторизованы по всем показаниям пакета объектов сразу
+"""
+import logging
+import threading
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional
+
+import numpy as np
+from sqlalchemy import DateTime, Float, Integer, and_, cast, column, extract, func, literal, select, text, true, update
+from sqlalchemy.dialects.postgresql import ARRAY, insert as pg_insert
+from sqlalchemy.orm import Session
+
+from backend.config.database import SessionLocal, engine
+from backend.config.settings import (
+    LEAK_BASELINE_HOURS,
+    LEAK_DETECTION_BATCH_SIZE,
+    LEAK_DETECTION_INITIAL_HOURS,
+    LEAK_DEVIATION_MIN_RATIO,
+    LEAK_DEVIATION_SIGMA,
+    LEAK_DROP_WINDOW_MINUTES,
+    LEAK_NIGHT_BASELINE_DAYS,
+    LEAK_NIGHT_END_HOUR,
+    LEAK_NIGHT_FLOW_RATIO,
+    LEAK_NIGHT_START_HOUR,
+    LEAK_PRESSURE_DROP,
+    LEAK_SUSTAINED_MINUTES,
+)
+from backend.models.water_infrastructure import (
+    InfrastructureTelemetry,
+    InfrastructureTelemetryHourly,
+    LeakDetectionState,
+    WaterInfrastructure,
+    WaterLeak,
+)
+from backend.utils.telemetry import create_upcoming_partitions
+
+logger = logging.getLogger(__name__)
+
+SOURCE_DETECTOR = "detector"
+
+# Ключ advisory-блокировки: одновременно проверку выполняет один процесс
+DETECTION_LOCK_KEY = 72_021
+
+MIN_SUSTAINED_SAMPLES = 3  # Минимум показаний в окне устойчивого отклонения
+MIN_BASELINE_HOURS = 6  # Минимум часов с показаниями для базового уровня давления
+MIN_BASELINE_NIGHTS = 3  # Минимум ночей для базового ночного расхода
+
+_raw_table = InfrastructureTelemetry.__table__
+_hourly_table = InfrastructureTelemetryHourly.__table__
+_state_table = LeakDetectionState.__table__
+
+DAY = 86400
+
+
+@dataclass
+class LeakCandidate:
+    """
+    Признаки утечки, найденные по одному объекту за проход
+    """
+    infrastructure_id: int
+    detected_at: float  # Время первого признака (секунды Unix)
+    ratio: float = 0.0  # Наибольшее превышение порога (отклонение / порог)
+    findings: List[str] = field(default_factory=list)
+
+    def add(self, detected_at: float, ratio: float, finding: str) -> None:
+        self.detected_at = min(self.detected_at, detected_at)
+        self.ratio = max(self.ratio, ratio)
+        self.findings.append(finding)
+
+    @property
+    def severity(self) -> str:
+        if self.ratio >= 3:
+            return "high"
+        return "medium" if self.ratio >= 2 else "low"
+
+
+@dataclass
+class DetectionStats:
+    objects: int = 0
+    samples: int = 0
+    leaks_created: int = 0
+    skipped: bool = False
+
+
+def _window_sums(groups: np.ndarray, seconds: np.ndarray, values: np.ndarray, window: float, include_current: bool):
+    """
+    Сумма и количество значений values по показаниям того же объекта за window секунд
+    до каждого показания. Массивы отсортированы по (объект, время), NaN не учитываются
+    """
+    valid = ~np.isnan(values)
+    sums = np.concatenate(([0.0], np.cumsum(np.where(valid, values, 0.0))))
+    counts = np.concatenate(([0], np.cumsum(valid)))
+    # Составной ключ (объект, время) возрастает по массиву, поэтому начало окна
+    # каждого показания в пределах своего объекта находится одним searchsorted
+    offset = seconds - seconds.min()
+    composite = groups * (offset.max() + window + 1) + offset
+    start = np.searchsorted(composite, composite - window, side="right")
+    end = np.arange(1, len(seconds) + 1) if include_current else np.arange(len(seconds))
+    return sums[end] - sums[start], counts[end] - counts[start]
+
+
+def _first_per_group(groups: np.ndarray, mask: np.ndarray) -> np.ndarray:
+    """
+    Индексы первого (самого раннего) показания каждого объекта среди отмеченных mask
+    """
+    indexes = np.flatnonzero(mask)
+    _, first = np.unique(groups[indexes], return_index=True)
+    return indexes[first]
+
+
+def _max_per_group(groups: np.ndarray, mask: np.ndarray, scores: np.ndarray, count: int) -> np.ndarray:
+    result = np.full(count, -np.inf)
+    np.maximum.at(result, groups[mask], scores[mask])
+    return result
+
+
+def _load_samples(db: Session, ids: List[int], since: List[datetime], until: datetime) -> np.ndarray:
+    """
+    Показания пакета объектов после since (свой момент для каждого объекта) до until:
+    столбцы - id объекта, время (секунды Unix), давление, расход
+    """
+    # Границы передаются двумя массивами (unnest): текст запроса не зависит от размера пакета
+    # и берется из кэша скомпилированных запросов
+    bounds = func.unnest(
+        literal(ids, ARRAY(Integer)), literal(since, ARRAY(DateTime(timezone=True)))
+    ).table_valued(
+        column("infrastructure_id", Integer), column("since", DateTime(timezone=True))
+    ).render_derived(name="bounds")
+    rows = db.execute(
+        select(
+            _raw_table.c.infrastructure_id,
+            cast(extract("epoch", _raw_table.c.ts), Float),
+            _raw_table.c.pressure,
+            _raw_table.c.flow_rate,
+        ).join(
+            bounds,
+            and_(_raw_table.c.infrastructure_id == bounds.c.infrastructure_id, _raw_table.c.ts > bounds.c.since)
+        ).where(
+            # Общая нижняя граница отсекает секции таблицы за прошлые месяцы
+            _raw_table.c.ts > min(since),
+            _raw_table.c.ts <= until
+        ).order_by(_raw_table.c.infrastructure_id, _raw_table.c.ts)
+    ).tuples().all()
+    return np.array(list(map(tuple, rows)), dtype=float).reshape(-1, 4)
+
+
+def _hourly_means(db: Session, ids: List[int], metric: str, date_from: datetime, until: datetime, night: bool = False):
+    """
+    Средние значения показателя по часам (из почасовых агрегатов): id объекта, начало часа, среднее
+    """
+    hour = extract("hour", func.timezone("UTC", _hourly_table.c.bucket))
+    query = select(
+        _hourly_table.c.infrastructure_id,
+        cast(extract("epoch", _hourly_table.c.bucket), Float),
+        _hourly_table.c[f"{metric}_sum"] / func.nullif(_hourly_table.c[f"{metric}_count"], 0),
+    ).where(
+        _hourly_table.c.infrastructure_id.in_(ids),
+        _hourly_table.c.bucket >= date_from,
+        _hourly_table.c.bucket < until
+    )
+    if night:
+        query = query.where(hour >= LEAK_NIGHT_START_HOUR, hour < LEAK_NIGHT_END_HOUR)
+    return np.array(list(map(tuple, db.execute(query).all())), dtype=float).reshape(-1, 3)
+
+
+def _detect_pressure(samples, groups, scanned, baseline_mean, baseline_threshold, candidates, ids) -> None:
+    seconds, pressure = samples[:, 1], samples[:, 2]
+    is_new = seconds > scanned[groups]
+
+    # Резкое падение: показание ниже среднего за предыдущие LEAK_DROP_WINDOW_MINUTES минут
+    sums, counts = _window_sums(groups, seconds, pressure, LEAK_DROP_WINDOW_MINUTES * 60, include_current=False)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        previous = sums / counts
+        drop = (previous - pressure) / previous
+    flagged = is_new & (counts > 0) & (previous > 0) & (drop >= LEAK_PRESSURE_DROP)
+    if flagged.any():
+        worst = _max_per_group(groups, flagged, drop, len(ids))
+        for index in _first_per_group(groups, flagged):
+            group = groups[index]
+            candidates.setdefault(ids[group], LeakCandidate(ids[group], seconds[index])).add(
+                seconds[index], worst[group] / LEAK_PRESSURE_DROP,
+                f"резкое падение давления на {drop[index]:.0%} "
+                f"(с {previous[index]:.2f} до {pressure[index]:.2f})"
+            )
+
+    # Устойчивое отклонение: среднее за LEAK_SUSTAINED_MINUTES минут ниже базового уровня
+    sums, counts = _window_sums(groups, seconds, pressure, LEAK_SUSTAINED_MINUTES * 60, include_current=True)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        deviation = (baseline_mean[groups] - sums / counts) / baseline_mean[groups]
+        threshold = baseline_threshold[groups]
+        flagged = is_new & (counts >= MIN_SUSTAINED_SAMPLES) & (deviation >= threshold)
+    if flagged.any():
+        worst = _max_per_group(groups, flagged, deviation / threshold, len(ids))
+        for index in _first_per_group(groups, flagged):
+            group = groups[index]
+            candidates.setdefault(ids[group], LeakCandidate(ids[group], seconds[index])).add(
+                seconds[index], worst[group],
+                f"давление ниже базового уровня {baseline_mean[group]:.2f} на {deviation[index]:.0%} "
+                f"в течение {LEAK_SUSTAINED_MINUTES} мин"
+            )
+
+
+def _pressure_baseline(db: Session, ids: List[int], scanned: np.ndarray):
+    """
+    Базовый уровень давления каждого объекта: среднее и порог отклонения (доля)
+    по почасовым средним за LEAK_BASELINE_HOURS часов до начала новых показаний
+    """
+    start = datetime.fromtimestamp(scanned.min(), timezone.utc) - timedelta(hours=LEAK_BASELINE_HOURS)
+    hourly = _hourly_means(db, ids, "pressure", start, datetime.fromtimestamp(scanned.max(), timezone.utc))
+    groups = np.searchsorted(ids, hourly[:, 0])
+    # Часы до начала новых показаний своего объекта (без текущего часа)
+    keep = (
+        ~np.isnan(hourly[:, 2])
+        & (hourly[:, 1] + 3600 <= scanned[groups])
+        & (hourly[:, 1] >= scanned[groups] - LEAK_BASELINE_HOURS * 3600)
+    )
+    groups, means = groups[keep], hourly[keep, 2]
+    count = np.bincount(groups, minlength=len(ids))
+    total = np.bincount(groups, weights=means, minlength=len(ids))
+    squares = np.bincount(groups, weights=means ** 2, minlength=len(ids))
+    with np.errstate(invalid="ignore", divide="ignore"):
+        mean = total / count
+        std = np.sqrt(np.maximum(squares / count - mean ** 2, 0.0))
+        threshold = np.maximum(LEAK_DEVIATION_SIGMA * std / mean, LEAK_DEVIATION_MIN_RATIO)
+    enough = (count >= MIN_BASELINE_HOURS) & (mean > 0)
+    return np.where(enough, mean, np.nan), np.where(enough, threshold, np.nan)
+
+
+def _detect_night_flow(db: Session, ids: List[int], checked: np.ndarray, until: datetime, candidates) -> None:
+    """
+    Средний расход в ночном окне каждой ночи, завершившейся после прошлой проверки,
+    сравнивается со средним за LEAK_NIGHT_BASELINE_DAYS предыдущих ночей
+    """
+    first_day = int(checked.min() // DAY) - LEAK_NIGHT_BASELINE_DAYS - 1
+    hourly = _hourly_means(
+        db, ids, "flow_rate", datetime.fromtimestamp(first_day * DAY, timezone.utc), until, night=True
+    )
+    hourly = hourly[~np.isnan(hourly[:, 2])]
+    if not len(hourly):
+        return
+    groups = np.searchsorted(ids, hourly[:, 0])
+    days = (hourly[:, 1] // DAY).astype(int) - first_day
+    width = days.max() + 1
+
+    # Матрица объект x ночь: средний ночной расход (NaN - нет показаний)
+    total = np.zeros((len(ids), width))
+    count = np.zeros((len(ids), width))
+    np.add.at(total, (groups, days), hourly[:, 2])
+    np.add.at(count, (groups, days), 1)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        nights = total / count
+    valid = ~np.isnan(nights)
+
+    # Среднее по предыдущим ночам: скользящая сумма по оси ночей
+    cumulative = np.concatenate((np.zeros((len(ids), 1)), np.cumsum(np.where(valid, nights, 0.0), axis=1)), axis=1)
+    cumulative_count = np.concatenate((np.zeros((len(ids), 1)), np.cumsum(valid, axis=1)), axis=1)
+    columns = np.arange(width)
+    start = np.maximum(columns - LEAK_NIGHT_BASELINE_DAYS, 0)
+    baseline_count = cumulative_count[:, columns] - cumulative_count[:, start]
+    with np.errstate(invalid="ignore", divide="ignore"):
+        baseline = (cumulative[:, columns] - cumulative[:, start]) / baseline_count
+        growth = nights / baseline - 1
+
+    night_end = (first_day + columns) * DAY + LEAK_NIGHT_END_HOUR * 3600.0
+    due = (night_end[None, :] > checked[:, None]) & (night_end[None, :] <= until.timestamp())
+    flagged = due & valid & (baseline_count >= MIN_BASELINE_NIGHTS) & (baseline > 0) & (growth >= LEAK_NIGHT_FLOW_RATIO)
+    for group, column_index in zip(*np.nonzero(flagged)):
+        candidates.setdefault(ids[group], LeakCandidate(ids[group], night_end[column_index])).add(
+            night_end[column_index], growth[group, column_index] / LEAK_NIGHT_FLOW_RATIO,
+            f"ночной расход {nights[group, column_index]:.2f} выше обычного "
+            f"{baseline[group, column_index]:.2f} на {growth[group, column_index]:.0%}"
+        )
+
+
+def _create_leaks(db: Session, candidates: Dict[int, LeakCandidate]) -> int:
+    """
+    Создает записи об утечках по найденным признакам. Для объекта, у которого уже есть
+    неустраненная утечка, новая запись не создается
+    """
+    open_leaks = set(db.execute(
+        select(WaterLeak.infrastructure_id).where(
+            WaterLeak.infrastructure_id.in_(list(candidates)),
+            WaterLeak.repaired.isnot(true())
+        )
+    ).scalars())
+    created = [candidate for candidate in candidates.values() if candidate.infrastructure_id not in open_leaks]
+    if not created:
+        return 0
+    # Записи создаются через ORM: кэш кластеров карты сбрасывается после фиксации (см. map_clusters.py)
+    db.add_all([
+        WaterLeak(
+            infrastructure_id=candidate.infrastructure_id,
+            leak_detected_at=datetime.fromtimestamp(candidate.detected_at, timezone.utc).replace(tzinfo=None),
+            severity=candidate.severity,
+            description="Обнаружено по телеметрии: " + "; ".join(candidate.findings),
+            source=SOURCE_DETECTOR
+        )
+        for candidate in created
+    ])
+    db.execute(
+        update(WaterInfrastructure).where(
+            WaterInfrastructure.id.in_([candidate.infrastructure_id for candidate in created])
+        ).values(leak_detected=True)
+    )
+    return len(created)
+
+
+def _detect_batch(db: Session, ids: List[int], until: datetime, stats: DetectionStats) -> None:
+    initial = until - timedelta(hours=LEAK_DETECTION_INITIAL_HOURS)
+    states = {
+        row.infrastructure_id: row
+        for row in db.execute(select(_state_table).where(_state_table.c.infrastructure_id.in_(ids)))
+    }
+    scanned = np.array([
+        (states[infrastructure_id].scanned_until if infrastructure_id in states else initial).timestamp()
+        for infrastructure_id in ids
+    ])
+    checked = np.array([
+        (states[infrastructure_id].nights_checked_until if infrastructure_id in states else initial).timestamp()
+        for infrastructure_id in ids
+    ])
+
+    # Новые показания и окно контекста перед ними для скользящих средних
+    context = max(LEAK_DROP_WINDOW_MINUTES, LEAK_SUSTAINED_MINUTES) * 60
+    samples = _load_samples(
+        db, ids, [datetime.fromtimestamp(value - context, timezone.utc) for value in scanned], until
+    )
+    candidates: Dict[int, LeakCandidate] = {}
+    if len(samples):
+        # Номер объекта в пакете (ids упорядочены по возрастанию)
+        groups = np.searchsorted(ids, samples[:, 0])
+        stats.samples += int(np.count_nonzero(samples[:, 1] > scanned[groups]))
+        baseline_mean, baseline_threshold = _pressure_baseline(db, ids, scanned)
+        _detect_pressure(samples, groups, scanned, baseline_mean, baseline_threshold, candidates, ids)
+        latest = np.full(len(ids), -np.inf)
+        np.maximum.at(latest, groups, samples[:, 1])
+        scanned = np.maximum(scanned, latest)
+    _detect_night_flow(db, ids, checked, until, candidates)
+    if candidates:
+        stats.leaks_created += _create_leaks(db, candidates)
+
+    statement = pg_insert(_state_table)
+    db.execute(
+        statement.on_conflict_do_update(
+            index_elements=[_state_table.c.infrastructure_id],
+            set_={
+                "scanned_until": statement.excluded.scanned_until,
+                "nights_checked_until": statement.excluded.nights_checked_until,
+            }
+        ),
+        [
+            {
+                "infrastructure_id": infrastructure_id,
+                "scanned_until": datetime.fromtimestamp(scanned[group], timezone.utc),
+                "nights_checked_until": until,
+            }
+            for group, infrastructure_id in enumerate(ids)
+        ]
+    )
+    stats.objects += len(ids)
+
+
+def run_leak_detection(until: Optional[datetime] = None) -> DetectionStats:
+    """
+    Выполняет проход поиска утечек по всем объектам инфраструктуры пакетами по
+    LEAK_DETECTION_BATCH_SIZE объектов (каждый пакет - отдельная транзакция).
+    Если проход уже выполняется другим процессом, возвращает skipped
+    """
+    until = until or datetime.now(timezone.utc)
+    stats = DetectionStats()
+    with engine.connect() as lock:
+        acquired = lock.execute(text("SELECT pg_try_advisory_lock(:key)"), {"key": DETECTION_LOCK_KEY}).scalar()
+        lock.commit()
+        if not acquired:
+            stats.skipped = True
+            return stats
+        try:
+            with SessionLocal() as db:
+                ids = db.execute(select(WaterInfrastructure.id).order_by(WaterInfrastructure.id)).scalars().all()
+                for start in range(0, len(ids), LEAK_DETECTION_BATCH_SIZE):
+                    _detect_batch(db, ids[start:start + LEAK_DETECTION_BATCH_SIZE], until, stats)
+                    db.commit()
+        finally:
+            lock.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": DETECTION_LOCK_KEY})
+            lock.commit()
+    return stats
+
+
+class LeakDetectionWorker:
+    """
+    Фоновый поток периодического поиска утечек
+    """
+
+    def __init__(self):
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+
+    def start(self, interval: float) -> None:
+        if interval <= 0:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, args=(interval,), name="leak-detection", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 5) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def _run(self, interval: float) -> None:
+        while not self._stop.wait(interval):
+            try:
+                # Секции телеметрии следующего месяца создаются до первых показаний за него
+                create_upcoming_partitions()
+                stats = run_leak_detection()
+                if stats.leaks_created:
+                    logger.info("Поиск утечек: создано записей %s", stats.leaks_created)
+            except Exception:
+                logger.exception("Ошибка поиска утечек")
+
+
+leak_detection_worker = LeakDetectionWorker()
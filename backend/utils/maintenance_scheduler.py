@@ -0,0 +1,237 @@
+"""
+Планирование обслуживания активов. Для каждого актива в таблице asset_maintenance_queue
+хранится срок обслуживания и оценка риска:
+    risk_score = 1 + MAINTENANCE_AGE_WEIGHT * возраст в годах
+                   + MAINTENANCE_REPAIR_WEIGHT * внеплановых обслуживаний и ремонтов за период истории
+                   + MAINTENANCE_LEAK_WEIGHT * утечек на объектах инфраструктуры того же местоположения
+                     (неустраненных и обнаруженных за период истории)
+Срок - последний из сроков, заданных у актива и в записях об обслуживании, иначе
+MAINTENANCE_DEFAULT_INTERVAL_DAYS после последнего обслуживания (установки).
+Записи пересчитываются одним запросом: по отдельным активам - при их изменении и
+записи обслуживания, по всем активам - периодически в фоне (возраст и утечки)
+"""
+import logging
+import threading
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Iterable, Optional, Sequence
+
+from sqlalchemy import Float, Numeric, and_, cast, delete, exists, extract, func, literal, or_, select, text, tuple_
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.orm import Session
+
+from backend.config.database import SessionLocal, engine
+from backend.config.settings import (
+    MAINTENANCE_AGE_WEIGHT,
+    MAINTENANCE_DEFAULT_INTERVAL_DAYS,
+    MAINTENANCE_HISTORY_DAYS,
+    MAINTENANCE_LEAK_WEIGHT,
+    MAINTENANCE_REPAIR_WEIGHT,
+)
+from backend.models.assets import AssetMaintenance, AssetMaintenanceQueue, WaterAsset
+from backend.models.water_infrastructure import WaterInfrastructure, WaterLeak
+
+logger = logging.getLogger(__name__)
+
+# Ключ advisory-блокировки полного пересчета (один процесс одновременно)
+REFRESH_LOCK_KEY = 72_023
+
+# Типы обслуживания, не считающиеся признаком неисправности (сравнение без учета регистра)
+PLANNED_MAINTENANCE_TYPES = ("planned", "scheduled", "плановое")
+
+QUEUE_COLUMNS = ("asset_id", "risk_score", "due_at", "age_years", "repairs", "leaks", "last_maintenance")
+
+
+@dataclass
+class RefreshStats:
+    assets: int = 0  # Пересчитано записей очереди
+    skipped: bool = False  # Пересчет уже выполняется другим процессом
+
+
+def _rounded(value):
+    # Округление до сотых: при полном пересчете не меняются записи, у которых риск почти не изменился
+    return cast(func.round(cast(value, Numeric), 2), Float)
+
+
+def _queue_rows(now: datetime, asset_ids: Optional[Sequence[int]] = None):
+    """
+    Запрос записей очереди для всех активов или только для asset_ids
+    """
+    since = now - timedelta(days=MAINTENANCE_HISTORY_DAYS)
+    history = select(
+        AssetMaintenance.asset_id,
+        func.max(AssetMaintenance.maintenance_date).label("performed"),
+        func.max(AssetMaintenance.next_maintenance_date).label("planned"),
+        func.count().filter(and_(
+            AssetMaintenance.maintenance_date >= since,
+            func.lower(AssetMaintenance.maintenance_type).not_in(PLANNED_MAINTENANCE_TYPES)
+        )).label("repairs"),
+    ).group_by(AssetMaintenance.asset_id)
+    leaks = select(
+        WaterInfrastructure.location,
+        func.count().label("leaks"),
+    ).join(
+        WaterLeak, WaterLeak.infrastructure_id == WaterInfrastructure.id
+    ).where(
+        or_(WaterLeak.repaired.is_not(True), WaterLeak.leak_detected_at >= since)
+    ).group_by(WaterInfrastructure.location)
+    if asset_ids is not None:
+        history = history.where(AssetMaintenance.asset_id.in_(asset_ids))
+        leaks = leaks.where(WaterInfrastructure.location.in_(
+            select(WaterAsset.location).where(WaterAsset.id.in_(asset_ids))
+        ))
+    history = history.subquery()
+    leaks = leaks.subquery()
+
+    last_maintenance = func.greatest(history.c.performed, WaterAsset.last_maintenance)
+    age = _rounded(func.greatest(
+        func.coalesce(extract("epoch", literal(now) - WaterAsset.installation_date), 0) / (86400 * 365.25), 0
+    ))
+    repairs = func.coalesce(history.c.repairs, 0)
+    leak_count = func.coalesce(leaks.c.leaks, 0)
+    risk = _rounded(
+        1 + MAINTENANCE_AGE_WEIGHT * age + MAINTENANCE_REPAIR_WEIGHT * repairs + MAINTENANCE_LEAK_WEIGHT * leak_count
+    )
+    due_at = func.coalesce(
+        func.greatest(WaterAsset.next_maintenance, history.c.planned),
+        func.coalesce(last_maintenance, WaterAsset.installation_date, func.timezone("UTC", WaterAsset.created_at))
+        + timedelta(days=MAINTENANCE_DEFAULT_INTERVAL_DAYS)
+    )
+    statement = select(
+        WaterAsset.id.label("asset_id"),
+        risk.label("risk_score"),
+        due_at.label("due_at"),
+        age.label("age_years"),
+        repairs.label("repairs"),
+        leak_count.label("leaks"),
+        last_maintenance.label("last_maintenance"),
+    ).outerjoin(
+        history, history.c.asset_id == WaterAsset.id
+    ).outerjoin(
+        leaks, leaks.c.location == WaterAsset.location
+    )
+    if asset_ids is not None:
+        statement = statement.where(WaterAsset.id.in_(asset_ids))
+    return statement
+
+
+def _refresh(db: Session, asset_ids: Optional[Sequence[int]] = None) -> int:
+    queue = AssetMaintenanceQueue.__table__
+    removed = delete(queue).where(~exists().where(WaterAsset.id == queue.c.asset_id))
+    if asset_ids is not None:
+        removed = removed.where(queue.c.asset_id.in_(asset_ids))
+    db.execute(removed)
+
+    statement = pg_insert(queue).from_select(QUEUE_COLUMNS, _queue_rows(datetime.utcnow(), asset_ids))
+    changed = QUEUE_COLUMNS[1:]
+    statement = statement.on_conflict_do_update(
+        index_elements=[queue.c.asset_id],
+        set_={**{name: statement.excluded[name] for name in changed}, "updated_at": func.now()},
+        # Неизменившиеся записи не перезаписываются
+        where=tuple_(*[queue.c[name] for name in changed]).is_distinct_from(
+            tuple_(*[statement.excluded[name] for name in changed])
+        )
+    )
+    return db.execute(statement).rowcount
+
+
+def refresh_queue_entries(db: Session, asset_ids: Iterable[int]) -> None:
+    """
+    Пересчитывает записи очереди для активов asset_ids (удаляет записи удаленных активов)
+    в текущей транзакции, не фиксируя ее (для пакетных операций)
+    """
+    _refresh(db, list(asset_ids))
+
+
+def update_maintenance_queue(db: Session, asset_ids: Iterable[int]) -> None:
+    """
+    Пересчитывает записи очереди для активов asset_ids и фиксирует транзакцию
+    """
+    refresh_queue_entries(db, asset_ids)
+    db.commit()
+
+
+def due_maintenance_statement(due_before: datetime, asset_type: Optional[str] = None, location: Optional[str] = None):
+    """
+    Запрос активов со сроком обслуживания до due_before; порядок (по убыванию риска)
+    задается пагинацией по ключу (risk_score, asset_id)
+    """
+    statement = select(
+        AssetMaintenanceQueue.asset_id,
+        WaterAsset.name,
+        WaterAsset.asset_type,
+        WaterAsset.location,
+        AssetMaintenanceQueue.risk_score,
+        AssetMaintenanceQueue.due_at,
+        AssetMaintenanceQueue.age_years,
+        AssetMaintenanceQueue.repairs,
+        AssetMaintenanceQueue.leaks,
+        AssetMaintenanceQueue.last_maintenance,
+    ).join(
+        WaterAsset, WaterAsset.id == AssetMaintenanceQueue.asset_id
+    ).where(AssetMaintenanceQueue.due_at <= due_before)
+    if asset_type is not None:
+        statement = statement.where(WaterAsset.asset_type == asset_type)
+    if location is not None:
+        statement = statement.where(WaterAsset.location == location)
+    return statement
+
+
+def run_maintenance_queue_refresh() -> RefreshStats:
+    """
+    Пересчитывает очередь по всем активам одной транзакцией.
+    Если пересчет уже выполняется другим процессом, возвращает skipped
+    """
+    stats = RefreshStats()
+    with engine.connect() as lock:
+        acquired = lock.execute(text("SELECT pg_try_advisory_lock(:key)"), {"key": REFRESH_LOCK_KEY}).scalar()
+        lock.commit()
+        if not acquired:
+            stats.skipped = True
+            return stats
+        try:
+            with SessionLocal() as db:
+                stats.assets = _refresh(db)
+                db.commit()
+        finally:
+            lock.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": REFRESH_LOCK_KEY})
+            lock.commit()
+    return stats
+
+
+class MaintenanceQueueWorker:
+    """
+    Фоновый поток периодического пересчета очереди обслуживания.
+    Первый пересчет выполняется сразу при запуске
+    """
+
+    def __init__(self):
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+
+    def start(self, interval: float) -> None:
+        if interval <= 0:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, args=(interval,), name="maintenance-queue", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 5) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def _run(self, interval: float) -> None:
+        while True:
+            try:
+                stats = run_maintenance_queue_refresh()
+                if stats.assets:
+                    logger.info("Очередь обслуживания: обновлено записей %s", stats.assets)
+            except Exception:
+                logger.exception("Ошибка пересчета очереди обслуживания")
+            if self._stop.wait(interval):
+                return
+
+
+maintenance_queue_worker = MaintenanceQueueWorker()
@@ -0,0 +1,285 @@
+"""
+Кластеризация объектов на карте по тайлам (Web Mercator) с кэшированием результатов по тайлам
+"""
+import math
+from dataclasses import dataclass
+from itertools import chain
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from sqlalchemy import Integer, cast, event, func, inspect, select, true
+from sqlalchemy.orm import Session
+
+from backend.config.settings import CACHE_TTL, MAP_CACHE_SIZE, MAP_CLUSTER_SUBDIVISION, MAP_MAX_ZOOM
+from backend.models.complaints import Complaint
+from backend.models.water_infrastructure import WaterInfrastructure, WaterLeak
+from backend.utils.cache import TTLCache
+from backend.utils.geo import bbox_condition
+
+MAX_LATITUDE = 85.0511287798  # Граница проекции Web Mercator
+
+
+@dataclass(frozen=True)
+class MapLayer:
+    """
+    Слой карты: источник точек, их координаты и признак для разбивки по степени важности
+    """
+    name: str
+    latitude: object
+    longitude: object
+    severity: object
+    source: object
+    cell: object = None  # Ячейка сетки координат (geo_cell) для отбора по индексу
+    condition: object = None
+
+
+LAYERS = {
+    "infrastructure": MapLayer(
+        name="infrastructure",
+        latitude=WaterInfrastructure.latitude,
+        longitude=WaterInfrastructure.longitude,
+        severity=WaterInfrastructure.condition_status,
+        source=WaterInfrastructure.__table__,
+        cell=WaterInfrastructure.geo_cell,
+    ),
+    # Утечки не имеют своих координат и отображаются в точке объекта инфраструктуры;
+    # на карту попадают только неустраненные утечки
+    "leaks": MapLayer(
+        name="leaks",
+        latitude=WaterInfrastructure.latitude,
+        longitude=WaterInfrastructure.longitude,
+        severity=WaterLeak.severity,
+        source=WaterLeak.__table__.join(
+            WaterInfrastructure.__table__, WaterLeak.infrastructure_id == WaterInfrastructure.id
+        ),
+        cell=WaterInfrastructure.geo_cell,
+        condition=WaterLeak.repaired.isnot(true()),
+    ),
+    "complaints": MapLayer(
+        name="complaints",
+        latitude=Complaint.latitude,
+        longitude=Complaint.longitude,
+        severity=Complaint.priority,
+        source=Complaint.__table__,
+        cell=Complaint.geo_cell,
+    ),
+}
+
+# Кластеры по тайлам: (слой, масштаб, x, y) -> список кластеров
+_tile_cache = TTLCache(maxsize=MAP_CACHE_SIZE, ttl=CACHE_TTL)
+
+
+def lonlat_to_tile(lon: float, lat: float, zoom: int) -> Tuple[int, int]:
+    """
+    Номер тайла, содержащего точку
+    """
+    n = 2 ** zoom
+    lat = max(min(lat, MAX_LATITUDE), -MAX_LATITUDE)
+    x = int((lon + 180) / 360 * n)
+    y = int((1 - math.asinh(math.tan(math.radians(lat))) / math.pi) / 2 * n)
+    return min(max(x, 0), n - 1), min(max(y, 0), n - 1)
+
+
+def tile_bounds(zoom: int, x: int, y: int) -> Tuple[float, float, float, float]:
+    """
+    Границы тайла (min_lon, min_lat, max_lon, max_lat)
+    """
+    n = 2 ** zoom
+
+    def latitude(row: int) -> float:
+        return math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * row / n))))
+
+    return x / n * 360 - 180, latitude(y + 1), (x + 1) / n * 360 - 180, latitude(y)
+
+
+def tiles_for_bbox(zoom: int, min_lon: float, min_lat: float, max_lon: float, max_lat: float) -> Tuple[List[int], List[int]]:
+    """
+    Номера столбцов и строк тайлов, покрывающих прямоугольник.
+    Если min_lon > max_lon, столбцы идут через 180-й меридиан
+    """
+    n = 2 ** zoom
+    x_start, y_start = lonlat_to_tile(min_lon, max_lat, zoom)
+    x_end, y_end = lonlat_to_tile(max_lon, min_lat, zoom)
+    if min_lon <= max_lon:
+        columns = list(range(x_start, x_end + 1))
+    elif x_start <= x_end:
+        # Оба края прямоугольника в одном столбце тайлов: охвачены все столбцы
+        columns = list(range(n))
+    else:
+        columns = list(range(x_start, n)) + list(range(0, x_end + 1))
+    return columns, list(range(y_start, y_end + 1))
+
+
+def _cell_expressions(layer: MapLayer, zoom: int):
+    """
+    SQL-выражения номера ячейки кластера (тайл масштаба zoom) для точек слоя
+    """
+    n = 2 ** zoom
+    latitude = func.radians(func.least(func.greatest(layer.latitude, -MAX_LATITUDE), MAX_LATITUDE))
+    x = func.floor((layer.longitude + 180) / 360 * n)
+    y = func.floor((1 - func.ln(func.tan(latitude) + 1 / func.cos(latitude)) / math.pi) / 2 * n)
+    return (
+        cast(func.least(func.greatest(x, 0), n - 1), Integer).label("x"),
+        cast(func.least(func.greatest(y, 0), n - 1), Integer).label("y"),
+    )
+
+
+def _query_clusters(db: Session, layer: MapLayer, zoom: int, columns: List[int], rows: List[int]) -> Dict[Tuple[int, int], list]:
+    """
+    Считает кластеры для прямоугольного блока тайлов одним запросом.
+    Возвращает кластеры, сгруппированные по тайлам блока
+    """
+    min_lon = tile_bounds(zoom, columns[0], rows[0])[0]
+    max_lon = tile_bounds(zoom, columns[-1], rows[0])[2]
+    min_lat = tile_bounds(zoom, columns[0], rows[-1])[1]
+    max_lat = tile_bounds(zoom, columns[0], rows[0])[3]
+
+    cell_zoom = zoom + MAP_CLUSTER_SUBDIVISION
+    cell_x, cell_y = _cell_expressions(layer, cell_zoom)
+    conditions = [
+        layer.latitude.isnot(None),
+        layer.longitude.isnot(None),
+        bbox_condition(layer.latitude, layer.longitude, min_lon, min_lat, max_lon, max_lat, cell=layer.cell),
+    ]
+    if layer.condition is not None:
+        conditions.append(layer.condition)
+    severity = func.coalesce(layer.severity, "unknown").label("severity")
+    statement = select(
+        cell_x,
+        cell_y,
+        severity,
+        func.count().label("count"),
+        func.avg(layer.latitude).label("latitude"),
+        func.avg(layer.longitude).label("longitude"),
+    ).select_from(layer.source).where(*conditions).group_by(cell_x, cell_y, severity)
+
+    # Ячейки собираются в Python: разбивка по важности и центр, взвешенный по количеству
+    cells: Dict[Tuple[int, int], dict] = {}
+    for row in db.execute(statement):
+        cell = cells.get((row.x, row.y))
+        if cell is None:
+            cell = cells[(row.x, row.y)] = {"count": 0, "latitude": 0.0, "longitude": 0.0, "severity": {}}
+        cell["count"] += row.count
+        cell["latitude"] += row.latitude * row.count
+        cell["longitude"] += row.longitude * row.count
+        cell["severity"][row.severity] = cell["severity"].get(row.severity, 0) + row.count
+
+    tiles: Dict[Tuple[int, int], list] = {(x, y): [] for x in columns for y in rows}
+    for (x, y), cell in cells.items():
+        tile = (x >> MAP_CLUSTER_SUBDIVISION, y >> MAP_CLUSTER_SUBDIVISION)
+        if tile not in tiles:
+            continue
+        cell["latitude"] /= cell["count"]
+        cell["longitude"] /= cell["count"]
+        tiles[tile].append(cell)
+    return tiles
+
+
+def get_clusters(db: Session, layer: MapLayer, zoom: int, columns: List[int], rows: List[int]) -> List[dict]:
+    """
+    Кластеры слоя в тайлах columns x rows. Тайлы берутся из кэша,
+    отсутствующие считаются одним запросом по охватывающему их блоку
+    """
+    result = {}
+    missing_columns: Set[int] = set()
+    missing_rows: Set[int] = set()
+    for x in columns:
+        for y in rows:
+            clusters = _tile_cache.get((layer.name, zoom, x, y))
+            if clusters is None:
+                missing_columns.add(x)
+                missing_rows.add(y)
+            else:
+                result[(x, y)] = clusters
+
+    if missing_columns:
+        # Блок по порядку столбцов запроса (с учетом перехода через 180-й меридиан)
+        positions = [index for index, x in enumerate(columns) if x in missing_columns]
+        block_columns = columns[positions[0]:positions[-1] + 1]
+        block_rows = list(range(min(missing_rows), max(missing_rows) + 1))
+        for (x, y), clusters in _query_clusters(db, layer, zoom, block_columns, block_rows).items():
+            _tile_cache.set((layer.name, zoom, x, y), clusters)
+            result.setdefault((x, y), clusters)
+
+    return [cluster for x in columns for y in rows for cluster in result.get((x, y), [])]
+
+
+def invalidate_point(layer_names, latitude: Optional[float], longitude: Optional[float]) -> None:
+    """
+    Сбрасывает кэш тайлов всех масштабов, содержащих точку
+    """
+    if latitude is None or longitude is None:
+        return
+    for zoom in range(MAP_MAX_ZOOM + 1):
+        x, y = lonlat_to_tile(longitude, latitude, zoom)
+        for name in layer_names:
+            _tile_cache.pop((name, zoom, x, y))
+
+
+def _positions(obj) -> Set[Tuple[Optional[float], Optional[float]]]:
+    """
+    Текущие и прежние (до изменения) координаты объекта
+    """
+    state = inspect(obj)
+    latitude, longitude = state.attrs.latitude, state.attrs.longitude
+    positions = {(latitude.value, longitude.value)}
+    if latitude.history.deleted or longitude.history.deleted:
+        positions.add((
+            latitude.history.deleted[0] if latitude.history.deleted else latitude.value,
+            longitude.history.deleted[0] if longitude.history.deleted else longitude.value,
+        ))
+    return positions
+
+
+def track_changed_points(session: Session, layer_names, rows: Iterable) -> None:
+    """
+    Отмечает точки записей, измененных запросами в обход ORM (пакетные операции):
+    кэш тайлов сбрасывается после фиксации транзакции, как и для ORM-объектов
+    """
+    points = session.info.setdefault("map_changed_points", set())
+    points.update((tuple(layer_names), row["latitude"], row["longitude"]) for row in rows)
+
+
+@event.listens_for(Session, "after_flush")
+def _collect_changed_points(session: Session, flush_context) -> None:
+    points = session.info.setdefault("map_changed_points", set())
+    infrastructure_ids = set()
+    for obj in chain(session.new, session.dirty, session.deleted):
+        if isinstance(obj, WaterInfrastructure):
+            # Перемещение объекта инфраструктуры перемещает и его утечки
+            points.update((("infrastructure", "leaks"),) + position for position in _positions(obj))
+        elif isinstance(obj, Complaint):
+            points.update((("complaints",),) + position for position in _positions(obj))
+        elif isinstance(obj, WaterLeak):
+            history = inspect(obj).attrs.infrastructure_id.history
+            infrastructure_ids.update(history.sum() or [obj.infrastructure_id])
+
+    track_changed_leaks(session, infrastructure_ids)
+
+
+def track_changed_leaks(session: Session, infrastructure_ids: Iterable[Optional[int]]) -> None:
+    """
+    Отмечает точки объектов инфраструктуры, у которых изменились утечки
+    (утечки отображаются в точке своего объекта)
+    """
+    infrastructure_ids = set(infrastructure_ids)
+    infrastructure_ids.discard(None)
+    if not infrastructure_ids:
+        return
+    points = session.info.setdefault("map_changed_points", set())
+    rows = session.connection().execute(
+        select(WaterInfrastructure.latitude, WaterInfrastructure.longitude).where(
+            WaterInfrastructure.id.in_(infrastructure_ids)
+        )
+    )
+    points.update((("leaks",), row.latitude, row.longitude) for row in rows)
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_changed_tiles(session: Session) -> None:
+    for layer_names, latitude, longitude in session.info.pop("map_changed_points", ()):
+        invalidate_point(layer_names, latitude, longitude)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_changed_points(session: Session) -> None:
+    session.info.pop("map_changed_points", None)
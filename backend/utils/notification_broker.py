@@ -0,0 +1,275 @@
+"""
+Рассылка новых уведомлений подключенным клиентам (Server-Sent Events).
+Подключения хранятся в процессе; между процессами события передаются через
+LISTEN/NOTIFY PostgreSQL (NotificationRelay)
+"""
+import asyncio
+import json
+import logging
+import threading
+from dataclasses import dataclass, field
+from typing import Dict, Optional, Set
+
+from sqlalchemy import and_, func, or_, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from backend.config.database import AsyncSessionLocal, async_engine
+from backend.config.settings import NOTIFICATIONS_RELAY_RECONNECT_DELAY
+from backend.models.notifications import Notification, NotificationSetting
+from backend.schemas.notifications import NotificationResponse
+from backend.utils.auth import UserPrincipal
+
+logger = logging.getLogger(__name__)
+
+# Аудитория, которой адресованы уведомления без user_id
+AUDIENCE_ALL = "all"
+
+# Канал LISTEN/NOTIFY: новые уведомления и изменения настроек пользователей
+RELAY_CHANNEL = "notification_events"
+
+
+def is_visible(user: UserPrincipal, user_id: Optional[int], target_audience: Optional[str]) -> bool:
+    """
+    Адресовано ли уведомление пользователю: персональное - только ему,
+    общее - всем или пользователям с ролью, совпадающей с целевой аудиторией
+    """
+    if user_id is not None:
+        return user_id == user.id
+    return target_audience in (None, AUDIENCE_ALL, user.role.value)
+
+
+def visible_condition(user: UserPrincipal):
+    """
+    SQL-условие видимости уведомлений для пользователя (то же, что is_visible)
+    """
+    return or_(
+        Notification.user_id == user.id,
+        and_(
+            Notification.user_id.is_(None),
+            or_(
+                Notification.target_audience.is_(None),
+                Notification.target_audience.in_([AUDIENCE_ALL, user.role.value])
+            )
+        )
+    )
+
+
+async def load_muted_types(db: AsyncSession, user_id: int) -> Set[str]:
+    """
+    Типы уведомлений, для которых пользователь отключил уведомления или push-канал
+    """
+    result = await db.execute(
+        select(NotificationSetting.notification_type).filter(
+            NotificationSetting.user_id == user_id,
+            or_(NotificationSetting.enabled.is_(False), NotificationSetting.channel_push.is_(False))
+        )
+    )
+    return set(result.scalars().all())
+
+
+def event_data(notification: Notification) -> dict:
+    """
+    Данные события потока (поля NotificationResponse)
+    """
+    return NotificationResponse.model_validate(notification).model_dump(mode="json")
+
+
+def notify_created(notification_id: int):
+    """
+    Запрос, сообщающий всем процессам о новом уведомлении. NOTIFY доставляется
+    после commit транзакции, в которой выполнен, - уведомление к этому времени сохранено
+    """
+    return select(func.pg_notify(RELAY_CHANNEL, json.dumps({"notification_id": notification_id})))
+
+
+def notify_settings_changed(user_id: int):
+    """
+    Запрос, сообщающий всем процессам об изменении настроек уведомлений пользователя
+    """
+    return select(func.pg_notify(RELAY_CHANNEL, json.dumps({"user_id": user_id})))
+
+
+@dataclass(eq=False)
+class Subscriber:
+    """
+    Подключение клиента: очередь событий и настройки фильтрации
+    """
+    user: UserPrincipal
+    queue: asyncio.Queue
+    loop: asyncio.AbstractEventLoop
+    muted_types: Set[str] = field(default_factory=set)
+    overflowed: bool = False
+
+
+class NotificationBroker:
+    """
+    Реестр подключений. publish можно вызывать из любого потока:
+    события передаются в цикл событий подключения
+    """
+
+    def __init__(self):
+        self._subscribers: Dict[int, Set[Subscriber]] = {}
+        self._lock = threading.Lock()
+
+    def subscribe(self, user: UserPrincipal, muted_types: Set[str], queue_size: int) -> Subscriber:
+        subscriber = Subscriber(
+            user=user,
+            queue=asyncio.Queue(maxsize=queue_size),
+            loop=asyncio.get_running_loop(),
+            muted_types=muted_types
+        )
+        with self._lock:
+            self._subscribers.setdefault(user.id, set()).add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber: Subscriber) -> None:
+        with self._lock:
+            subscribers = self._subscribers.get(subscriber.user.id)
+            if subscribers is not None:
+                subscribers.discard(subscriber)
+                if not subscribers:
+                    del self._subscribers[subscriber.user.id]
+
+    def has_subscribers(self, user_id: Optional[int] = None) -> bool:
+        """
+        Есть ли подключения (пользователя user_id или любые)
+        """
+        with self._lock:
+            return bool(self._subscribers.get(user_id) if user_id is not None else self._subscribers)
+
+    def close_all(self) -> None:
+        """
+        Закрывает все потоки: клиенты переподключатся и получат пропущенное по Last-Event-ID
+        """
+        with self._lock:
+            subscribers = [subscriber for group in self._subscribers.values() for subscriber in group]
+        for subscriber in subscribers:
+            subscriber.loop.call_soon_threadsafe(self._close, subscriber)
+
+    def set_muted_types(self, user_id: int, muted_types: Set[str]) -> None:
+        """
+        Обновляет настройки уведомлений для всех подключений пользователя
+        """
+        with self._lock:
+            for subscriber in self._subscribers.get(user_id, ()):
+                subscriber.muted_types = set(muted_types)
+
+    def publish(self, notification: dict) -> None:
+        """
+        Отправляет уведомление (словарь полей NotificationResponse) подходящим подключениям
+        """
+        with self._lock:
+            if notification.get("user_id") is not None:
+                candidates = list(self._subscribers.get(notification["user_id"], ()))
+            else:
+                candidates = [subscriber for subscribers in self._subscribers.values() for subscriber in subscribers]
+
+        for subscriber in candidates:
+            if notification.get("notification_type") in subscriber.muted_types:
+                continue
+            if not is_visible(subscriber.user, notification.get("user_id"), notification.get("target_audience")):
+                continue
+            subscriber.loop.call_soon_threadsafe(self._deliver, subscriber, notification)
+
+    @classmethod
+    def _deliver(cls, subscriber: Subscriber, notification: dict) -> None:
+        if subscriber.overflowed:
+            return
+        try:
+            subscriber.queue.put_nowait(notification)
+        except asyncio.QueueFull:
+            # Клиент не успевает читать: поток закрывается, после переподключения
+            # пропущенные уведомления досылаются по Last-Event-ID
+            cls._close(subscriber)
+
+    @staticmethod
+    def _close(subscriber: Subscriber) -> None:
+        if subscriber.overflowed:
+            return
+        subscriber.overflowed = True
+        if subscriber.queue.full():
+            subscriber.queue.get_nowait()
+        subscriber.queue.put_nowait(None)
+
+
+broker = NotificationBroker()
+
+
+class NotificationRelay:
+    """
+    Получает события канала RELAY_CHANNEL на отдельном соединении (LISTEN) и передает
+    их подключениям процесса: новое уведомление загружается из базы и рассылается,
+    при изменении настроек перечитываются отключенные типы пользователя.
+    После восстановления потерянного соединения все потоки процесса закрываются,
+    чтобы клиенты получили пропущенное по Last-Event-ID
+    """
+
+    def __init__(self, target: NotificationBroker):
+        self._broker = target
+        self._task: Optional[asyncio.Task] = None
+        self._listening = asyncio.Event()
+
+    def start(self) -> None:
+        self._listening = asyncio.Event()
+        self._task = asyncio.get_running_loop().create_task(self._run(), name="notification-relay")
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def wait_listening(self) -> None:
+        await self._listening.wait()
+
+    async def _run(self) -> None:
+        reconnected = False
+        while True:
+            try:
+                await self._listen(reconnected)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Потеряно соединение канала уведомлений")
+            self._listening.clear()
+            reconnected = True
+            await asyncio.sleep(NOTIFICATIONS_RELAY_RECONNECT_DELAY)
+
+    async def _listen(self, reconnected: bool) -> None:
+        events: asyncio.Queue = asyncio.Queue()
+        async with async_engine.connect() as connection:
+            raw = (await connection.get_raw_connection()).driver_connection
+            # None в очереди - соединение закрыто
+            raw.add_termination_listener(lambda _: events.put_nowait(None))
+            await raw.add_listener(RELAY_CHANNEL, lambda _, pid, channel, payload: events.put_nowait(payload))
+            if reconnected:
+                self._broker.close_all()
+            self._listening.set()
+            while True:
+                payload = await events.get()
+                if payload is None:
+                    raise ConnectionError("Соединение канала уведомлений закрыто")
+                try:
+                    await self._handle(json.loads(payload))
+                except Exception:
+                    logger.exception("Ошибка рассылки события %s", payload)
+
+    async def _handle(self, event: dict) -> None:
+        if "notification_id" in event:
+            if not self._broker.has_subscribers():
+                return
+            async with AsyncSessionLocal() as db:
+                notification = await db.get(Notification, event["notification_id"])
+                if notification is not None:
+                    self._broker.publish(event_data(notification))
+        elif "user_id" in event:
+            if not self._broker.has_subscribers(event["user_id"]):
+                return
+            async with AsyncSessionLocal() as db:
+                self._broker.set_muted_types(event["user_id"], await load_muted_types(db, event["user_id"]))
+
+
+notification_relay = NotificationRelay(broker)
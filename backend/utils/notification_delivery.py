@@ -0,0 +1,326 @@
+"""
+Фоновая доставка уведомлений по каналам (email, SMS, push) через очередь исходящих.
+Запрос на создание уведомления только ставит задания в очередь, рассылку получателям
+выполняют потоки доставки пакетами с ограничением скорости по каналам
+"""
+import logging
+import threading
+import time
+from abc import ABC, abstractmethod
+from dataclasses import dataclass
+from datetime import timedelta
+from typing import Dict, List, Optional
+
+from sqlalchemy import and_, exists, func, select, true, update
+from sqlalchemy.orm import Session
+
+from backend.config.database import SessionLocal
+from backend.config.settings import (
+    NOTIFICATIONS_BATCH_SIZE,
+    NOTIFICATIONS_LEASE_TIMEOUT,
+    NOTIFICATIONS_MAX_ATTEMPTS,
+    NOTIFICATIONS_POLL_INTERVAL,
+    NOTIFICATIONS_RATE_EMAIL,
+    NOTIFICATIONS_RATE_PUSH,
+    NOTIFICATIONS_RATE_SMS,
+    NOTIFICATIONS_RETRY_DELAY,
+    NOTIFICATIONS_RETRY_MAX_DELAY,
+)
+from backend.models.notifications import Notification, NotificationDelivery, NotificationSetting
+from backend.models.user import User
+from backend.utils.notification_inbox import fanout_statement, recipients_condition
+
+logger = logging.getLogger(__name__)
+
+STATUS_PENDING = "pending"
+STATUS_DONE = "done"
+STATUS_FAILED = "failed"
+
+# Служебный канал: раскладка общего уведомления по входящим пользователей частями
+INBOX = "inbox"
+
+
+@dataclass(frozen=True)
+class Recipient:
+    id: int
+    username: str
+    email: Optional[str]
+
+
+@dataclass(frozen=True)
+class Message:
+    notification_id: int
+    title: str
+    message: str
+    notification_type: str
+    priority: str
+
+
+class ChannelAdapter(ABC):
+    """
+    Канал доставки. send получает пакет получателей одного уведомления
+    и должен выбросить исключение, если пакет не доставлен (пакет будет повторен).
+    Адаптер без send не создается (TypeError при настройке каналов, а не при доставке)
+    """
+
+    @abstractmethod
+    def send(self, message: Message, recipients: List[Recipient]) -> None:
+        ...
+
+
+class LogChannel(ChannelAdapter):
+    """
+    Заглушка канала для локального запуска и тестов: пишет пакеты в лог и считает отправленное
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self.sent: List[tuple] = []
+        self._lock = threading.Lock()
+
+    def send(self, message: Message, recipients: List[Recipient]) -> None:
+        with self._lock:
+            self.sent.extend((message.notification_id, recipient.id) for recipient in recipients)
+        logger.info("[%s] Уведомление %s: %s получателей", self.name, message.notification_id, len(recipients))
+
+
+class TokenBucket:
+    """
+    Ограничение скорости: rate сообщений в секунду с допустимым всплеском до capacity
+    """
+
+    def __init__(self, rate: float, capacity: Optional[float] = None):
+        self.rate = rate
+        self.capacity = capacity or rate
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, tokens: int) -> None:
+        """
+        Ждет, пока можно отправить tokens сообщений. Пакет больше capacity
+        уходит в долг, который отрабатывают следующие пакеты
+        """
+        needed = min(tokens, self.capacity)
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= needed:
+                    self._tokens -= tokens
+                    return
+                wait = (needed - self._tokens) / self.rate
+            time.sleep(wait)
+
+
+# Канал: (колонка настройки, значение при отсутствии настройки)
+CHANNEL_SETTINGS = {
+    "email": (NotificationSetting.channel_email, True),
+    "sms": (NotificationSetting.channel_sms, False),
+    "push": (NotificationSetting.channel_push, True),
+}
+
+DELIVERY_CHANNELS = list(CHANNEL_SETTINGS)
+
+channels: Dict[str, ChannelAdapter] = {name: LogChannel(name) for name in CHANNEL_SETTINGS}
+rate_limits: Dict[str, TokenBucket] = {
+    "email": TokenBucket(NOTIFICATIONS_RATE_EMAIL),
+    "sms": TokenBucket(NOTIFICATIONS_RATE_SMS),
+    "push": TokenBucket(NOTIFICATIONS_RATE_PUSH),
+}
+
+
+def register_channel(name: str, adapter: ChannelAdapter) -> None:
+    """
+    Подключает реализацию канала вместо заглушки
+    """
+    if name not in CHANNEL_SETTINGS:
+        raise ValueError(f"Неизвестный канал доставки: {name}")
+    channels[name] = adapter
+
+
+def enqueue(db, notification_id: int, channel_names: List[str] = DELIVERY_CHANNELS) -> None:
+    """
+    Ставит в очередь задания доставки уведомления (в текущей транзакции)
+    """
+    db.add_all([NotificationDelivery(notification_id=notification_id, channel=name) for name in channel_names])
+
+
+def cancel_statement(notification_id: int, channel: str):
+    """
+    Запрос отмены незавершенных заданий уведомления по каналу
+    """
+    return update(NotificationDelivery).where(
+        NotificationDelivery.notification_id == notification_id,
+        NotificationDelivery.channel == channel,
+        NotificationDelivery.status == STATUS_PENDING
+    ).values(status=STATUS_DONE).execution_options(synchronize_session=False)
+
+
+def _channel_condition(channel: str, notification_type: str):
+    """
+    Условие: пользователь не отключил уведомления этого типа и канал для них
+    """
+    column, default = CHANNEL_SETTINGS[channel]
+    setting = and_(NotificationSetting.user_id == User.id, NotificationSetting.notification_type == notification_type)
+    if default:
+        return ~exists().where(setting, (NotificationSetting.enabled.is_(False)) | (column.is_(False)))
+    return exists().where(setting, NotificationSetting.enabled.isnot(False), column.is_(true()))
+
+
+def _retry_delay(attempts: int) -> float:
+    return min(NOTIFICATIONS_RETRY_DELAY * 2 ** (attempts - 1), NOTIFICATIONS_RETRY_MAX_DELAY)
+
+
+def _claim(db: Session):
+    """
+    Берет готовое задание (с блокировкой строки, пропуская занятые другими обработчиками),
+    продлевает его аренду и выбирает следующий пакет получателей
+    """
+    job = db.execute(
+        select(NotificationDelivery).where(
+            NotificationDelivery.status == STATUS_PENDING,
+            NotificationDelivery.next_attempt_at <= func.now()
+        ).order_by(NotificationDelivery.next_attempt_at, NotificationDelivery.id)
+        .limit(1)
+        .with_for_update(skip_locked=True)
+    ).scalar_one_or_none()
+    if job is None:
+        return None
+
+    notification = db.get(Notification, job.notification_id)
+    if notification is None:
+        # Уведомление удалено до завершения рассылки
+        job.status = STATUS_DONE
+        return job, None, []
+
+    condition = recipients_condition(notification.user_id, notification.target_audience)
+    if job.channel == INBOX:
+        # Раскладка по входящим выполняется в базе, пакетом в транзакции выборки задания
+        batch = db.execute(
+            select(User.id).where(condition, User.id > job.cursor).order_by(User.id).limit(NOTIFICATIONS_BATCH_SIZE)
+        ).scalars().all()
+        if not batch:
+            job.status = STATUS_DONE
+            return job, None, []
+        added = db.execute(fanout_statement(notification, job.cursor, batch[-1])).scalars().all()
+        job.cursor = batch[-1]
+        job.sent_count += len(added)
+        return job, None, []
+
+    recipients = db.execute(
+        select(User.id, User.username, User.email).where(
+            condition,
+            User.id > job.cursor,
+            _channel_condition(job.channel, notification.notification_type)
+        ).order_by(User.id).limit(NOTIFICATIONS_BATCH_SIZE)
+    ).all()
+    if not recipients:
+        job.status = STATUS_DONE
+        return job, None, []
+
+    # Пока пакет отправляется, задание не выдается другим обработчикам;
+    # если обработчик упадет, задание вернется в очередь по истечении аренды
+    job.next_attempt_at = func.now() + timedelta(seconds=NOTIFICATIONS_LEASE_TIMEOUT)
+    message = Message(
+        notification_id=notification.id,
+        title=notification.title,
+        message=notification.message,
+        notification_type=notification.notification_type,
+        priority=notification.priority,
+    )
+    return job, message, [Recipient(id=row.id, username=row.username, email=row.email) for row in recipients]
+
+
+def process_next() -> bool:
+    """
+    Обрабатывает один пакет одного задания. Возвращает False, если готовых заданий нет
+    """
+    with SessionLocal() as db:
+        claimed = _claim(db)
+        if claimed is None:
+            return False
+        job, message, recipients = claimed
+        job_id, channel, cursor, attempts = job.id, job.channel, job.cursor, job.attempts
+        db.commit()
+    if message is None:
+        return True
+
+    values = {}
+    try:
+        rate_limits[channel].acquire(len(recipients))
+        channels[channel].send(message, recipients)
+    except Exception as exc:
+        attempts += 1
+        logger.warning("Ошибка доставки уведомления %s (%s), попытка %s: %s", message.notification_id, channel, attempts, exc)
+        values.update(
+            attempts=attempts,
+            last_error=str(exc),
+            status=STATUS_FAILED if attempts >= NOTIFICATIONS_MAX_ATTEMPTS else STATUS_PENDING,
+            next_attempt_at=func.now() + timedelta(seconds=_retry_delay(attempts)),
+        )
+    else:
+        values.update(
+            cursor=recipients[-1].id,
+            sent_count=NotificationDelivery.sent_count + len(recipients),
+            attempts=0,
+            status=STATUS_DONE if len(recipients) < NOTIFICATIONS_BATCH_SIZE else STATUS_PENDING,
+            next_attempt_at=func.now(),
+        )
+
+    with SessionLocal() as db:
+        # Условие по cursor: если аренда истекла и пакет уже обработан другим потоком, результат не записывается
+        db.execute(
+            update(NotificationDelivery)
+            .where(NotificationDelivery.id == job_id, NotificationDelivery.cursor == cursor)
+            .values(**values)
+        )
+        db.commit()
+    return True
+
+
+class DeliveryWorkers:
+    """
+    Пул потоков доставки. Несколько процессов приложения могут обрабатывать
+    одну очередь: задания распределяются блокировками строк (SKIP LOCKED)
+    """
+
+    def __init__(self):
+        self._threads: List[threading.Thread] = []
+        self._stop = threading.Event()
+        self._wake = threading.Event()
+
+    def start(self, count: int) -> None:
+        self._stop.clear()
+        for number in range(count):
+            thread = threading.Thread(target=self._run, name=f"notification-delivery-{number}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def stop(self, timeout: float = 5) -> None:
+        self._stop.set()
+        self._wake.set()
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+
+    def wake(self) -> None:
+        """
+        Будит потоки после постановки новых заданий, не дожидаясь опроса очереди
+        """
+        self._wake.set()
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            try:
+                processed = process_next()
+            except Exception:
+                logger.exception("Ошибка обработки очереди уведомлений")
+                processed = False
+            if not processed:
+                self._wake.wait(NOTIFICATIONS_POLL_INTERVAL)
+                self._wake.clear()
+
+
+delivery_workers = DeliveryWorkers()
@@ -0,0 +1,130 @@
+"""
+Входящие уведомления пользователей: рассылка по получателям, признаки прочтения
+и счетчики непрочитанных, обновляемые в той же транзакции
+"""
+from typing import Iterable, Optional
+
+from sqlalchemy import delete, false, func, literal, select, true, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from backend.models.notifications import Notification, NotificationCounter, UserNotification
+from backend.models.user import User, UserRole
+from backend.utils.notification_broker import AUDIENCE_ALL
+
+_ROLES = {role.value: role for role in UserRole}
+
+
+def recipients_condition(user_id: Optional[int], target_audience: Optional[str]):
+    """
+    Условие отбора получателей среди пользователей (то же правило, что и для потока уведомлений)
+    """
+    if user_id is not None:
+        return User.id == user_id
+    if target_audience in (None, AUDIENCE_ALL):
+        return User.is_active.is_(true())
+    if target_audience in _ROLES:
+        return (User.role == _ROLES[target_audience]) & User.is_active.is_(true())
+    return false()
+
+
+async def _adjust_counter(db: AsyncSession, user_id: int, delta: int) -> None:
+    statement = pg_insert(NotificationCounter).values(user_id=user_id, unread_count=max(delta, 0))
+    await db.execute(statement.on_conflict_do_update(
+        index_elements=[NotificationCounter.user_id],
+        set_={"unread_count": func.greatest(NotificationCounter.unread_count + delta, 0)}
+    ))
+
+
+def fanout_statement(notification: Notification, after_id: Optional[int] = None, up_to_id: Optional[int] = None):
+    """
+    Запрос раскладки уведомления по входящим получателей с увеличением их счетчиков.
+    Возвращает ID получателей, которым уведомление добавлено. after_id и up_to_id
+    ограничивают диапазон ID получателей для раскладки частями
+    """
+    is_read = bool(notification.is_read)
+    recipients = select(
+        User.id,
+        literal(notification.id),
+        literal(is_read),
+        literal(notification.created_at, type_=UserNotification.created_at.type)
+    ).where(recipients_condition(notification.user_id, notification.target_audience))
+    if after_id is not None:
+        recipients = recipients.where(User.id > after_id)
+    if up_to_id is not None:
+        recipients = recipients.where(User.id <= up_to_id)
+
+    inserted = pg_insert(UserNotification).from_select(
+        ["user_id", "notification_id", "is_read", "created_at"], recipients
+    ).on_conflict_do_nothing().returning(UserNotification.user_id)
+    if is_read:
+        return inserted
+    inserted = inserted.cte("inserted")
+    counters = pg_insert(NotificationCounter).from_select(
+        ["user_id", "unread_count"], select(inserted.c.user_id, literal(1))
+    )
+    return counters.on_conflict_do_update(
+        index_elements=[NotificationCounter.user_id],
+        set_={"unread_count": NotificationCounter.unread_count + 1}
+    ).returning(NotificationCounter.user_id)
+
+
+async def deliver(db: AsyncSession, notification: Notification) -> None:
+    """
+    Раскладывает уведомление по входящим всех получателей одним запросом
+    """
+    await db.execute(fanout_statement(notification))
+
+
+async def withdraw(db: AsyncSession, notification_id: int) -> None:
+    """
+    Убирает уведомление из входящих и уменьшает счетчики тех, кто его не прочитал
+    """
+    unread = select(UserNotification.user_id).where(
+        UserNotification.notification_id == notification_id,
+        UserNotification.is_read.is_(false())
+    )
+    await db.execute(
+        update(NotificationCounter)
+        .where(NotificationCounter.user_id.in_(unread))
+        .values(unread_count=func.greatest(NotificationCounter.unread_count - 1, 0))
+    )
+    await db.execute(delete(UserNotification).where(UserNotification.notification_id == notification_id))
+
+
+async def set_read(
+    db: AsyncSession,
+    user_id: int,
+    is_read: bool = True,
+    notification_ids: Optional[Iterable[int]] = None
+) -> int:
+    """
+    Отмечает уведомления пользователя прочитанными или непрочитанными
+    (все, если notification_ids не указан). Меняются только строки с другим состоянием,
+    счетчик корректируется на их количество. Возвращает количество измененных уведомлений
+    """
+    statement = update(UserNotification).where(
+        UserNotification.user_id == user_id,
+        UserNotification.is_read.is_(not is_read)
+    )
+    if notification_ids is not None:
+        statement = statement.where(UserNotification.notification_id.in_(list(notification_ids)))
+    result = await db.execute(
+        statement.values(is_read=is_read, read_at=func.now() if is_read else None)
+        .returning(UserNotification.notification_id)
+        .execution_options(synchronize_session=False)
+    )
+    changed = len(result.all())
+    if changed:
+        await _adjust_counter(db, user_id, -changed if is_read else changed)
+    return changed
+
+
+async def unread_count(db: AsyncSession, user_id: int) -> int:
+    """
+    Количество непрочитанных уведомлений пользователя (одна строка по первичному ключу)
+    """
+    count = await db.scalar(
+        select(NotificationCounter.unread_count).where(NotificationCounter.user_id == user_id)
+    )
+    return count or 0
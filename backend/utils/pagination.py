@@ -0,0 +1,117 @@
+"""
+Общая зависимость пагинации для списковых маршрутов
+"""
+import base64
+import binascii
+import json
+from collections.abc import Mapping
+from datetime import datetime
+from typing import List, Optional, Sequence
+
+from fastapi import HTTPException, Query, Response, status
+from sqlalchemy import tuple_
+
+from backend.config.settings import MAX_PAGE_SIZE
+
+# Заголовок с курсором следующей страницы
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+def encode_cursor(values: Sequence) -> str:
+    """
+    Кодирует значения ключа последней строки страницы в непрозрачный курсор
+    """
+    raw = json.dumps(
+        [value.isoformat() if isinstance(value, datetime) else value for value in values],
+        separators=(",", ":")
+    )
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, keys: Sequence) -> list:
+    """
+    Декодирует курсор и приводит значения к типам колонок ключа
+    """
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        values = json.loads(raw)
+        if not isinstance(values, list) or len(values) != len(keys):
+            raise ValueError
+        return [
+            datetime.fromisoformat(value) if key.type.python_type is datetime else value
+            for key, value in zip(keys, values)
+        ]
+    except (binascii.Error, ValueError, TypeError, UnicodeDecodeError):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Некорректный курсор пагинации"
+        )
+
+
+class Pagination:
+    """
+    Пагинация списков в двух режимах:
+    - skip/limit (как раньше), но с устойчивым порядком по ключу;
+    - keyset: cursor из заголовка X-Next-Cursor предыдущей страницы.
+    Заголовок X-Next-Cursor возвращается, если страница заполнена целиком
+    """
+
+    def __init__(
+        self,
+        response: Response,
+        skip: int = Query(0, ge=0),
+        limit: int = Query(100, ge=1, le=MAX_PAGE_SIZE),
+        cursor: Optional[str] = Query(None, description="Курсор следующей страницы из заголовка X-Next-Cursor")
+    ):
+        self.response = response
+        self.skip = skip
+        self.limit = limit
+        self.cursor = cursor
+        self.next_cursor = None
+        self._keys = ()
+
+    def apply(self, query, *keys, descending: bool = False):
+        """
+        Добавляет к запросу (Query или select) сортировку по ключу,
+        условие keyset по курсору либо offset, и limit
+        """
+        self._keys = keys
+        query = query.order_by(*[key.desc() if descending else key for key in keys])
+
+        if self.cursor is None:
+            return query.offset(self.skip).limit(self.limit)
+
+        values = decode_cursor(self.cursor, keys)
+        if len(keys) == 1:
+            left, right = keys[0], values[0]
+        else:
+            left, right = tuple_(*keys), tuple_(*values)
+        condition = left < right if descending else left > right
+        return query.filter(condition).limit(self.limit)
+
+    def page(self, items: List) -> List:
+        """
+        Запоминает курсор следующей страницы по последней строке и возвращает items
+        """
+        if len(items) == self.limit and self._keys:
+            last = items[-1]
+            if isinstance(last, Mapping):
+                values = [last[key.key] for key in self._keys]
+            else:
+                values = [getattr(last, key.key) for key in self._keys]
+            self.next_cursor = encode_cursor(values)
+            self.response.headers[NEXT_CURSOR_HEADER] = self.next_cursor
+        return items
+
+    def paginate(self, query, *keys, descending: bool = False) -> List:
+        """
+        Выполняет ORM-запрос постранично
+        """
+        return self.page(self.apply(query, *keys, descending=descending).all())
+
+    async def paginate_async(self, db, statement, *keys, descending: bool = False) -> List:
+        """
+        Выполняет select в асинхронной сессии постранично
+        """
+        result = await db.execute(self.apply(statement, *keys, descending=descending))
+        return self.page(result.scalars().all())
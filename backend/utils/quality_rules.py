@@ -0,0 +1,222 @@
+"""
+Пороговые правила контроля качества воды: правила компилируются в массивы numpy
+и применяются сразу ко всему пакету измерений
+"""
+import threading
+import time
+from collections.abc import Mapping
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+from fastapi import HTTPException, status
+from sqlalchemy import insert, select, true
+from sqlalchemy.orm import Session
+
+from backend.config.settings import CACHE_TTL
+from backend.models.water_quality import WaterQuality, WaterQualityAlert, WaterQualityRule
+
+# Показатели, для которых можно задавать правила
+PARAMETERS = {
+    "ph_level": "Уровень pH",
+    "chlorine_level": "Уровень хлора",
+    "turbidity": "Мутность",
+    "temperature": "Температура",
+    "dissolved_oxygen": "Растворенный кислород",
+    "e_coli": "Коли-бактерии",
+    "total_solids": "Общие твердые вещества",
+    "chemical_oxygen_demand": "Химическая потребность в кислороде",
+    "biological_oxygen_demand": "Биохимическая потребность в кислороде",
+}
+
+# Общие правила по умолчанию (нормативы для питьевой воды)
+DEFAULT_RULES = [
+    {"parameter": "ph_level", "min_value": 6.5, "max_value": 8.5, "alert_type": "warning"},
+    {"parameter": "chlorine_level", "min_value": 0.2, "max_value": 5.0, "alert_type": "warning"},
+    {"parameter": "turbidity", "min_value": None, "max_value": 5.0, "alert_type": "warning"},
+    {"parameter": "e_coli", "min_value": None, "max_value": 0.0, "alert_type": "alarm"},
+]
+
+_quality_table = WaterQuality.__table__
+_alert_table = WaterQualityAlert.__table__
+
+
+@dataclass
+class CompiledRules:
+    """
+    Правила одного показателя в виде массивов (по одному элементу на правило)
+    """
+    parameter: str
+    locations: np.ndarray  # Код местоположения, -1 - общее правило
+    min_values: np.ndarray  # NaN - порог не задан
+    max_values: np.ndarray
+    alert_types: List[str]
+    messages: List[Optional[str]]
+
+
+@dataclass
+class RuleSet:
+    location_codes: Dict[str, int]
+    rules: List[CompiledRules]
+    compiled_at: float
+
+
+_rule_set: Optional[RuleSet] = None
+_rule_set_lock = threading.Lock()
+
+
+def invalidate_rules() -> None:
+    """
+    Сбрасывает скомпилированные правила (после изменения правил)
+    """
+    global _rule_set
+    with _rule_set_lock:
+        _rule_set = None
+
+
+def rule_errors(parameter: str, min_value: Optional[float], max_value: Optional[float]) -> List[str]:
+    """
+    Ошибки в правиле (пустой список, если правило корректно)
+    """
+    if parameter not in PARAMETERS:
+        return [f"Неизвестный показатель. Допустимые значения: {', '.join(PARAMETERS)}"]
+    if min_value is None and max_value is None:
+        return ["Необходимо задать хотя бы один порог (min_value или max_value)"]
+    if min_value is not None and max_value is not None and min_value > max_value:
+        return ["min_value не может быть больше max_value"]
+    return []
+
+
+def check_rule(parameter: str, min_value: Optional[float], max_value: Optional[float]) -> None:
+    """
+    Проверяет корректность правила
+    """
+    errors = rule_errors(parameter, min_value, max_value)
+    if errors:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=errors[0])
+
+
+def _compile(rules: List[WaterQualityRule]) -> RuleSet:
+    location_codes: Dict[str, int] = {}
+    by_parameter: Dict[str, List[WaterQualityRule]] = {}
+    for rule in rules:
+        if rule.location is not None:
+            location_codes.setdefault(rule.location, len(location_codes))
+        by_parameter.setdefault(rule.parameter, []).append(rule)
+
+    compiled = [
+        CompiledRules(
+            parameter=parameter,
+            locations=np.array([-1 if rule.location is None else location_codes[rule.location] for rule in items]),
+            min_values=np.array([np.nan if rule.min_value is None else rule.min_value for rule in items], dtype=float),
+            max_values=np.array([np.nan if rule.max_value is None else rule.max_value for rule in items], dtype=float),
+            alert_types=[rule.alert_type for rule in items],
+            messages=[rule.message for rule in items],
+        )
+        for parameter, items in by_parameter.items()
+    ]
+    return RuleSet(location_codes=location_codes, rules=compiled, compiled_at=time.monotonic())
+
+
+def get_rule_set(db: Session) -> RuleSet:
+    """
+    Возвращает скомпилированные активные правила. Правила перечитываются
+    после изменения через API, в остальных процессах - не реже чем раз в CACHE_TTL
+    """
+    global _rule_set
+    rule_set = _rule_set
+    if rule_set is not None and time.monotonic() - rule_set.compiled_at < CACHE_TTL:
+        return rule_set
+    rules = db.execute(
+        select(WaterQualityRule).where(
+            WaterQualityRule.is_active.is_(true()),
+            WaterQualityRule.parameter.in_(PARAMETERS)
+        )
+    ).scalars().all()
+    rule_set = _compile(rules)
+    with _rule_set_lock:
+        _rule_set = rule_set
+    return rule_set
+
+
+def _value(reading, name):
+    return reading.get(name) if isinstance(reading, Mapping) else getattr(reading, name)
+
+
+def evaluate(rule_set: RuleSet, readings: List, parameters: Optional[Iterable[str]] = None) -> List[dict]:
+    """
+    Проверяет пакет измерений (ORM-объекты или словари с id) и возвращает данные уведомлений
+    о нарушениях. Правила для конкретной точки заменяют общие правила по тому же показателю.
+    parameters ограничивает проверку указанными показателями
+    """
+    rule_groups = rule_set.rules
+    if parameters is not None:
+        parameters = set(parameters)
+        rule_groups = [rules for rules in rule_groups if rules.parameter in parameters]
+    if not readings or not rule_groups:
+        return []
+
+    row_locations = np.array([rule_set.location_codes.get(_value(reading, "location"), -2) for reading in readings])
+    alerts = []
+    for rules in rule_groups:
+        values = np.array(
+            [np.nan if _value(reading, rules.parameter) is None else _value(reading, rules.parameter) for reading in readings],
+            dtype=float
+        )
+        is_global = rules.locations == -1
+        # Матрицы (измерения x правила)
+        matches_location = row_locations[:, None] == rules.locations[None, :]
+        has_specific = (matches_location & ~is_global[None, :]).any(axis=1)
+        applicable = np.where(is_global[None, :], ~has_specific[:, None], matches_location)
+        with np.errstate(invalid="ignore"):
+            violated = applicable & (
+                (values[:, None] < rules.min_values[None, :]) | (values[:, None] > rules.max_values[None, :])
+            )
+
+        for row, rule in zip(*np.nonzero(violated)):
+            reading = readings[row]
+            alerts.append({
+                "quality_id": _value(reading, "id"),
+                "alert_type": rules.alert_types[rule],
+                "message": rules.messages[rule] or _format_message(
+                    rules.parameter, values[row], rules.min_values[rule], rules.max_values[rule], _value(reading, "location")
+                ),
+                "is_active": True,
+                "acknowledged": False,
+            })
+    return alerts
+
+
+def _format_message(parameter: str, value: float, min_value: float, max_value: float, location: str) -> str:
+    if np.isnan(max_value) or value < min_value:
+        limit = f"ниже допустимого минимума {min_value:g}"
+    else:
+        limit = f"выше допустимого максимума {max_value:g}"
+    return f"{PARAMETERS[parameter]} ({location}): значение {value:g} {limit}"
+
+
+def emit_alerts(db: Session, readings: List, parameters: Optional[Iterable[str]] = None) -> int:
+    """
+    Проверяет измерения и записывает уведомления в текущей транзакции.
+    Возвращает количество созданных уведомлений
+    """
+    alerts = evaluate(get_rule_set(db), readings, parameters)
+    if alerts:
+        db.execute(insert(_alert_table), alerts)
+    return len(alerts)
+
+
+def write_quality_batch(db: Session, rows: List[dict]) -> int:
+    """
+    Записывает пакет измерений и создает уведомления о нарушениях порогов в той же транзакции
+    """
+    inserted = db.execute(
+        insert(_quality_table).returning(
+            _quality_table.c.id,
+            _quality_table.c.location,
+            *[_quality_table.c[parameter] for parameter in PARAMETERS]
+        ),
+        rows
+    ).mappings().all()
+    emit_alerts(db, inserted)
+    return len(inserted)
@@ -0,0 +1,149 @@
+"""
+Кэширование ответов справочных маршрутов (тарифы, способы оплаты, категории жалоб)
+с поддержкой ETag/If-None-Match. Данные хранятся в памяти процесса либо, если задан CACHE_URL,
+в общем Redis. Сброс - по пространству имен: номер версии пространства входит в ключ записи
+"""
+import hashlib
+import json
+import threading
+from typing import Any, Optional, Tuple
+
+from fastapi import Request, Response
+from pydantic import TypeAdapter
+
+from backend.config.settings import CACHE_SIZE, CACHE_TTL, CACHE_URL
+from backend.utils.cache import TTLCache
+from backend.utils.pagination import NEXT_CURSOR_HEADER
+
+# Пространства имен
+TARIFFS = "tariffs"
+PAYMENT_METHODS = "payment_methods"
+COMPLAINT_CATEGORIES = "complaint_categories"
+
+# Заголовки ответа, которые сохраняются вместе с телом
+CACHED_HEADERS = (NEXT_CURSOR_HEADER,)
+
+
+class MemoryBackend:
+    """
+    Хранилище в памяти процесса. Сброс действует только в текущем процессе,
+    в остальных записи устаревают не позже чем через CACHE_TTL
+    """
+
+    def __init__(self, maxsize: int):
+        self._entries = TTLCache(maxsize=maxsize, ttl=CACHE_TTL)
+        self._versions = {}
+        self._lock = threading.Lock()
+
+    def get(self, key: str):
+        return self._entries.get(key)
+
+    def set(self, key: str, value, ttl: float) -> None:
+        self._entries.set(key, value, ttl)
+
+    def version(self, namespace: str) -> int:
+        return self._versions.get(namespace, 0)
+
+    def bump(self, namespace: str) -> None:
+        with self._lock:
+            self._versions[namespace] = self._versions.get(namespace, 0) + 1
+
+
+class RedisBackend:
+    """
+    Общее хранилище в Redis: записи и сброс видны всем процессам приложения
+    """
+
+    def __init__(self, url: str):
+        try:
+            import redis
+        except ImportError:
+            raise RuntimeError("Для CACHE_URL требуется пакет redis (pip install redis)")
+        self._client = redis.Redis.from_url(url)
+
+    def get(self, key: str):
+        value = self._client.get(f"cache:entry:{key}")
+        if value is None:
+            return None
+        etag, body, headers = json.loads(value)
+        return etag, body.encode(), headers
+
+    def set(self, key: str, value, ttl: float) -> None:
+        etag, body, headers = value
+        self._client.set(f"cache:entry:{key}", json.dumps([etag, body.decode(), headers]), ex=max(int(ttl), 1))
+
+    def version(self, namespace: str) -> int:
+        return int(self._client.get(f"cache:version:{namespace}") or 0)
+
+    def bump(self, namespace: str) -> None:
+        self._client.incr(f"cache:version:{namespace}")
+
+
+def _etag_matches(request: Request, etag: str) -> bool:
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    candidates = [value.strip() for value in header.split(",")]
+    return "*" in candidates or etag in candidates or f"W/{etag}" in candidates
+
+
+class ResponseCache:
+    """
+    Кэш сериализованных ответов. Использование в маршруте:
+
+        key, cached = response_cache.lookup(request, TARIFFS)
+        if cached is not None:
+            return cached
+        ...
+        return response_cache.store(key, request, List[TariffResponse], items, pagination.response)
+    """
+
+    def __init__(self, backend, ttl: float = CACHE_TTL):
+        self.backend = backend
+        self.ttl = ttl
+        self._adapters = {}
+
+    def _key(self, namespace: str, request: Request) -> str:
+        query = "&".join(sorted(f"{name}={value}" for name, value in request.query_params.multi_items()))
+        return f"{namespace}:{self.backend.version(namespace)}:{request.url.path}?{query}"
+
+    def _response(self, request: Request, entry: Tuple[str, bytes, dict]) -> Response:
+        etag, body, headers = entry
+        headers = {**headers, "ETag": etag, "Cache-Control": "no-cache"}
+        if _etag_matches(request, etag):
+            return Response(status_code=304, headers=headers)
+        return Response(content=body, media_type="application/json", headers=headers)
+
+    def lookup(self, request: Request, namespace: str) -> Tuple[str, Optional[Response]]:
+        """
+        Возвращает ключ записи и готовый ответ из кэша (или None, если записи нет)
+        """
+        key = self._key(namespace, request)
+        entry = self.backend.get(key)
+        return key, None if entry is None else self._response(request, entry)
+
+    def store(self, key: str, request: Request, model: Any, content: Any, response: Optional[Response] = None) -> Response:
+        """
+        Сериализует content по схеме model, сохраняет и возвращает ответ.
+        Из response переносятся заголовки, которые маршрут выставил сам (курсор пагинации)
+        """
+        adapter = self._adapters.get(model)
+        if adapter is None:
+            adapter = self._adapters[model] = TypeAdapter(model)
+        body = adapter.dump_json(adapter.validate_python(content, from_attributes=True))
+        headers = {}
+        if response is not None:
+            headers = {name: response.headers[name] for name in CACHED_HEADERS if name in response.headers}
+        entry = (f'"{hashlib.sha1(body).hexdigest()}"', body, headers)
+        self.backend.set(key, entry, self.ttl)
+        return self._response(request, entry)
+
+    def invalidate(self, *namespaces: str) -> None:
+        """
+        Сбрасывает все записи пространств имен (после изменения данных)
+        """
+        for namespace in namespaces:
+            self.backend.bump(namespace)
+
+
+response_cache = ResponseCache(RedisBackend(CACHE_URL) if CACHE_URL else MemoryBackend(CACHE_SIZE))
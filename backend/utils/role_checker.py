@@ -1,8 +1,8 @@
 from typing import Callable, List
 from fastapi import Depends, HTTPException, status
 from sqlalchemy.orm import Session
-from backend.models.user import User, UserRole
-from backend.utils.auth import get_current_active_user
+from backend.models.user import UserRole
+from backend.utils.auth import UserPrincipal, get_current_active_user
 
 
 def check_role(required_roles: List[UserRole]) -> Callable:
@@ -10,8 +10,8 @@ def check_role(required_roles: List[UserRole]) -> Callable:
     Декоратор для проверки роли пользователя
     """
     async def role_checker(
-        current_user: User = Depends(get_current_active_user)
-    ) -> User:
+        current_user: UserPrincipal = Depends(get_current_active_user)
+    ) -> UserPrincipal:
         if current_user.role not in required_roles:
             raise HTTPException(
                 status_code=status.HTTP_403_FORBIDDEN,
@@ -24,8 +24,8 @@ def check_role(required_roles: List[UserRole]) -> Callable:
 
 # Проверка прав для обычного пользователя
 def require_user(
-    current_user: User = Depends(get_current_active_user)
-) -> User:
+    current_user: UserPrincipal = Depends(get_current_active_user)
+) -> UserPrincipal:
     if current_user.role not in [UserRole.USER, UserRole.ENGINEER, UserRole.ADMIN]:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
@@ -36,8 +36,8 @@ def require_user(
 
 # Проверка прав для инженера
 def require_engineer(
-    current_user: User = Depends(get_current_active_user)
-) -> User:
+    current_user: UserPrincipal = Depends(get_current_active_user)
+) -> UserPrincipal:
     if current_user.role not in [UserRole.ENGINEER, UserRole.ADMIN]:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
@@ -48,8 +48,8 @@ def require_engineer(
 
 # Проверка прав для администратора
 def require_admin(
-    current_user: User = Depends(get_current_active_user)
-) -> User:
+    current_user: UserPrincipal = Depends(get_current_active_user)
+) -> UserPrincipal:
     if current_user.role != UserRole.ADMIN:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
@@ -61,8 +61,8 @@ def require_admin(
 # Проверка прав для редактирования данных пользователя
 def require_edit_user(
     user_id: int,
-    current_user: User = Depends(get_current_active_user)
-) -> User:
+    current_user: UserPrincipal = Depends(get_current_active_user)
+) -> UserPrincipal:
     if current_user.role == UserRole.ADMIN:
         return current_user
     elif current_user.role == UserRole.ENGINEER:
@@ -81,8 +81,8 @@ def require_edit_user(
 
 # Проверка прав для удаления пользователя
 def require_delete_user(
-    current_user: User = Depends(get_current_active_user)
-) -> User:
+    current_user: UserPrincipal = Depends(get_current_active_user)
+) -> UserPrincipal:
     if current_user.role != UserRole.ADMIN:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
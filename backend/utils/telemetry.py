@@ -0,0 +1,216 @@
+"""
+Хранение и агрегирование телеметрии объектов инфраструктуры водоснабжения
+"""
+from datetime import datetime, timezone
+from typing import Iterable, List, Optional, Set
+
+from sqlalchemy import event, func, literal_column, select, text
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.orm import Session
+
+from backend.config.database import SessionLocal
+from backend.models.water_infrastructure import InfrastructureTelemetry, InfrastructureTelemetryHourly
+
+# Измеряемые величины, для которых ведутся агрегаты
+METRICS = ("pressure", "temperature", "flow_rate")
+
+# Допустимые интервалы агрегации; "minute" считается по сырым показаниям,
+# остальные - по почасовым агрегатам
+BUCKETS = ("minute", "hour", "day", "week", "month")
+
+_raw_table = InfrastructureTelemetry.__table__
+_hourly_table = InfrastructureTelemetryHourly.__table__
+
+# Месяцы, секции которых уже созданы (в закоммиченных транзакциях этого процесса)
+_known_partitions: Set[datetime] = set()
+
+# Коды ошибок PostgreSQL при одновременном создании одной секции несколькими транзакциями:
+# CREATE TABLE IF NOT EXISTS не защищен от гонки (duplicate_table, unique_violation в pg_type)
+_DUPLICATE_PARTITION_CODES = ("42P07", "23505")
+
+
+def _as_utc(ts: datetime) -> datetime:
+    return ts.replace(tzinfo=timezone.utc) if ts.tzinfo is None else ts.astimezone(timezone.utc)
+
+
+def _month_start(ts: datetime) -> datetime:
+    return ts.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+
+
+def _next_month(month: datetime) -> datetime:
+    return month.replace(year=month.year + 1, month=1) if month.month == 12 else month.replace(month=month.month + 1)
+
+
+def _create_partition(db: Session, month: datetime) -> None:
+    """
+    Создает секцию месяца в точке сохранения: если ту же секцию одновременно создала
+    другая транзакция, ошибка не прерывает запись пакета
+    """
+    try:
+        with db.begin_nested():
+            db.execute(text(
+                f"CREATE TABLE IF NOT EXISTS {_raw_table.name}_{month:%Y%m} "
+                f"PARTITION OF {_raw_table.name} "
+                f"FOR VALUES FROM ('{month.isoformat()}') TO ('{_next_month(month).isoformat()}')"
+            ))
+    except DBAPIError as exc:
+        if getattr(exc.orig, "pgcode", None) not in _DUPLICATE_PARTITION_CODES:
+            raise
+
+
+def ensure_partitions(db: Session, timestamps: Iterable[datetime]) -> None:
+    """
+    Создает месячные секции таблицы телеметрии для переданных моментов времени.
+    Месяцы, секции которых созданы в закоммиченных транзакциях процесса или в текущей
+    транзакции сессии, повторно не запрашиваются. Секции текущего и следующего месяца
+    создаются заранее (create_upcoming_partitions), поэтому запись показаний обычно
+    не выполняет DDL, блокирующий таблицу до конца транзакции
+    """
+    created = db.info.setdefault("telemetry_partitions", set())
+    for month in sorted({_month_start(ts) for ts in timestamps} - _known_partitions - created):
+        _create_partition(db, month)
+        created.add(month)
+
+
+# События вызываются и для точек сохранения; учитывается только завершение всей транзакции
+@event.listens_for(Session, "after_commit")
+def _remember_partitions(session: Session) -> None:
+    if not session.in_nested_transaction():
+        _known_partitions.update(session.info.pop("telemetry_partitions", ()))
+
+
+@event.listens_for(Session, "after_rollback")
+def _forget_partitions(session: Session) -> None:
+    # Секции, созданные в отмененной транзакции, не существуют
+    if not session.in_nested_transaction():
+        session.info.pop("telemetry_partitions", None)
+
+
+def create_upcoming_partitions(now: Optional[datetime] = None) -> None:
+    """
+    Создает секции текущего и следующего месяца (при запуске и перед каждым
+    фоновым поиском утечек)
+    """
+    month = _month_start(_as_utc(now or datetime.now(timezone.utc)))
+    with SessionLocal() as db:
+        ensure_partitions(db, [month, _next_month(month)])
+        db.commit()
+
+
+def write_telemetry_batch(db: Session, rows: List[dict]) -> int:
+    """
+    Записывает пакет показаний и обновляет почасовые агрегаты.
+    Повторно присланные показания (тот же объект и время) пропускаются.
+    Возвращает количество записанных показаний
+    """
+    for row in rows:
+        row["ts"] = _as_utc(row["ts"])
+    ensure_partitions(db, (row["ts"] for row in rows))
+
+    inserted = db.execute(
+        pg_insert(_raw_table).on_conflict_do_nothing().returning(
+            _raw_table.c.infrastructure_id,
+            _raw_table.c.ts,
+            *[_raw_table.c[metric] for metric in METRICS]
+        ),
+        rows
+    ).all()
+    if not inserted:
+        return 0
+
+    # Агрегируем в памяти только действительно вставленные строки
+    buckets = {}
+    for sample in inserted:
+        sample = sample._mapping
+        hour = _as_utc(sample["ts"]).replace(minute=0, second=0, microsecond=0)
+        key = (sample["infrastructure_id"], hour)
+        bucket = buckets.get(key)
+        if bucket is None:
+            bucket = {"infrastructure_id": key[0], "bucket": hour, "samples": 0}
+            for metric in METRICS:
+                bucket.update({f"{metric}_count": 0, f"{metric}_sum": 0.0, f"{metric}_min": None, f"{metric}_max": None})
+            buckets[key] = bucket
+
+        bucket["samples"] += 1
+        for metric in METRICS:
+            value = sample[metric]
+            if value is None:
+                continue
+            bucket[f"{metric}_count"] += 1
+            bucket[f"{metric}_sum"] += value
+            if bucket[f"{metric}_min"] is None or value < bucket[f"{metric}_min"]:
+                bucket[f"{metric}_min"] = value
+            if bucket[f"{metric}_max"] is None or value > bucket[f"{metric}_max"]:
+                bucket[f"{metric}_max"] = value
+
+    statement = pg_insert(_hourly_table)
+    excluded = statement.excluded
+    update_values = {"samples": _hourly_table.c.samples + excluded.samples}
+    for metric in METRICS:
+        update_values.update({
+            f"{metric}_count": _hourly_table.c[f"{metric}_count"] + excluded[f"{metric}_count"],
+            f"{metric}_sum": _hourly_table.c[f"{metric}_sum"] + excluded[f"{metric}_sum"],
+            # least/greatest в PostgreSQL игнорируют NULL
+            f"{metric}_min": func.least(_hourly_table.c[f"{metric}_min"], excluded[f"{metric}_min"]),
+            f"{metric}_max": func.greatest(_hourly_table.c[f"{metric}_max"], excluded[f"{metric}_max"]),
+        })
+    db.execute(
+        statement.on_conflict_do_update(
+            index_elements=[_hourly_table.c.infrastructure_id, _hourly_table.c.bucket],
+            set_=update_values
+        ),
+        list(buckets.values())
+    )
+    return len(inserted)
+
+
+def query_downsampled(
+    db: Session,
+    infrastructure_id: int,
+    date_from: datetime,
+    date_to: datetime,
+    bucket: str
+) -> List[dict]:
+    """
+    Возвращает min/max/avg показаний по интервалам времени.
+    Интервалы от часа и больше считаются по почасовым агрегатам без чтения сырых показаний.
+    bucket должен быть проверен по BUCKETS: он подставляется в SQL литералом
+    """
+    date_from, date_to = _as_utc(date_from), _as_utc(date_to)
+
+    if bucket == "minute":
+        period = func.date_trunc(literal_column(f"'{bucket}'"), _raw_table.c.ts).label("bucket")
+        columns = [period, func.count().label("samples")]
+        for metric in METRICS:
+            column = _raw_table.c[metric]
+            columns += [
+                func.min(column).label(f"{metric}_min"),
+                func.max(column).label(f"{metric}_max"),
+                func.avg(column).label(f"{metric}_avg"),
+            ]
+        query = select(*columns).where(
+            _raw_table.c.infrastructure_id == infrastructure_id,
+            _raw_table.c.ts >= date_from,
+            _raw_table.c.ts < date_to
+        )
+    else:
+        period = func.date_trunc(literal_column(f"'{bucket}'"), _hourly_table.c.bucket).label("bucket")
+        columns = [period, func.sum(_hourly_table.c.samples).label("samples")]
+        for metric in METRICS:
+            columns += [
+                func.min(_hourly_table.c[f"{metric}_min"]).label(f"{metric}_min"),
+                func.max(_hourly_table.c[f"{metric}_max"]).label(f"{metric}_max"),
+                (
+                    func.sum(_hourly_table.c[f"{metric}_sum"])
+                    / func.nullif(func.sum(_hourly_table.c[f"{metric}_count"]), 0)
+                ).label(f"{metric}_avg"),
+            ]
+        query = select(*columns).where(
+            _hourly_table.c.infrastructure_id == infrastructure_id,
+            _hourly_table.c.bucket >= date_from.replace(minute=0, second=0, microsecond=0),
+            _hourly_table.c.bucket < date_to
+        )
+
+    rows = db.execute(query.group_by(period).order_by(period)).mappings().all()
+    return [dict(row) for row in rows]
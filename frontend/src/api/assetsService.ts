@@ -1,5 +1,10 @@
 import apiClient from "./apiClient";
-import type { WaterAsset, AssetMaintenance } from "./types";
+import type {
+  WaterAsset,
+  AssetMaintenance,
+  MaintenanceQueueItem,
+  MaintenanceQueuePage,
+} from "./types";
 
 const ASSETS_API = "/assets";
 
@@ -98,11 +103,28 @@ export const assetsService = {
     return response.data;
   },
 
-  // Получение актива с ближайшим сроком обслуживания
-  getAssetNeedingMaintenance: async (): Promise<WaterAsset[]> => {
-    const response = await apiClient.get<WaterAsset[]>(
-      `${ASSETS_API}/maintenance-due`
+  // Получение активов, требующих обслуживания, по убыванию оценки риска;
+  // следующая страница запрашивается с cursor из предыдущего ответа
+  getAssetNeedingMaintenance: async (
+    cursor?: string,
+    limit: number = 100,
+    dueBefore?: string,
+    assetType?: string,
+    location?: string
+  ): Promise<MaintenanceQueuePage> => {
+    const params: { [key: string]: string | number } = { limit };
+    if (cursor) params.cursor = cursor;
+    if (dueBefore) params.due_before = dueBefore;
+    if (assetType) params.asset_type = assetType;
+    if (location) params.location = location;
+
+    const response = await apiClient.get<MaintenanceQueueItem[]>(
+      `${ASSETS_API}/maintenance-due`,
+      { params }
     );
-    return response.data;
+    return {
+      items: response.data,
+      nextCursor: (response.headers["x-next-cursor"] as string | undefined) ?? null,
+    };
   },
 };
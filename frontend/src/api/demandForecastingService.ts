@@ -3,6 +3,8 @@ import type {
   WaterDemand,
   WaterDistributionPlan,
   InvestmentPlan,
+  DemandForecast,
+  DemandForecastRun,
 } from "./types";
 
 const DEMAND_FORECASTING_API = "/demand";
@@ -162,19 +164,36 @@ export const demandForecastingService = {
     await apiClient.delete(`${DEMAND_FORECASTING_API}/investment-plans/${id}`);
   },
 
-  // Получение прогноза спроса на основе исторических данных
+  // Получение прогноза спроса на horizon дней вперед
   getDemandForecast: async (
     location?: string,
-    dateFrom?: string,
-    dateTo?: string
-  ): Promise<WaterDemand[]> => {
-    const params: { [key: string]: string } = {};
+    demandType?: string,
+    horizon: number = 14
+  ): Promise<DemandForecast[]> => {
+    const params: { [key: string]: string | number } = { horizon };
     if (location) params.location = location;
-    if (dateFrom) params.date_from = dateFrom;
-    if (dateTo) params.date_to = dateTo;
+    if (demandType) params.demand_type = demandType;
 
-    const response = await apiClient.get<WaterDemand[]>(
+    const response = await apiClient.get<DemandForecast[]>(
+      `${DEMAND_FORECASTING_API}/forecast`,
+      { params }
+    );
+    return response.data;
+  },
+
+  // Расчет прогноза и сохранение его в данные о спросе
+  runDemandForecast: async (
+    location?: string,
+    demandType?: string,
+    horizon: number = 14
+  ): Promise<DemandForecastRun> => {
+    const params: { [key: string]: string | number } = { horizon };
+    if (location) params.location = location;
+    if (demandType) params.demand_type = demandType;
+
+    const response = await apiClient.post<DemandForecastRun>(
       `${DEMAND_FORECASTING_API}/forecast`,
+      null,
       { params }
     );
     return response.data;
@@ -18,6 +18,38 @@ export const notificationsService = {
     return response.data;
   },
 
+  // Количество непрочитанных уведомлений текущего пользователя
+  getUnreadCount: async (): Promise<number> => {
+    const response = await apiClient.get<{ unread_count: number }>(
+      `${NOTIFICATIONS_API}/user/unread-count`
+    );
+    return response.data.unread_count;
+  },
+
+  // Отметка нескольких уведомлений как прочитанных или непрочитанных
+  setReadState: async (
+    ids: number[],
+    isRead: boolean
+  ): Promise<{ updated: number; unread_count: number }> => {
+    const response = await apiClient.patch<{ updated: number; unread_count: number }>(
+      `${NOTIFICATIONS_API}/${isRead ? "read" : "unread"}`,
+      { notification_ids: ids }
+    );
+    return response.data;
+  },
+
+  // Подписка на новые уведомления (Server-Sent Events).
+  // EventSource сам переподключается и передает Last-Event-ID для досылки пропущенных
+  subscribe: (onNotification: (notification: Notification) => void): EventSource => {
+    const token = localStorage.getItem("token") ?? "";
+    const url = `${apiClient.defaults.baseURL}${NOTIFICATIONS_API}/stream?token=${encodeURIComponent(token)}`;
+    const source = new EventSource(url);
+    source.addEventListener("notification", (event) => {
+      onNotification(JSON.parse((event as MessageEvent).data));
+    });
+    return source;
+  },
+
   // Получение уведомления по ID
   getNotificationById: async (id: number): Promise<Notification> => {
     const response = await apiClient.get<Notification>(
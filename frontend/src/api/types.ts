@@ -241,6 +241,26 @@ export interface AssetMaintenance {
   updated_at?: string;
 }
 
+// Актив в очереди обслуживания (по убыванию оценки риска)
+export interface MaintenanceQueueItem {
+  asset_id: number;
+  name: string;
+  asset_type: string;
+  location: string;
+  risk_score: number;
+  due_at: string;
+  age_years: number;
+  repairs: number;
+  leaks: number;
+  last_maintenance?: string;
+}
+
+export interface MaintenanceQueuePage {
+  items: MaintenanceQueueItem[];
+  // Курсор следующей страницы (заголовок X-Next-Cursor), null - страниц больше нет
+  nextCursor: string | null;
+}
+
 // Типы для прогнозирования спроса
 export interface WaterDemand {
   id: number;
@@ -255,6 +275,25 @@ export interface WaterDemand {
   updated_at?: string;
 }
 
+export interface DemandForecastPoint {
+  date: string;
+  amount: number;
+}
+
+export interface DemandForecast {
+  location: string;
+  demand_type: string;
+  last_observed: string;
+  alpha: number;
+  beta: number;
+  points: DemandForecastPoint[];
+}
+
+export interface DemandForecastRun {
+  series: number;
+  rows_written: number;
+}
+
 export interface WaterDistributionPlan {
   id: number;
   plan_name: string;